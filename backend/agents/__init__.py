@@ -1,14 +1,27 @@
-from .telegram_bot import handle_telegram_message
-from .slack_bot import fetch_slack_channels, poll_slack_messages
-from .multi_platform_bot import run_multi_platform_bot
-from ..core import database
-from . import llm_agent
-
-__all__ = [
-    'handle_telegram_message',
-    'fetch_slack_channels',
-    'poll_slack_messages',
-    'run_multi_platform_bot',
-    'database',
-    'llm_agent'
-]
\ No newline at end of file
+import importlib
+
+# Attributes are resolved on first access, so importing backend.agents (or one submodule of it)
+# does not pull in telegram, slack_sdk and openai for platforms that are not configured.
+_LAZY_ATTRIBUTES = {
+    'handle_telegram_message': ('.telegram_bot', 'handle_telegram_message'),
+    'fetch_slack_channels': ('.slack_bot', 'fetch_slack_channels'),
+    'poll_slack_messages': ('.slack_bot', 'poll_slack_messages'),
+    'run_multi_platform_bot': ('.multi_platform_bot', 'run_multi_platform_bot'),
+    'database': ('..core.database', None),
+    'llm_agent': ('.llm_agent', None)
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    try:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    module = importlib.import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
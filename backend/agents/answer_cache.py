@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+_SLACK_MENTION = re.compile(r"<@[A-Z0-9]+>")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+def _bot_names():
+    return [name for name in (config.TELEGRAM_BOT_NAME, config.SLACK_BOT_NAME) if name]
+
+def normalize_question(message_text):
+    """Lowercase, drop bot mentions and punctuation, and collapse whitespace."""
+    text = _SLACK_MENTION.sub(" ", message_text)
+    for name in _bot_names():
+        text = text.replace(name, " ")
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return " ".join(text.split())
+
+def history_watermark(channel_history):
+    """Timestamp of the newest channel message that is not itself addressed to the bot.
+
+    Repeated mentions do not move the watermark, so "@bot confirm?" twice in a row
+    maps to the same key while any real new message invalidates it.
+    """
+    names = _bot_names()
+    for row in channel_history:  # Newest first
+        if not any(name in row["message_text"] for name in names) and not _SLACK_MENTION.search(row["message_text"]):
+            return row["timestamp"]
+    return None
+
+class AnswerCache:
+    """TTL + LRU cache of generated answers with in-flight request coalescing.
+
+    Keys are (platform, chat_id, normalized question, history watermark).
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_tokens = 0
+        self._entries = OrderedDict()  # key -> (answer, tokens, stored_at)
+        self._inflight = {}  # key -> Future shared by concurrent identical requests
+
+    @staticmethod
+    def make_key(platform, chat_id, message_text, channel_history):
+        return (platform, chat_id, normalize_question(message_text), history_watermark(channel_history))
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, answer, tokens=0):
+        self._entries[key] = (answer, tokens, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key, compute):
+        """Return a cached answer, join an identical in-flight request, or run compute().
+
+        compute() must return (answer, tokens_used). Failures are not cached.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.saved_tokens += entry[1]
+            return entry[0]
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            answer, tokens = await asyncio.shield(future)
+            self.saved_tokens += tokens
+            return answer
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            answer, tokens = await compute()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+        self.put(key, answer, tokens)
+        future.set_result((answer, tokens))
+        return answer
+
+    def stats(self):
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "saved_tokens": self.saved_tokens,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+answer_cache = AnswerCache(max_size=config.ANSWER_CACHE_MAX_SIZE, ttl=config.ANSWER_CACHE_TTL)
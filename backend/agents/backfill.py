@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from ..core import config, database, logging_config
+from .slack_bot import SlackRateLimiter, get_bot_user_id
+from .slack_events import INGESTED_SUBTYPES
+from .user_directory import user_directory, slack_display_name
+
+logger = logging.getLogger(__name__)
+
+# Telegram export chat types whose Bot API chat id carries the -100 prefix
+_TELEGRAM_CHANNEL_TYPES = {"private_supergroup", "public_supergroup", "private_channel", "public_channel"}
+
+class BackfillWriter:
+    """Batches records into database.copy_messages, saving resumable progress and throughput."""
+
+    def __init__(self, db_pool, source, batch_size=5000, report_interval=5):
+        self.db_pool = db_pool
+        self.source = source
+        self.batch_size = batch_size
+        self.report_interval = report_interval
+        self.position = None  # Resume point just past the last message read
+        self.read = 0
+        self.inserted = 0
+        self._batch = []
+        self._started = time.monotonic()
+        self._last_report = self._started
+
+    @property
+    def rate(self):
+        return self.read / max(time.monotonic() - self._started, 1e-9)
+
+    async def add(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self, completed=False):
+        batch, self._batch = self._batch, []
+        if batch or completed:
+            self.inserted += await database.copy_messages(self.db_pool, batch, self.source, self.position, completed)
+        if completed or time.monotonic() - self._last_report >= self.report_interval:
+            self._last_report = time.monotonic()
+            logger.info(f"Backfill {self.source}: {self.read} read, {self.inserted} new, {self.rate:.0f} msgs/sec")
+
+    def stats(self):
+        return {"source": self.source, "read": self.read, "inserted": self.inserted, "msgs_per_sec": self.rate}
+
+async def _resume_position(db_pool, source, restart):
+    """Return (position, done) for a source, clearing saved progress first when restarting."""
+    if restart:
+        await database.reset_backfill_progress(db_pool, source)
+        return None, False
+    progress = await database.load_backfill_progress(db_pool, source)
+    if progress is None:
+        return None, False
+    if progress["completed"]:
+        logger.info(f"Backfill {source} already completed ({progress['imported']} messages); use --restart to redo it")
+        return progress["position"], True
+    logger.info(f"Resuming backfill {source} from {progress['position']} ({progress['imported']} imported)")
+    return progress["position"], False
+
+async def backfill_slack_channel(db_pool, slack_client, channel_id, batch_size=5000, restart=False):
+    """Stream a channel's full history from conversations.history, newest first, into group_messages."""
+    source = f"slack-api:{channel_id}"
+    latest, done = await _resume_position(db_pool, source, restart)
+    if done:
+        return None
+    bot_user_id = await get_bot_user_id(slack_client)
+    limiter = SlackRateLimiter(config.SLACK_HISTORY_RATE_PER_MINUTE, config.SLACK_HISTORY_BURST)
+    writer = BackfillWriter(db_pool, source, batch_size)
+    cursor = None
+    while True:
+        await limiter.acquire()
+        try:
+            # Pages walk backwards from `latest` (exclusive), so a resumed run continues below the saved ts
+            result = await asyncio.to_thread(slack_client.conversations_history, channel=channel_id, latest=latest,
+                                             limit=config.SLACK_HISTORY_PAGE_SIZE, cursor=cursor)
+        except SlackApiError as e:
+            if e.response.status_code == 429:
+                limiter.pause(int(e.response.headers.get("Retry-After", 30)))
+                continue
+            raise
+        for msg in result["messages"]:
+            writer.read += 1
+            writer.position = msg["ts"]
+            if msg.get("subtype") not in INGESTED_SUBTYPES or not msg.get("user") or not msg.get("text"):
+                continue
+            if msg["user"] == bot_user_id:
+                continue
+            user_name = await user_directory.resolve_slack(slack_client, msg["user"])
+            await writer.add(("slack", channel_id, msg["user"], user_name, msg["text"],
+                              database.slack_ts_to_datetime(msg["ts"]), msg["ts"]))
+        cursor = result.get("response_metadata", {}).get("next_cursor")
+        if not result.get("has_more") or not cursor:
+            break
+    await writer.flush(completed=True)
+    return writer.stats()
+
+async def backfill_slack_export(db_pool, path, channels=None, batch_size=5000, restart=False):
+    """Import a Slack workspace export directory (channels.json, users.json, <channel>/<date>.json)."""
+    root = Path(path).resolve()
+    users = {user["id"]: slack_display_name(user) for user in json.loads((root / "users.json").read_text())}
+    results = []
+    for channel in json.loads((root / "channels.json").read_text()):
+        if channels and channel["id"] not in channels and channel["name"] not in channels:
+            continue
+        source = f"slack-export:{root}:{channel['id']}"
+        position, done = await _resume_position(db_pool, source, restart)
+        if done:
+            continue
+        skip = int(position or 0)
+        writer = BackfillWriter(db_pool, source, batch_size)
+        for day_file in sorted((root / channel["name"]).glob("*.json")):
+            for msg in json.loads(day_file.read_text()):
+                writer.read += 1
+                if writer.read <= skip:
+                    continue
+                writer.position = str(writer.read)
+                if msg.get("type") != "message" or msg.get("subtype") not in INGESTED_SUBTYPES:
+                    continue
+                if not msg.get("user") or not msg.get("text"):
+                    continue
+                user_name = users.get(msg["user"]) or msg.get("user_profile", {}).get("real_name") or "Unknown User"
+                await writer.add(("slack", channel["id"], msg["user"], user_name, msg["text"],
+                                  database.slack_ts_to_datetime(msg["ts"]), msg["ts"]))
+        await writer.flush(completed=True)
+        results.append(writer.stats())
+    return results
+
+def _telegram_text(text):
+    # Formatted messages are exported as a list of plain strings and entity dicts
+    if isinstance(text, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+    return text
+
+def _telegram_chat_id(export):
+    if export.get("type") in _TELEGRAM_CHANNEL_TYPES:
+        return f"-100{export['id']}"
+    if export.get("type") == "private_group":
+        return f"-{export['id']}"
+    return str(export["id"])
+
+async def backfill_telegram_export(db_pool, path, chat_id=None, batch_size=5000, restart=False):
+    """Import a Telegram Desktop chat export (result.json) into group_messages."""
+    path = Path(path).resolve()
+    source = f"telegram-export:{path}"
+    position, done = await _resume_position(db_pool, source, restart)
+    if done:
+        return None
+    # Telegram rows have no message id to dedup on, so the saved position is what prevents re-imports
+    export = json.loads(path.read_text())
+    chat_id = chat_id or _telegram_chat_id(export)
+    skip = int(position or 0)
+    writer = BackfillWriter(db_pool, source, batch_size)
+    for msg in export.get("messages", []):
+        writer.read += 1
+        if writer.read <= skip:
+            continue
+        writer.position = str(writer.read)
+        text = _telegram_text(msg.get("text"))
+        if msg.get("type") != "message" or not text or not msg.get("from_id"):
+            continue
+        user_id = msg["from_id"].removeprefix("user")
+        timestamp = datetime.fromtimestamp(int(msg["date_unixtime"]), timezone.utc)
+        await writer.add(("telegram", chat_id, user_id, msg.get("from") or "Unknown User", text, timestamp, None))
+    await writer.flush(completed=True)
+    return writer.stats()
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill channel history into group_messages.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Messages per COPY batch")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and import from the start")
+    commands = parser.add_subparsers(dest="command", required=True)
+    slack_api = commands.add_parser("slack-api", help="Fetch full channel history through the Slack API")
+    slack_api.add_argument("channels", nargs="+", help="Slack channel ids")
+    slack_export = commands.add_parser("slack-export", help="Import a Slack workspace export directory")
+    slack_export.add_argument("path")
+    slack_export.add_argument("--channel", action="append", help="Channel name or id to import (default: all)")
+    telegram_export = commands.add_parser("telegram-export", help="Import a Telegram Desktop result.json export")
+    telegram_export.add_argument("path")
+    telegram_export.add_argument("--chat-id", help="Bot API chat id, if it differs from the one derived from the export")
+    args = parser.parse_args(argv)
+
+    db_pool = await database.init_db_pool(config.DB_CONFIG)
+    results = []
+    try:
+        if args.command == "slack-api":
+            slack_client = WebClient(token=config.SLACK_BOT_TOKEN)
+            await user_directory.warm_slack(slack_client)
+            for channel_id in args.channels:
+                results.append(await backfill_slack_channel(db_pool, slack_client, channel_id, args.batch_size, args.restart))
+        elif args.command == "slack-export":
+            results.extend(await backfill_slack_export(db_pool, args.path, args.channel, args.batch_size, args.restart))
+        else:
+            results.append(await backfill_telegram_export(db_pool, args.path, args.chat_id, args.batch_size, args.restart))
+    finally:
+        await db_pool.close()
+    for stats in filter(None, results):
+        print(f"{stats['source']}: {stats['read']} read, {stats['inserted']} new, {stats['msgs_per_sec']:.0f} msgs/sec")
+
+if __name__ == "__main__":
+    logging_config.setup_logging()
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from ..core import config
+from . import llm_agent
+
+logger = logging.getLogger(__name__)
+
+class _MentionJob:
+    __slots__ = ("platform", "chat_id", "message_texts", "db_pool", "response_func", "client", "enqueued_at")
+
+    def __init__(self, platform, chat_id, message_text, db_pool, response_func, client):
+        self.platform = platform
+        self.chat_id = chat_id
+        self.message_texts = [message_text]
+        self.db_pool = db_pool
+        self.response_func = response_func
+        self.client = client
+        self.enqueued_at = time.monotonic()
+
+class MentionQueue:
+    """Bounded job queue between ingestion and llm_agent.answer_question.
+
+    A fixed pool of workers drains it. Each chat has at most one running and one waiting
+    job, so answers within a chat never race, and mentions that arrive while a chat's job
+    is still waiting are merged into it. Past max_depth waiting jobs, new chats are shed
+    with a busy reply instead of queueing unbounded LLM work.
+    """
+
+    def __init__(self, workers=8, max_depth=100):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.submitted = 0
+        self.coalesced = 0
+        self.shed = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._waiting = {}  # (platform, chat_id) -> _MentionJob not yet started
+        self._running = set()
+        self._ready = None
+        self._worker_tasks = []
+        self._shed_tasks = set()
+        self._closing = False
+
+    @property
+    def depth(self):
+        return len(self._waiting)
+
+    def _start(self):
+        self._ready = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"Mention queue started with {self.workers} workers, max depth {self.max_depth}")
+
+    def submit(self, platform, chat_id, message_text, db_pool, response_func, client):
+        """Queue a mention for answering; returns False if it was shed."""
+        if self._ready is None:
+            self._start()
+        key = (platform, chat_id)
+        job = self._waiting.get(key)
+        if job is not None:
+            job.message_texts.append(message_text)
+            self.coalesced += 1
+            return True
+        if self._closing or len(self._waiting) >= self.max_depth:
+            self.shed += 1
+            logger.warning(f"Mention queue full ({self.depth} waiting); shedding {platform} mention in {chat_id}")
+            task = asyncio.create_task(response_func(chat_id, "I’m handling a lot of requests right now, please ask again in a minute."))
+            self._shed_tasks.add(task)
+            task.add_done_callback(self._shed_tasks.discard)
+            return False
+        self._waiting[key] = _MentionJob(platform, chat_id, message_text, db_pool, response_func, client)
+        self.submitted += 1
+        if key not in self._running:
+            self._ready.put_nowait(key)
+        return True
+
+    async def _work(self):
+        while True:
+            key = await self._ready.get()
+            job = self._waiting.pop(key)
+            self._running.add(key)
+            wait = time.monotonic() - job.enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                # Merged mentions are answered once, with every question in order
+                await llm_agent.answer_question(job.platform, job.chat_id, "\n".join(job.message_texts),
+                                                job.db_pool, job.response_func, job.client)
+            except Exception as e:
+                logger.error(f"Mention job failed on {job.platform} in {job.chat_id}: {e}")
+            finally:
+                self.completed += 1
+                self._running.discard(key)
+                # A mention that arrived while this one ran is now free to start
+                if key in self._waiting:
+                    self._ready.put_nowait(key)
+
+    async def close(self, timeout=10):
+        """Stop admitting jobs, give queued and running ones `timeout` seconds, then cancel the workers."""
+        self._closing = True
+        deadline = time.monotonic() + timeout
+        while (self._waiting or self._running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        abandoned = len(self._waiting) + len(self._running)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info(f"Mention queue drained: {self.completed} completed, {abandoned} abandoned")
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "running": len(self._running),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "shed": self.shed,
+            "completed": self.completed,
+            "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+            "max_wait": self.max_wait
+        }
+
+mention_queue = MentionQueue(workers=config.MENTION_WORKERS, max_depth=config.MENTION_QUEUE_MAX_DEPTH)
@@ -1,21 +1,85 @@
+import asyncio
 import logging
 import textwrap
-from openai import OpenAI
-from ..core import database
+from functools import partial
+import openai
+from ..core import config, database, logging_config, metrics
+from . import prompt_builder
+from .answer_cache import answer_cache
+from .llm_router import LLMUnavailableError, get_openai_client, router
+from .order_state import order_tracker
+from .retrieval import retrieval_index
+from .streaming import Responder, StreamingReply
 
 logger = logging.getLogger(__name__)
 
-def get_openai_client(api_key):
-    """Initialize and return the OpenAI client."""
-    return OpenAI(api_key=api_key)
-
 async def answer_question(platform, chat_id, message_text, db_pool, response_func, client):
-    """Answer a question based on channel-specific history, using all history for LLM context."""
-    channel_history = await database.fetch_channel_history(db_pool, platform, chat_id)
-    channel_history_str = "\n".join(f"{row['user_name']}: {row['message_text']}" for row in channel_history)
+    """Answer a question based on channel-specific history, using all history for LLM context.
+
+    response_func is either a plain `async (chat_id, text)` callable or a streaming.Responder;
+    with a Responder (and LLM_STREAMING on) a placeholder is posted as soon as generation
+    starts and edited as the completion streams in. Repeated questions against an unchanged
+    channel history are served from the answer cache.
+    """
+    stream = None
+    if config.LLM_STREAMING and isinstance(response_func, Responder):
+        stream = StreamingReply(response_func, chat_id)
+    reply = stream.finish if stream else partial(response_func, chat_id)
+
+    try:
+        with metrics.trace("answer_question", platform=platform, chat_id=chat_id):
+            channel_history = await database.fetch_channel_history(db_pool, platform, chat_id)
+            key = answer_cache.make_key(platform, chat_id, message_text, channel_history)
+            answer = await answer_cache.get_or_compute(
+                key, lambda: _generate_answer(platform, chat_id, message_text, db_pool, client, channel_history, stream)
+            )
+            with metrics.span("reply"):
+                await reply(answer)
+        if logging_config.sampled("reply", logger):
+            logger.info(f"Reply on {platform} in {chat_id}", extra={"answer": answer, "answer_chars": len(answer)})
+    except asyncio.TimeoutError:
+        logger.error(f"OpenAI request timed out on {platform} in {chat_id}")
+        await reply("The AI service is taking too long, please try again later.")
+    except (openai.APIError, LLMUnavailableError) as e:
+        logger.error(f"OpenAI API error: {e}")
+        await reply("There’s a problem with the AI service, please try again later.")
+    except Exception as e:
+        logger.error(f"Unexpected error on {platform} in {chat_id}: {e}")
+        await reply("An error occurred, please try again later.")
+
+async def _generate_answer(platform, chat_id, message_text, db_pool, client, channel_history, stream=None):
+    """Build the prompt and run the completion, streaming into `stream` if given; returns (answer, total_tokens).
 
-    all_history = await database.fetch_all_history(db_pool)
-    all_history_str = "\n".join(f"{row['platform']} - {row['chat_id']} - {row['user_name']}: {row['message_text']}" for row in all_history)
+    Routine confirmation requests about a fully extracted order are answered from the
+    order-state tracker without calling the LLM.
+    """
+    order_state = None
+    if order_tracker is not None:
+        order_tracker.seed(platform, chat_id, channel_history)
+        if config.ORDER_FAST_PATH:
+            answer = order_tracker.fast_answer(platform, chat_id, message_text)
+            if answer is not None:
+                logger.info(f"Answered from order state on {platform} in {chat_id}")
+                return answer, 0
+        order_state = order_tracker.describe(platform, chat_id)
+    if stream is not None:
+        await stream.start()
+    if retrieval_index is not None:
+        # Query with the question plus the latest channel context, since mentions are often terse
+        query_text = "\n".join([message_text] + [row["message_text"] for row in channel_history[:5]])
+        with metrics.span("retrieval"):
+            all_history = await retrieval_index.search(query_text, client=client, exclude_chat=(platform, chat_id))
+    else:
+        all_history = await database.fetch_all_history(db_pool)
+    with metrics.span("build_prompt"):
+        prompt, prompt_stats = prompt_builder.build_prompt(
+            platform, chat_id, channel_history, all_history, message_text, order_state=order_state
+        )
+    metrics.PROMPT_TOKENS.observe(prompt_stats["prompt_tokens"], platform=platform)
+    metrics.PROMPT_TOKENS_SAVED.inc(prompt_stats["saved_tokens"], platform=platform)
+    # One line per LLM request, not per message, so it is not sampled
+    logger.info(f"Prompt on {platform} in {chat_id}: {prompt_stats['prompt_tokens']} tokens, "
+                f"{prompt_stats['saved_tokens']} saved", extra=prompt_stats)
 
     instructions = textwrap.dedent("""\
         You are a professional order confirmation agent who converts trading chats into a clear, 
@@ -37,28 +101,9 @@ async def answer_question(platform, chat_id, message_text, db_pool, response_fun
         f"Use all history to understand patterns, but answer based only on the current {platform} channel’s context."
     )
 
-    prompt = (
-        f"All chat history (for learning):\n{all_history_str}\n\n"
-        f"Current {platform} channel history (for answering):\n{channel_history_str}\n\n"
-        f"Question:\n{message_text}"
-    )
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        answer = response.choices[0].message.content.strip()
-        await response_func(chat_id, answer)
-        logger.info(f"Reply on {platform} in {chat_id}: {answer}")
-    except openai.error.APIError as e:
-        logger.error(f"OpenAI API error: {e}")
-        await response_func(chat_id, "There’s a problem with the AI service, please try again later.")
-    except Exception as e:
-        logger.error(f"Unexpected error on {platform} in {chat_id}: {e}")
-        await response_func(chat_id, "An error occurred, please try again later.")
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+    model = router.choose_model(prompt_stats["prompt_tokens"], message_text)
+    return await router.complete(client, messages, model=model, on_text=stream.update if stream is not None else None)
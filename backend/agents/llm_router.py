@@ -0,0 +1,400 @@
+import asyncio
+import contextlib
+import logging
+import re
+import time
+import weakref
+from collections import deque
+import openai
+from openai import AsyncOpenAI
+from ..core import config, metrics
+
+logger = logging.getLogger(__name__)
+
+# One concurrency cap per event loop, since asyncio primitives are bound to the loop they run on
+_llm_semaphores = weakref.WeakKeyDictionary()
+# Clients for the fallback endpoint, created lazily per event loop like the primary client
+_fallback_clients = weakref.WeakKeyDictionary()
+
+def get_openai_client(api_key, base_url=None, timeout=None):
+    """Initialize and return the async OpenAI client.
+
+    The client is bound to the event loop it is first used on, so create one per loop.
+    """
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url or config.OPENAI_BASE_URL,
+        timeout=timeout or config.LLM_REQUEST_TIMEOUT
+    )
+
+def _get_llm_semaphore():
+    """Return the completion concurrency cap for the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+        _llm_semaphores[loop] = semaphore
+    return semaphore
+
+def _get_fallback_client():
+    """Return the fallback endpoint's client for the running event loop, or None if none is configured."""
+    if not config.OPENAI_FALLBACK_BASE_URL:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _fallback_clients.get(loop)
+    if client is None:
+        client = get_openai_client(config.OPENAI_FALLBACK_API_KEY or config.OPENAI_API_KEY,
+                                   base_url=config.OPENAI_FALLBACK_BASE_URL)
+        _fallback_clients[loop] = client
+    return client
+
+async def close_fallback_client():
+    client = _fallback_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+async def create_completion(client, messages, model=None, max_tokens=500, temperature=0.7, timeout=None):
+    """Run a chat completion under the concurrency cap with a per-request timeout.
+
+    Cancelling the awaiting task cancels the underlying HTTP request.
+    """
+    model = model or config.LLM_MODEL
+    async with _get_llm_semaphore():
+        with _observe_completion(model, "plain"):
+            response = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                ),
+                timeout=timeout or config.LLM_REQUEST_TIMEOUT
+            )
+    _record_usage(model, response.usage)
+    return response
+
+async def create_completion_stream(client, messages, on_text, model=None, max_tokens=500, temperature=0.7, timeout=None):
+    """Stream a chat completion, awaiting on_text(text_so_far) after each delta.
+
+    Runs under the same concurrency cap and timeout as create_completion.
+    Returns (text, total_tokens).
+    """
+    model = model or config.LLM_MODEL
+
+    async def consume():
+        started = time.perf_counter()
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        parts = []
+        tokens = 0
+        async for chunk in stream:
+            if chunk.usage:
+                tokens = chunk.usage.total_tokens
+                _record_usage(model, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    metrics.LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, model=model)
+                parts.append(chunk.choices[0].delta.content)
+                await on_text("".join(parts))
+        return "".join(parts), tokens
+
+    async with _get_llm_semaphore():
+        with _observe_completion(model, "stream"):
+            return await asyncio.wait_for(consume(), timeout=timeout or config.LLM_REQUEST_TIMEOUT)
+
+@contextlib.contextmanager
+def _observe_completion(model, mode):
+    """Time a completion (after it gets a concurrency slot) and count failures by error type."""
+    try:
+        with metrics.LLM_SECONDS.time(model=model, mode=mode), metrics.span("llm", mode=mode):
+            yield
+    except Exception as e:
+        metrics.LLM_ERRORS.inc(model=model, error=type(e).__name__)
+        raise
+
+def _record_usage(model, usage):
+    if usage:
+        metrics.LLM_TOKENS.inc(usage.prompt_tokens, model=model, kind="prompt")
+        metrics.LLM_TOKENS.inc(usage.completion_tokens, model=model, kind="completion")
+        router.model_stats(model).add_usage(usage.prompt_tokens, usage.completion_tokens)
+
+def parse_prices(spec):
+    """Parse "model=prompt/completion,..." (USD per million tokens) into {model: (prompt, completion)}."""
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rates = item.partition("=")
+        prompt, _, completion = rates.partition("/")
+        prices[model.strip()] = (float(prompt), float(completion or prompt))
+    return prices
+
+class LLMUnavailableError(Exception):
+    """Every endpoint's circuit breaker is open."""
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout` seconds
+    one probe request is let through, and its outcome closes or re-opens the breaker."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        return not self._probing and time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def acquire(self):
+        """Mark a request as started; while half-open it is the single probe."""
+        if self.opened_at is not None:
+            self._probing = True
+
+    def release(self):
+        """The probe was cancelled without an outcome, so let another one through."""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            if self.opened_at is None:
+                logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+
+class ModelStats:
+    """Request counts, recent latencies and token cost for one model."""
+
+    def __init__(self, prices=None, window=500):
+        self.prices = prices  # (prompt, completion) USD per million tokens, or None if unknown
+        self.completed = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self._latencies = deque(maxlen=window)
+
+    def add_latency(self, seconds):
+        self.completed += 1
+        self._latencies.append(seconds)
+
+    def add_usage(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        if self.prices:
+            self.cost += (prompt_tokens * self.prices[0] + completion_tokens * self.prices[1]) / 1_000_000
+
+    def percentile(self, pct):
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def stats(self):
+        return {
+            "completed": self.completed,
+            "errors": self.errors,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": self.cost
+        }
+
+class LLMRouter:
+    """Picks a model tier per request, hedges slow requests and fails over between endpoints.
+
+    The primary endpoint is the client handed to complete(); the fallback is the optional
+    OpenAI-compatible endpoint at OPENAI_FALLBACK_BASE_URL. Each (endpoint, model) pair has
+    its own circuit breaker. When a request has produced nothing after `hedge_after` seconds
+    a duplicate is sent to the fallback, if it is healthy, and the first to succeed wins.
+    Without a fallback the duplicate only goes to the primary when hedge_same_endpoint is set,
+    since it doubles the cost of exactly the requests a slow endpoint is already struggling with.
+    """
+
+    _COMPLEX_QUESTION = re.compile(r"\b(?:why|explain|compare|analy[sz]e|reconcile|history|all orders)\b", re.I)
+
+    def __init__(self, model, fast_model=None, fast_max_prompt_tokens=1200, fallback_model=None, hedge_after=0,
+                 hedge_same_endpoint=False, breaker_failures=5, breaker_reset=30, prices=None):
+        self.model = model
+        self.fast_model = fast_model
+        self.fast_max_prompt_tokens = fast_max_prompt_tokens
+        self.fallback_model = fallback_model
+        self.hedge_after = hedge_after
+        self.hedge_same_endpoint = hedge_same_endpoint
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.prices = prices or {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self._breakers = {}  # (endpoint, model) -> CircuitBreaker
+        self._model_stats = {}  # model -> ModelStats
+
+    def choose_model(self, prompt_tokens, question=""):
+        """Use the fast tier for short prompts with routine questions, the main model otherwise."""
+        if self.fast_model and prompt_tokens <= self.fast_max_prompt_tokens and not self._COMPLEX_QUESTION.search(question):
+            return self.fast_model
+        return self.model
+
+    def model_stats(self, model):
+        stats = self._model_stats.get(model)
+        if stats is None:
+            stats = self._model_stats[model] = ModelStats(self.prices.get(model))
+        return stats
+
+    def breaker(self, endpoint, model):
+        breaker = self._breakers.get((endpoint, model))
+        if breaker is None:
+            breaker = self._breakers[(endpoint, model)] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return breaker
+
+    def _candidates(self, client, model):
+        """Healthy (endpoint, client, model) targets in preference order."""
+        targets = [("primary", client, model)]
+        fallback_client = _get_fallback_client()
+        if fallback_client is not None:
+            targets.append(("fallback", fallback_client, self.fallback_model or model))
+        return [target for target in targets if self.breaker(target[0], target[2]).allow()]
+
+    async def _attempt(self, target, messages, on_text, max_tokens, temperature):
+        endpoint, client, model = target
+        breaker = self.breaker(endpoint, model)
+        breaker.acquire()
+        started = time.perf_counter()
+        try:
+            if on_text is None:
+                response = await create_completion(client, messages, model=model, max_tokens=max_tokens, temperature=temperature)
+                result = response.choices[0].message.content.strip(), response.usage.total_tokens if response.usage else 0
+            else:
+                text, tokens = await create_completion_stream(client, messages, on_text, model=model,
+                                                              max_tokens=max_tokens, temperature=temperature)
+                result = text.strip(), tokens
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            self.model_stats(model).errors += 1
+            # A malformed request fails the same way everywhere, so it says nothing about endpoint health
+            if not isinstance(e, openai.BadRequestError):
+                breaker.record_failure()
+            logger.warning(f"LLM request to {endpoint} endpoint ({model}) failed: {type(e).__name__}: {e}")
+            raise
+        breaker.record_success()
+        self.model_stats(model).add_latency(time.perf_counter() - started)
+        return result
+
+    async def complete(self, client, messages, model=None, on_text=None, max_tokens=500, temperature=0.7):
+        """Run one logical completion and return (text, total_tokens).
+
+        With on_text the completion is streamed; when a hedge is in flight only the attempt
+        that produces text first feeds on_text, and the other is cancelled.
+        """
+        model = model or self.model
+        targets = self._candidates(client, model)
+        if not targets:
+            raise LLMUnavailableError(f"No healthy LLM endpoint for {model}")
+
+        pending = {}  # task -> target
+        winner = None  # The attempt task that owns on_text; a hedge may share its target
+
+        def start(target):
+            stream_to = None
+            if on_text is not None:
+                async def stream_to(text):
+                    nonlocal winner
+                    if winner is None:
+                        winner = task
+                        for other in pending:
+                            if other is not task:
+                                other.cancel()
+                    if winner is task:
+                        await on_text(text)
+            task = asyncio.create_task(self._attempt(target, messages, stream_to, max_tokens, temperature))
+            pending[task] = target
+            return task
+
+        primary = targets.pop(0)
+        start(primary)
+        hedge_task = None
+        last_error = None
+        try:
+            while pending:
+                # Hedge: the fallback if it is healthy, otherwise (if allowed) a duplicate on a fully closed primary
+                hedge_target = targets[0] if targets else None
+                if hedge_target is None and self.hedge_same_endpoint and self.breaker("primary", model).opened_at is None:
+                    hedge_target = primary
+                can_hedge = self.hedge_after > 0 and hedge_task is None and winner is None and hedge_target is not None
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if targets:
+                        targets.pop(0)
+                    self.hedges += 1
+                    metrics.LLM_HEDGES.inc(model=model)
+                    hedge_task = start(hedge_target)
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                    if winner is task:
+                        winner = None
+                if not pending and targets:
+                    self.fallbacks += 1
+                    metrics.LLM_FALLBACKS.inc(model=model)
+                    start(targets.pop(0))
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """Router counters plus per-model latency and cost, flattened for register_stats."""
+        values = {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "open_breakers": sum(breaker.opened_at is not None for breaker in self._breakers.values())
+        }
+        for model, stats in self._model_stats.items():
+            name = re.sub(r"\W", "_", model)
+            for key, value in stats.stats().items():
+                values[f"{name}_{key}"] = value
+        return values
+
+router = LLMRouter(
+    config.LLM_MODEL,
+    fast_model=config.LLM_FAST_MODEL or None,
+    fast_max_prompt_tokens=config.LLM_FAST_MAX_PROMPT_TOKENS,
+    fallback_model=config.LLM_FALLBACK_MODEL or None,
+    hedge_after=config.LLM_HEDGE_AFTER,
+    hedge_same_endpoint=config.LLM_HEDGE_SAME_ENDPOINT,
+    breaker_failures=config.LLM_BREAKER_FAILURES,
+    breaker_reset=config.LLM_BREAKER_RESET,
+    prices=parse_prices(config.LLM_PRICES)
+)
@@ -1,72 +1,128 @@
-from functools import partial
 import logging
 import asyncio
-import threading
 import signal
-from telegram.ext import Application as TelegramApp, MessageHandler, filters
-from ..core import config, database
-from . import telegram_bot, slack_bot, llm_agent
-from slack_sdk import WebClient
+import time
+from ..core import config, database, logging_config, metrics, partitions, startup_profile
+from ..core.history_cache import history_cache
+from ..core.leases import ChannelLeaseManager
+from . import llm_agent, llm_router, platforms
+from .answer_cache import answer_cache
+from .order_state import order_tracker
+from .job_queue import mention_queue
+from .retrieval import retrieval_index
+from .user_directory import user_directory
 
 logger = logging.getLogger(__name__)
 
-def run_slack_polling(db_config, slack_client, openai_client):
-    """Run Slack polling in a separate thread with its own event loop and database pool."""
-    slack_loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(slack_loop)
-    db_pool = slack_loop.run_until_complete(database.init_db_pool(db_config))
-    try:
-        slack_loop.run_until_complete(slack_bot.poll_slack_messages(db_pool, slack_client, config.SLACK_BOT_NAME, openai_client))
-    finally:
-        slack_loop.run_until_complete(db_pool.close())
-        slack_loop.close()
-        logger.info("Slack thread shutdown complete")
+async def init_pool(db_config):
+    """Create a database pool, fronted by the write-behind buffer when enabled."""
+    db_pool = await database.init_db_pool(db_config)
+    if config.DB_WRITE_BUFFER:
+        database.enable_write_buffer(db_pool, config.DB_WRITE_BATCH_SIZE, config.DB_WRITE_FLUSH_INTERVAL,
+                                     config.DB_WRITE_MAX_PENDING)
+    return db_pool
 
-async def shutdown(signal, telegram_app, slack_thread, telegram_pool):
-    """Handle graceful shutdown for both Telegram and Slack."""
-    logger.info(f"Received {signal}, shutting down...")
-    telegram_app.stop()
-    if slack_thread and slack_thread.is_alive():
-        slack_thread.join(timeout=5)
-    if telegram_pool:
-        await telegram_pool.close()
-        logger.info("Telegram database pool closed")
-    asyncio.get_event_loop().stop()
+async def supervise(name, factory):
+    """Run factory() as a long-lived task, restarting it with exponential backoff if it crashes or returns."""
+    backoff = config.SUPERVISOR_MIN_BACKOFF
+    while True:
+        started = time.monotonic()
+        try:
+            await factory()
+            logger.warning(f"{name} exited unexpectedly")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"{name} crashed: {e}", exc_info=True)
+        # A task that ran for a while before failing starts again from the minimum backoff
+        if time.monotonic() - started > config.SUPERVISOR_MAX_BACKOFF:
+            backoff = config.SUPERVISOR_MIN_BACKOFF
+        logger.info(f"Restarting {name} in {backoff:.1f}s")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, config.SUPERVISOR_MAX_BACKOFF)
 
-def run_multi_platform_bot():
-    # Main thread (Telegram) event loop
-    loop = asyncio.get_event_loop()
-    telegram_pool = loop.run_until_complete(database.init_db_pool(config.DB_CONFIG))
+def register_stats_collectors(db_pool, adapters=()):
+    """Expose the caches', queues' and loaded platforms' own stats() on /metrics."""
+    metrics.register_stats("bot_history_cache", history_cache.stats)
+    metrics.register_stats("bot_answer_cache", answer_cache.stats)
+    metrics.register_stats("bot_llm_router", llm_router.router.stats)
+    if order_tracker is not None:
+        metrics.register_stats("bot_order_state", order_tracker.stats)
+    metrics.register_stats("bot_mention_queue", mention_queue.stats)
+    metrics.register_stats("bot_user_directory", user_directory.stats)
+    metrics.register_stats("bot_startup", startup_profile.stats, "Startup phase durations and milestones")
+    metrics.register_stats("bot_logging", logging_config.stats, "Log queue depth, sampled-out, dropped and redacted records")
+    for adapter in adapters:
+        if adapter.stats:
+            metrics.register_stats(*adapter.load_stats())
+    buffer = database.get_write_buffer(db_pool)
+    if buffer:
+        metrics.register_stats("bot_write_buffer", buffer.stats)
+
+async def shutdown(tasks, db_pool, openai_client):
+    """Drain in-flight answers while platforms can still reply, then stop platforms and release resources."""
+    await mention_queue.close(timeout=config.SHUTDOWN_GRACE)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await database.close_write_buffer(db_pool)
+    await openai_client.close()
+    await llm_router.close_fallback_client()
+    await db_pool.close()
+    logger.info("Shutdown complete")
 
-    # Initialize OpenAI client
+async def run_bot():
+    """Host every configured platform as a supervised task on one event loop, sharing one pool and client."""
+    db_pool = await init_pool(config.DB_CONFIG)
     openai_client = llm_agent.get_openai_client(config.OPENAI_API_KEY)
+    database.add_message_listener(startup_profile.on_message_stored)
+    adapters = platforms.configured_platforms()
+
+    tasks = []
+    # Keep upcoming group_messages partitions ready and expire those past retention
+    tasks.append(asyncio.create_task(supervise("Partition maintenance", lambda: partitions.run_partition_maintenance(
+        db_pool, config.DB_PARTITION_PREMAKE_MONTHS, config.DB_RETENTION_DAYS, config.DB_ARCHIVE_SCHEMA or None,
+        config.DB_MAINTENANCE_INTERVAL))))
 
-    # Initialize Slack client
-    slack_client = WebClient(token=config.SLACK_BOT_TOKEN) if config.SLACK_BOT_TOKEN else None
+    if config.METRICS_ENABLED:
+        register_stats_collectors(db_pool, adapters)
+        tasks.append(asyncio.create_task(supervise("Metrics endpoint", lambda: metrics.run_metrics_server(
+            config.METRICS_HOST, config.METRICS_PORT))))
 
-    # Initialize Telegram application
-    telegram_app = TelegramApp.builder().token(config.TELEGRAM_BOT_TOKEN).build()
-    telegram_app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.GROUPS, 
-                                            partial(telegram_bot.handle_telegram_message, db_pool=telegram_pool, client=openai_client, bot_name=config.TELEGRAM_BOT_NAME)))
+    lease_manager = None
+    if config.SHARDING_ENABLED:
+        lease_manager = ChannelLeaseManager(db_pool, config.INSTANCE_ID, config.LEASE_TTL)
+        tasks.append(asyncio.create_task(supervise("Lease manager", lease_manager.run)))
 
-    # Start Slack polling in a separate thread if token is provided
-    slack_thread = None
-    if config.SLACK_BOT_TOKEN:
-        slack_thread = threading.Thread(target=run_slack_polling, args=(config.DB_CONFIG, slack_client, openai_client), daemon=True)
-        slack_thread.start()
-    else:
-        logger.warning("Slack token not provided; Slack polling will not run.")
+    # Only configured platforms are imported, so an unused platform's SDK never loads
+    for adapter in platforms.registered_platforms():
+        if adapter not in adapters:
+            logger.warning(f"{adapter.name.capitalize()} is not configured ({', '.join(adapter.missing)} missing); it will not run.")
+            continue
+        with startup_profile.phase(f"load_{adapter.name}"):
+            runner = adapter.load_runner()
+        tasks.append(asyncio.create_task(supervise(adapter.name.capitalize(),
+                                                   lambda runner=runner: runner(db_pool, openai_client, lease_manager))))
+
+    # Seed and run the semantic retrieval index, if enabled
+    if retrieval_index is not None:
+        with startup_profile.phase("retrieval_backfill"):
+            await retrieval_index.backfill(db_pool, openai_client, config.RETRIEVAL_BACKFILL)
+        tasks.append(asyncio.create_task(supervise("Retrieval indexer", lambda: retrieval_index.run_indexer(openai_client))))
 
     # Register signal handlers for graceful shutdown
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
     for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(shutdown(sig, telegram_app, slack_thread, telegram_pool)))
+        loop.add_signal_handler(sig, stop.set)
 
     # Start Ops Assistant
     logger.info("Ops Assistant bots have started...")
-    try:
-        telegram_app.run_polling(allowed_updates=None)
-    finally:
-        loop.run_until_complete(telegram_pool.close())
-        loop.close()
-        logger.info("Main thread shutdown complete")
-        
\ No newline at end of file
+    startup_profile.milestone("ready")
+    startup_profile.report()
+    await stop.wait()
+    logger.info("Received shutdown signal, draining...")
+    await shutdown(tasks, db_pool, openai_client)
+
+def run_multi_platform_bot():
+    asyncio.run(run_bot())
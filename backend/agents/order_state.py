@@ -0,0 +1,264 @@
+import logging
+import re
+from collections import OrderedDict
+from ..core import config, database, metrics
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = r"\d[\d,]*(?:\.\d+)?\s*[kKmM]?\b"
+# Not a price: "at 3 PM", "at 10:30"
+_NOT_TIME = r"(?!\s*(?:am|pm|o'?clock)\b|:\d)"
+_KNOWN_ASSETS = "|".join(re.escape(asset.strip()) for asset in config.ORDER_ASSETS)
+
+# "buy 2 BTC", "selling 10k USDT", "0.5 eth"; the side is optional, the quantity must precede a known asset
+_ORDER = re.compile(
+    rf"(?:\b(?P<side>buy|buying|bought|bid|long|sell|selling|sold|offer|short)\s+)?"
+    rf"(?P<quantity>{_NUMBER})\s*(?P<asset>\b(?:{_KNOWN_ASSETS})\b)",
+    re.I
+)
+_STOP_LOSS = re.compile(rf"\b(?:stop[\s-]?loss|sl|stop)\b\s*(?:at|@|:|=)?\s*\$?(?P<price>{_NUMBER})", re.I)
+# Right after an order a bare "at" introduces its price: "buy 2 BTC at 64,250"
+_ORDER_PRICE = re.compile(rf"^\s*(?:@|\bat\b|\bfor\b)\s*\$?(?P<price>{_NUMBER}){_NOT_TIME}", re.I)
+# Anywhere else the price has to be spelled out: "price is 64,250", "@ 64250", "px: 64.2k"
+_PRICE = re.compile(rf"(?:@|\bprice\b(?:\s+(?:is|of))?|\bpx\b)\s*[:=]?\s*\$?(?P<price>{_NUMBER}){_NOT_TIME}", re.I)
+_WALLET = re.compile(
+    r"\b(?:0x[a-fA-F0-9]{40}|bc1[ac-hj-np-z02-9]{25,59}|[13][a-km-zA-HJ-NP-Z1-9]{25,34}|T[1-9A-HJ-NP-Za-km-z]{33})\b"
+)
+_CONFIRM_REQUEST = re.compile(
+    r"\b(?:please confirm|pls confirm|can you confirm|confirm\s*\?|ok to proceed|shall we proceed|good to go\s*\?)", re.I
+)
+# An explicit confirmation opening the message: "Confirmed, send to wallet ...", "go ahead"
+_CONFIRM = re.compile(r"^\s*(?:confirm(?:ed)?|go ahead|agreed|approved?|proceed|lgtm)\b(?!\s*\?)", re.I)
+# A bare acknowledgement counts only when it is the whole message: "ok", "yes please 👍";
+# "ok let me check with my boss" is not a confirmation
+_ACKNOWLEDGE = re.compile(
+    r"^(?:\s*(?:ok(?:ay)?|yes|yep|yeah|sure|deal|sounds good|confirm(?:ed)?|go ahead|please|pls|thanks|👍|✅)[\s,.!]*)+$",
+    re.I
+)
+_REJECT = re.compile(r"^\s*no\b|\b(?:cancel(?:led)?|hold off|don'?t proceed|not confirmed|no deal|reject(?:ed)?)\b", re.I)
+
+_BUY_WORDS = {"buy", "buying", "bought", "bid", "long"}
+
+# Questions the fast path may answer: a request for the order confirmation or its status.
+# Anything asking for reasoning or a wider scope goes to the LLM.
+_ROUTINE_QUESTION = re.compile(r"\b(?:confirm(?:ation|ed)?|status|summar(?:y|ize|ise)|order|recap)\b", re.I)
+_COMPLEX_QUESTION = re.compile(
+    r"\b(?:why|how come|compare|history|all orders|orders|yesterday|explain|analy[sz]e|should|risk|translate)\b", re.I
+)
+_SLACK_MENTION = re.compile(r"<@[A-Z0-9]+>")
+
+_FIELDS = ("side", "asset", "quantity", "price", "stop_loss", "wallet", "trader", "customer")
+
+def _parse_number(text):
+    text = text.replace(",", "").strip()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1].lower(), 1)
+    if multiplier != 1:
+        text = text[:-1].strip()
+    value = float(text) * multiplier
+    return int(value) if value.is_integer() else value
+
+def _format_number(value):
+    return f"{value:,}" if isinstance(value, int) else f"{value:,.8f}".rstrip("0").rstrip(".")
+
+def _mentions_bot(text):
+    if _SLACK_MENTION.search(text):
+        return True
+    return any(name and name in text for name in (config.TELEGRAM_BOT_NAME, config.SLACK_BOT_NAME))
+
+class OrderRecord:
+    """The order currently being negotiated in one channel, as extracted from its messages."""
+
+    __slots__ = _FIELDS + ("confirmed", "confirmed_at", "details_author", "updated_at")
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, None)
+
+    @property
+    def complete(self):
+        """True once asset, quantity and price are known, which the fast path requires."""
+        return self.asset is not None and self.quantity is not None and self.price is not None
+
+    def status(self):
+        if self.confirmed is True:
+            return "confirmed"
+        return "rejected" if self.confirmed is False else "pending"
+
+class OrderStateTracker:
+    """Incrementally extracts per-channel order state from stored messages with regex rules.
+
+    Routine confirmation requests are answered from the extracted state without an LLM call
+    when the order is complete; otherwise the state is handed to the LLM as a compact hint.
+    """
+
+    def __init__(self, max_channels=10000):
+        self.max_channels = max_channels
+        self.messages_parsed = 0
+        self.fast_path_answers = 0
+        self.llm_fallbacks = 0
+        self._records = OrderedDict()  # (platform, chat_id) -> OrderRecord
+        self._seeded = set()  # Channels whose record reflects their full recent history
+
+    def on_message_stored(self, message):
+        self._apply(self._record((message["platform"], message["chat_id"])), message)
+
+    def _record(self, key):
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = OrderRecord()
+            while len(self._records) > self.max_channels:
+                evicted, _ = self._records.popitem(last=False)
+                self._seeded.discard(evicted)
+        else:
+            self._records.move_to_end(key)
+        return record
+
+    def _apply(self, record, message):
+        text = message["message_text"] or ""
+        if _mentions_bot(text):
+            return
+        self.messages_parsed += 1
+        author = message["user_name"]
+
+        stop = _STOP_LOSS.search(text)
+        if stop:
+            # Blank out the stop so "stop at 60000" is not also read as the order price
+            text = text[:stop.start()] + " " * (stop.end() - stop.start()) + text[stop.end():]
+        order = _ORDER.search(text)
+        price = None
+        if order:
+            price = _ORDER_PRICE.search(text[order.end():])
+            # Blank out the order so its quantity is not also read as the price
+            text = text[:order.start()] + " " * (order.end() - order.start()) + text[order.end():]
+        price = price or _PRICE.search(text)
+
+        if order:
+            if record.confirmed is not None:
+                # A new order after the previous one was settled
+                for field in OrderRecord.__slots__:
+                    setattr(record, field, None)
+            if order.group("side"):
+                record.side = "buy" if order.group("side").lower() in _BUY_WORDS else "sell"
+            record.asset = order.group("asset").upper()
+            record.quantity = _parse_number(order.group("quantity"))
+            record.details_author = author
+        if price:
+            record.price = _parse_number(price.group("price"))
+            record.details_author = author
+        if stop:
+            record.stop_loss = _parse_number(stop.group("price"))
+        wallet = _WALLET.search(message["message_text"])
+        if wallet:
+            record.wallet = wallet.group(0)
+
+        if order or price or stop:
+            # Changed terms need a fresh confirmation
+            record.confirmed = None
+            record.confirmed_at = None
+        if _CONFIRM_REQUEST.search(text):
+            record.trader = author
+        elif not (order or price) and record.complete and author not in (record.trader, record.details_author):
+            if _REJECT.search(text):
+                record.confirmed = False
+            elif _CONFIRM.search(text) or _ACKNOWLEDGE.match(text):
+                record.confirmed = True
+            if record.confirmed is not None:
+                record.customer = author
+                record.confirmed_at = message["timestamp"]
+                record.trader = record.trader or record.details_author
+        record.updated_at = message["timestamp"]
+
+    def seed(self, platform, chat_id, channel_history):
+        """Rebuild a channel's record from its history (newest first) the first time it is asked about.
+
+        Messages stored before startup never reached on_message_stored, so the incremental record
+        alone could miss the order; afterwards the listener keeps it current.
+        """
+        key = (platform, chat_id)
+        if key in self._seeded:
+            return
+        record = self._record(key)
+        for field in OrderRecord.__slots__:
+            setattr(record, field, None)
+        for row in reversed(channel_history):
+            self._apply(record, row)
+        self._seeded.add(key)
+
+    def forget(self, platform, chat_ids=None):
+        """Drop the records of `platform` (only `chat_ids`, if given), so they are re-seeded from history."""
+        for key in [key for key in self._records if key[0] == platform and (chat_ids is None or key[1] in chat_ids)]:
+            del self._records[key]
+            self._seeded.discard(key)
+
+    def get(self, platform, chat_id):
+        return self._records.get((platform, chat_id))
+
+    def fast_answer(self, platform, chat_id, message_text):
+        """Answer a routine confirmation request from the extracted state, or return None for the LLM."""
+        record = self._records.get((platform, chat_id))
+        question = _SLACK_MENTION.sub(" ", message_text)
+        routine = _ROUTINE_QUESTION.search(question) and not _COMPLEX_QUESTION.search(question)
+        if not routine or record is None or not record.complete:
+            self.llm_fallbacks += 1
+            return None
+        self.fast_path_answers += 1
+        metrics.LLM_CALLS_AVOIDED.inc(platform=platform)
+        return self._render(record)
+
+    @staticmethod
+    def _render(record):
+        side = f"{record.side.upper()} " if record.side else ""
+        lines = [f"💹 Order confirmation: {side}{_format_number(record.quantity)} {record.asset} @ {_format_number(record.price)}", ""]
+        if record.trader:
+            lines.append(f"Trader: {record.trader}")
+        if record.customer:
+            lines.append(f"Customer: {record.customer}")
+        lines.append(f"Asset: {record.asset}")
+        lines.append(f"Quantity: {_format_number(record.quantity)}")
+        lines.append(f"Price: {_format_number(record.price)}")
+        if record.stop_loss is not None:
+            lines.append(f"Stop-loss: {_format_number(record.stop_loss)}")
+        if record.wallet:
+            lines.append(f"Wallet: {record.wallet}")
+        lines.append("")
+        if record.confirmed is True:
+            lines.append(f"✅ Confirmed by {record.customer} at {record.confirmed_at:%Y-%m-%d %H:%M} UTC")
+        elif record.confirmed is False:
+            lines.append(f"❌ Declined by {record.customer}")
+        else:
+            lines.append("⚠️ Customer confirmation is pending")
+        return "\n".join(lines)
+
+    def describe(self, platform, chat_id):
+        """One-line summary of the extracted state for the LLM prompt, or None if nothing was found."""
+        record = self._records.get((platform, chat_id))
+        if record is None or all(getattr(record, field) is None for field in _FIELDS):
+            return None
+        values = []
+        for field in _FIELDS:
+            value = getattr(record, field)
+            if isinstance(value, (int, float)):
+                value = _format_number(value)
+            values.append(f"{field}={value if value is not None else '?'}")
+        return ", ".join(values) + f", confirmation={record.status()}"
+
+    def stats(self):
+        answered = self.fast_path_answers + self.llm_fallbacks
+        return {
+            "channels": len(self._records),
+            "messages_parsed": self.messages_parsed,
+            "fast_path_answers": self.fast_path_answers,
+            "llm_fallbacks": self.llm_fallbacks,
+            "avoided_rate": self.fast_path_answers / answered if answered else 0.0
+        }
+
+def _create_tracker():
+    if not config.ORDER_STATE_ENABLED:
+        return None
+    tracker = OrderStateTracker(max_channels=config.ORDER_STATE_MAX_CHANNELS)
+    database.add_message_listener(tracker.on_message_stored)
+    database.add_forget_listener(tracker.forget)
+    return tracker
+
+# None when order-state extraction is disabled; every question then goes to the LLM
+order_tracker = _create_tracker()
@@ -0,0 +1,50 @@
+import importlib
+import logging
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+class PlatformAdapter:
+    """A chat platform the bot can host. Its module is imported only when the platform is
+    configured, so a Telegram-only instance never loads slack_sdk and vice versa."""
+
+    __slots__ = ("name", "settings", "runner", "stats")
+
+    def __init__(self, name, settings, runner, stats=None):
+        self.name = name
+        self.settings = tuple(settings)  # core.config names that must all be set
+        self.runner = runner  # "module:function" in backend.agents, called as runner(db_pool, openai_client, lease_manager)
+        self.stats = stats  # Optional (metrics prefix, "module:function") for a stats() callable
+
+    @property
+    def configured(self):
+        return all(getattr(config, setting, None) for setting in self.settings)
+
+    @property
+    def missing(self):
+        return [setting for setting in self.settings if not getattr(config, setting, None)]
+
+    def load_runner(self):
+        return _resolve(self.runner)
+
+    def load_stats(self):
+        return (self.stats[0], _resolve(self.stats[1])) if self.stats else None
+
+def _resolve(path):
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(f".{module_name}", __package__), attribute)
+
+_registry = {}
+
+def register_platform(name, settings, runner, stats=None):
+    """Register a platform adapter; later registrations under the same name replace earlier ones."""
+    _registry[name] = PlatformAdapter(name, settings, runner, stats)
+
+def registered_platforms():
+    return list(_registry.values())
+
+def configured_platforms():
+    return [adapter for adapter in _registry.values() if adapter.configured]
+
+register_platform("telegram", ("TELEGRAM_BOT_TOKEN",), "telegram_bot:run_telegram")
+register_platform("slack", ("SLACK_BOT_TOKEN",), "slack_bot:run_slack", stats=("bot_slack_poll", "slack_bot:slack_poll_stats"))
@@ -0,0 +1,164 @@
+import logging
+import re
+from collections import OrderedDict
+from ..core import config, database
+
+logger = logging.getLogger(__name__)
+
+# tiktoken is in requirements.txt. It downloads its encoding files on first use (or reads
+# TIKTOKEN_CACHE_DIR), so without it or without them counts fall back to a ~4 chars/token estimate.
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoding = None
+_encoding_loaded = False
+# Rolling per-channel summaries of messages that have aged out of the verbatim window
+_summaries = OrderedDict()
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.encoding_for_model(config.LLM_MODEL)
+            except Exception:
+                try:
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+    return _encoding
+
+def count_tokens(text):
+    """Count tokens with the model's local tokenizer, or estimate at ~4 characters per token."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+def _compress(text, max_words):
+    words = re.sub(r"\s+", " ", text).strip().split(" ")
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + " …"
+
+class _RollingSummary:
+    """Compressed lines for a channel's older messages, newest last, folded in incrementally."""
+
+    __slots__ = ("lines", "tokens", "watermark")
+
+    def __init__(self):
+        self.lines = []  # (timestamp, line, tokens)
+        self.tokens = 0
+        self.watermark = None  # Timestamp of the newest message folded in so far
+
+    def fold(self, messages, max_tokens):
+        """Fold oldest-first messages newer than the watermark, dropping the oldest lines over budget."""
+        for row in messages:
+            if self.watermark is not None and row["timestamp"] <= self.watermark:
+                continue
+            line = f"{row['user_name']}: {_compress(row['message_text'], config.PROMPT_SUMMARY_LINE_WORDS)}"
+            tokens = count_tokens(line) + 1
+            self.lines.append((row["timestamp"], line, tokens))
+            self.tokens += tokens
+            self.watermark = row["timestamp"]
+        while self.lines and self.tokens > max_tokens:
+            self.tokens -= self.lines.pop(0)[2]
+
+    def render(self, before):
+        """Return summary lines for messages older than `before` (the oldest verbatim message)."""
+        return [line for timestamp, line, _ in self.lines if before is None or timestamp < before]
+
+def _fold_into_summary(platform, chat_id, older_rows):
+    key = (platform, chat_id)
+    summary = _summaries.get(key)
+    if summary is None:
+        summary = _RollingSummary()
+        _summaries[key] = summary
+        while len(_summaries) > config.PROMPT_SUMMARY_MAX_CHANNELS:
+            _summaries.popitem(last=False)
+    _summaries.move_to_end(key)
+    summary.fold(older_rows, config.PROMPT_SUMMARY_TOKENS)
+    return summary
+
+def forget_summaries(platform, chat_ids=None):
+    """Drop the summaries of `platform` (only `chat_ids`, if given), so they are rebuilt from history."""
+    for key in [key for key in _summaries if key[0] == platform and (chat_ids is None or key[1] in chat_ids)]:
+        del _summaries[key]
+
+database.add_forget_listener(forget_summaries)
+
+def _take_within_budget(lines, budget):
+    """Take lines in order until the token budget is spent; return (taken, tokens_used)."""
+    taken = []
+    used = 0
+    for line in lines:
+        tokens = count_tokens(line) + 1  # +1 for the newline
+        if used + tokens > budget:
+            break
+        taken.append(line)
+        used += tokens
+    return taken, used
+
+def build_prompt(platform, chat_id, channel_history, all_history, message_text, budget=None, order_state=None):
+    """Assemble the user prompt under a hard token budget.
+
+    Recent channel messages are kept verbatim, older ones are represented by the channel's
+    rolling summary, and cross-channel history fills whatever budget is left. Histories are
+    newest first. An optional one-line order_state is placed just before the question.
+    Returns (prompt, stats).
+    """
+    budget = budget or config.PROMPT_TOKEN_BUDGET
+    channel_lines = [f"{row['user_name']}: {row['message_text']}" for row in channel_history]
+    # The current channel is already in its own section, so skip it in the cross-channel block
+    other_history = [row for row in all_history if (row["platform"], row["chat_id"]) != (platform, chat_id)]
+    all_lines = [f"{row['platform']} - {row['chat_id']} - {row['user_name']}: {row['message_text']}" for row in other_history]
+
+    question_section = f"Question:\n{message_text}"
+    if order_state:
+        question_section = f"Extracted order state (rule-based, may be incomplete):\n{order_state}\n\n{question_section}"
+    headers = [
+        "All chat history (for learning):",
+        f"Earlier in this {platform} channel (summary):",
+        f"Current {platform} channel history (for answering):"
+    ]
+    remaining = budget - count_tokens(question_section) - sum(count_tokens(header) + 2 for header in headers)
+
+    verbatim, channel_tokens = _take_within_budget(channel_lines, int(remaining * config.PROMPT_CHANNEL_SHARE))
+    remaining -= channel_tokens
+
+    older_rows = list(reversed(channel_history[len(verbatim):]))
+    summary = _fold_into_summary(platform, chat_id, older_rows)
+    oldest_verbatim = channel_history[len(verbatim) - 1]["timestamp"] if verbatim else None
+    summary_lines, summary_tokens = _take_within_budget(
+        list(reversed(summary.render(oldest_verbatim))), min(remaining, config.PROMPT_SUMMARY_TOKENS)
+    )
+    summary_lines.reverse()
+    remaining -= summary_tokens
+
+    learning, learning_tokens = _take_within_budget(all_lines, max(remaining, 0))
+
+    sections = [headers[0] + "\n" + "\n".join(learning)]
+    if summary_lines:
+        sections.append(headers[1] + "\n" + "\n".join(summary_lines))
+    sections.append(headers[2] + "\n" + "\n".join(verbatim))
+    sections.append(question_section)
+    prompt = "\n\n".join(sections)
+
+    prompt_tokens = count_tokens(prompt)
+    # What the prompt used to be: every channel and global message verbatim
+    raw_tokens = count_tokens(
+        "\n".join(f"{row['platform']} - {row['chat_id']} - {row['user_name']}: {row['message_text']}" for row in all_history)
+        + "\n" + "\n".join(channel_lines) + "\n" + question_section
+    )
+    stats = {
+        "prompt_tokens": prompt_tokens,
+        "raw_tokens": raw_tokens,
+        "saved_tokens": max(raw_tokens - prompt_tokens, 0),
+        "verbatim_messages": len(verbatim),
+        "summary_lines": len(summary_lines),
+        "learning_messages": len(learning)
+    }
+    return prompt, stats
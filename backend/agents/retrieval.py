@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+import re
+from datetime import datetime
+from ..core import config, database
+
+logger = logging.getLogger(__name__)
+
+def _message_key(message):
+    return message["platform"], message["chat_id"], message["timestamp"], message["message_text"]
+
+class HashingEmbedder:
+    """Deterministic local embedder (signed feature hashing of words and bigrams). No network."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    async def embed(self, texts, client=None):
+        import numpy as np
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vectors
+
+class OpenAIEmbedder:
+    """Embeds through the OpenAI embeddings endpoint, using the caller's loop-bound client."""
+
+    def __init__(self, model="text-embedding-3-small", dim=256):
+        self.model = model
+        self.dim = dim
+
+    async def embed(self, texts, client=None):
+        import numpy as np
+        response = await client.embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+class RetrievalIndex:
+    """Embedding index over group_messages, fed incrementally from store_message.
+
+    New messages are queued by a cheap listener and embedded in batches, either by
+    the background indexer or just before a search.
+    """
+
+    def __init__(self, embedder, capacity=200000, path=None):
+        from ..core.vector_index import VectorIndex  # numpy loads only once retrieval is enabled
+        self.embedder = embedder
+        self.path = path
+        if path and VectorIndex.exists(path):
+            self.index = VectorIndex.load(path, capacity=capacity)
+        else:
+            self.index = VectorIndex(embedder.dim, capacity=capacity)
+        self._pending = []
+
+    def on_message_stored(self, message):
+        self._pending.append(message)
+
+    async def index_pending(self, client=None, batch_size=256):
+        """Embed and add every queued message."""
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            try:
+                vectors = await self.embedder.embed([m["message_text"] for m in batch], client)
+            except Exception as e:
+                self._pending[:0] = pending[start:]
+                logger.error(f"Embedding error for {len(batch)} messages: {e}")
+                return
+            self.index.add(vectors, [
+                {key: m[key] for key in ("platform", "chat_id", "user_name", "message_text", "timestamp")}
+                for m in batch
+            ])
+
+    def newest_timestamp(self):
+        """Timestamp of the newest indexed message, or None for an empty index."""
+        newest = None
+        for meta in self.index.metadata():
+            timestamp = meta["timestamp"]
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp)  # Metadata loaded from disk
+            if newest is None or timestamp > newest:
+                newest = timestamp
+        return newest
+
+    async def backfill(self, db_pool, client=None, limit=10000):
+        """Index stored messages the index does not hold yet, at most the `limit` newest.
+
+        An empty index is seeded with recent history; one loaded from disk catches up on
+        what was stored after it was saved, e.g. while the bot was down.
+        """
+        newest = self.newest_timestamp()
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT platform, chat_id, user_name, message_text, timestamp FROM group_messages
+                {"WHERE timestamp > $2" if newest else ""} ORDER BY timestamp DESC LIMIT $1
+                """,
+                limit, *([newest] if newest else [])
+            )
+        # The listener may already have queued messages stored since startup
+        queued = {_message_key(message) for message in self._pending}
+        missing = [dict(row) for row in reversed(rows) if _message_key(row) not in queued]
+        self._pending[:0] = missing
+        await self.index_pending(client)
+        logger.info(f"Retrieval index backfilled with {len(missing)} messages"
+                    + (f" newer than {newest.isoformat()}" if newest else ""))
+
+    async def search(self, query_text, k=None, client=None, exclude_chat=None):
+        """Return the k stored messages most similar to query_text, best first."""
+        await self.index_pending(client)
+        query = (await self.embedder.embed([query_text], client))[0]
+        exclude = None
+        if exclude_chat:
+            exclude = lambda meta: (meta["platform"], meta["chat_id"]) == exclude_chat
+        return [meta for _, meta in self.index.search(query, k or config.RETRIEVAL_TOP_K, exclude=exclude)]
+
+    async def run_indexer(self, client=None, interval=1.0):
+        """Embed queued messages in the background until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.index_pending(client)
+        finally:
+            if self.path:
+                self.index.save(self.path)
+
+def _create_index():
+    if config.RETRIEVAL_EMBEDDER == "openai":
+        embedder = OpenAIEmbedder(model=config.RETRIEVAL_EMBEDDING_MODEL, dim=config.RETRIEVAL_DIM)
+    elif config.RETRIEVAL_EMBEDDER == "hashing":
+        embedder = HashingEmbedder(dim=config.RETRIEVAL_DIM)
+    else:
+        return None
+    index = RetrievalIndex(embedder, capacity=config.RETRIEVAL_CAPACITY, path=config.RETRIEVAL_INDEX_PATH)
+    database.add_message_listener(index.on_message_stored)
+    return index
+
+# None when retrieval is disabled; answer_question then falls back to recent global history
+retrieval_index = _create_index()
@@ -1,12 +1,36 @@
 import logging
+from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 import asyncio
 import time
-from ..core import database
-from . import llm_agent
+from collections import OrderedDict
+from ..core import config, database, logging_config, metrics, startup_profile
+from .job_queue import mention_queue
+from .streaming import Responder
+from .user_directory import user_directory
 
 logger = logging.getLogger(__name__)
 
+class SlackResponder(Responder):
+    """Posts and updates replies with the Slack WebClient, off the event loop."""
+
+    min_edit_interval = config.SLACK_EDIT_INTERVAL
+
+    def __init__(self, slack_client):
+        self.slack_client = slack_client
+
+    async def send(self, chat_id, text):
+        try:
+            with metrics.platform_call("slack", "chat_postMessage"):
+                response = await asyncio.to_thread(self.slack_client.chat_postMessage, channel=chat_id, text=text)
+            return response["ts"]
+        except SlackApiError as e:
+            logger.error(f"Slack API error sending message: {e}")
+
+    async def edit(self, chat_id, message_ref, text):
+        with metrics.platform_call("slack", "chat_update"):
+            await asyncio.to_thread(self.slack_client.chat_update, channel=chat_id, ts=message_ref, text=text)
+
 async def fetch_slack_channels(client):
     """Fetch all public and private channels the bot is a member of."""
     all_channels = []
@@ -14,7 +38,8 @@ async def fetch_slack_channels(client):
 
     while True:
         try:
-            response = client.conversations_list(
+            response = await asyncio.to_thread(
+                client.conversations_list,
                 types="public_channel,private_channel",
                 limit=1000,
                 cursor=cursor
@@ -33,71 +58,336 @@ async def fetch_slack_channels(client):
     logger.info(f"Bot is a member of {len(member_channels)} channels - {[channel['name'] for channel in member_channels]}")
     return member_channels
 
-# Slack polling function
-async def poll_slack_messages(db_pool, slack_client, bot_name, openai_client, interval=5, channel_refresh_interval=3600):
-    """Poll all Slack channels the bot is in for new messages."""
-    channel_last_ts = {}
-    last_channel_fetch_time = 0
-    member_channels = []
+# The poller's cursor per channel: everything up to this Slack ts has been read from
+# conversations.history. Push events never move it, so after a Socket Mode disconnect the
+# catch-up poll re-reads the gap instead of resuming from the first event after reconnect.
+channel_last_ts = {}
+# Channels whose cursor moved since it was last persisted to channel_cursors
+_dirty_cursors = set()
+# Recently ingested (channel, ts) pairs, so retried or replayed events are not stored or answered twice
+_seen_messages = OrderedDict()
+_SEEN_MESSAGES_LIMIT = 10000
 
-    while True:
-        current_time = time.time()
-        # Refresh channel list every hour (3600 seconds)
-        if current_time - last_channel_fetch_time >= channel_refresh_interval:
-            member_channels = await fetch_slack_channels(slack_client)
-            last_channel_fetch_time = current_time
-            logger.info(f"Refreshed Slack channel list: {len(member_channels)} channels")
+def _mark_seen(channel_id, ts):
+    """Record a message as ingested; return False if it was already seen."""
+    key = (channel_id, ts)
+    if key in _seen_messages:
+        return False
+    _seen_messages[key] = None
+    if len(_seen_messages) > _SEEN_MESSAGES_LIMIT:
+        _seen_messages.popitem(last=False)
+    return True
 
-        if not member_channels:
-            member_channels = await fetch_slack_channels(slack_client)
-            last_channel_fetch_time = current_time
+def _advance_cursor(channel_id, ts, dirty=True):
+    last_ts = channel_last_ts.get(channel_id)
+    if not last_ts or float(ts) > float(last_ts):
+        channel_last_ts[channel_id] = ts
+        if dirty:
+            _dirty_cursors.add(channel_id)
 
-        try:
-            bot_user_id = slack_client.auth_test()["user_id"]
+async def _restore_cursors(db_pool, chat_ids=None):
+    """Merge persisted cursors into channel_last_ts so restarts and failovers resume where ingestion stopped."""
+    for channel_id, ts in (await database.load_channel_cursors(db_pool, "slack", chat_ids)).items():
+        _advance_cursor(channel_id, ts, dirty=False)
 
-            for channel in member_channels:
-                channel_id = channel["id"]
-                last_ts = channel_last_ts.get(channel_id)
+async def _persist_cursors(db_pool):
+    cursors = {channel_id: channel_last_ts[channel_id] for channel_id in _dirty_cursors}
+    _dirty_cursors.clear()
+    if not await database.save_channel_cursors(db_pool, "slack", cursors):
+        _dirty_cursors.update(cursors)  # Retry on the next flush
+
+async def process_slack_message(db_pool, slack_client, channel_id, msg, bot_user_id, bot_name, openai_client):
+    """Store a single Slack message and answer it if the bot is mentioned.
+
+    Shared by the event-driven receiver and the polling fallback.
+    """
+    ts = msg.get("ts")
+    message_text = msg.get("text")
+    user_id = msg.get("user")
+    chat_id = channel_id
+
+    if not ts or not _mark_seen(channel_id, ts):
+        return
+    if not user_id or not message_text or user_id == bot_user_id:
+        return
+
+    user_name = await user_directory.resolve_slack(slack_client, user_id)
+
+    mentioned = bot_name in message_text
+    # Only a mention stored for the first time is answered; a duplicate was already answered by
+    # whichever run or instance stored it, e.g. before a crash or a lease hand-off
+    inserted = await database.store_message(db_pool, "slack", chat_id, user_id, user_name, message_text,
+                                            slack_ts=ts, confirm=mentioned)
+
+    if mentioned and inserted:
+        mention_queue.submit("slack", chat_id, message_text, db_pool, SlackResponder(slack_client), openai_client)
 
-                # Fetch recent messages
-                result = slack_client.conversations_history(channel=channel_id, limit=10, oldest=last_ts)
-                messages = result["messages"]
-                messages.reverse()
+_bot_user_ids = {}
 
-                for msg in messages:
-                    ts = msg.get("ts")
-                    if last_ts and float(ts) <= float(last_ts):
-                        continue  # Skip already processed messages
+async def get_bot_user_id(slack_client):
+    """Return the bot's own user id, calling auth_test only once per token."""
+    bot_user_id = _bot_user_ids.get(slack_client.token)
+    if bot_user_id is None:
+        bot_user_id = (await asyncio.to_thread(slack_client.auth_test))["user_id"]
+        _bot_user_ids[slack_client.token] = bot_user_id
+    return bot_user_id
 
-                    message_text = msg.get("text")
-                    user_id = msg.get("user")
-                    chat_id = channel_id
+class SlackRateLimiter:
+    """Token bucket for one Slack API method tier that also honors Retry-After pauses."""
 
-                    if not user_id or not message_text or msg.get("user") == bot_user_id:
-                        continue
+    def __init__(self, rate_per_minute=50, burst=10):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
 
-                    try:
-                        user_name = slack_client.users_info(user=user_id)["user"]["real_name"]
-                    except SlackApiError as e:
-                        logger.error(f"Failed to fetch Slack user info: {e}")
-                        user_name = "Unknown User"
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
 
-                    await database.store_message(db_pool, "slack", chat_id, user_id, user_name, message_text, slack_ts=ts)
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds`, as asked by a 429 Retry-After header."""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        logger.warning(f"Slack rate limited; pausing conversations.history for {seconds}s")
 
-                    if bot_name in message_text:
-                        async def slack_response(chat_id, text):
-                            try:
-                                slack_client.chat_postMessage(channel=chat_id, text=text)
-                            except SlackApiError as e:
-                                logger.error(f"Slack API error sending message: {e}")
-                        await llm_agent.answer_question("slack", chat_id, message_text, db_pool, slack_response, openai_client)
+class _ChannelPollState:
+    """Adaptive poll schedule and lag metrics for one channel."""
 
-                    channel_last_ts[channel_id] = ts  # Update timestamp to avoid reprocessing
+    __slots__ = ("interval", "next_due", "lag", "max_lag", "polls", "active_polls")
 
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_due = 0.0
+        self.lag = 0.0  # Seconds between a message being posted and being ingested, for the latest poll
+        self.max_lag = 0.0
+        self.polls = 0
+        self.active_polls = 0
+
+    def reschedule(self, active, min_interval, max_interval, backoff):
+        """Speed up to the minimum interval after activity; back off geometrically while idle."""
+        self.polls += 1
+        if active:
+            self.active_polls += 1
+            self.interval = min_interval
+        else:
+            self.interval = min(self.interval * backoff, max_interval)
+        self.next_due = time.monotonic() + self.interval
+
+# Per-channel poll state of the running poller, exposed through slack_poll_stats()
+_poll_states = {}
+_history_limiter = SlackRateLimiter(config.SLACK_HISTORY_RATE_PER_MINUTE, config.SLACK_HISTORY_BURST)
+
+def slack_poll_stats():
+    """Per-channel poll interval and ingestion lag, plus rate-limit counters."""
+    return {
+        "throttled": _history_limiter.throttled,
+        "channels": {
+            channel_id: {
+                "interval": state.interval,
+                "lag": state.lag,
+                "max_lag": state.max_lag,
+                "polls": state.polls,
+                "active_polls": state.active_polls
+            }
+            for channel_id, state in _poll_states.items()
+        }
+    }
+
+async def _fetch_new_messages(slack_client, channel_id, last_ts):
+    """Page through conversations.history back to last_ts and return the new messages oldest first.
+
+    Pages arrive newest first, so nothing is ingested until the gap is fully read; a failure
+    part way leaves the cursor untouched for the next poll. A channel without a cursor is
+    seeded from its latest page only; older history is the backfill command's job.
+    """
+    messages = []
+    cursor = None
+    while True:
+        await _history_limiter.acquire()
+        with metrics.platform_call("slack", "conversations_history"):
+            result = await asyncio.to_thread(slack_client.conversations_history, channel=channel_id, oldest=last_ts,
+                                             limit=config.SLACK_HISTORY_PAGE_SIZE, cursor=cursor)
+        messages.extend(result["messages"])
+        cursor = result.get("response_metadata", {}).get("next_cursor")
+        if not last_ts or not result.get("has_more") or not cursor:
+            break
+    messages.reverse()
+    return messages
+
+async def _poll_channel(db_pool, slack_client, channel_id, state, bot_user_id, bot_name, openai_client, semaphore, interval, max_interval):
+    """Fetch and ingest new messages for one channel, then reschedule it."""
+    active = False
+    async with semaphore:
+        try:
+            last_ts = channel_last_ts.get(channel_id)
+            messages = await _fetch_new_messages(slack_client, channel_id, last_ts)
+
+            for msg in messages:
+                ts = msg.get("ts")
+                if last_ts and float(ts) <= float(last_ts):
+                    continue  # Skip already processed messages
+                active = True
+                state.lag = max(time.time() - float(ts), 0.0)
+                state.max_lag = max(state.max_lag, state.lag)
+                await process_slack_message(db_pool, slack_client, channel_id, msg, bot_user_id, bot_name, openai_client)
+                _advance_cursor(channel_id, ts)
+
+            if logging_config.sampled("slack_poll", logger, logging.DEBUG):
                 logger.debug(f"Polled Slack channel {channel_id}, last_ts: {channel_last_ts.get(channel_id)}")
         except SlackApiError as e:
-            logger.error(f"Slack polling error: {e}")
+            if e.response.status_code == 429:
+                _history_limiter.pause(int(e.response.headers.get("Retry-After", 30)))
+            else:
+                logger.error(f"Slack polling error in {channel_id}: {e}")
         except Exception as e:
-            logger.error(f"Unexpected error in Slack polling: {e}")
+            logger.error(f"Unexpected error polling Slack channel {channel_id}: {e}")
+    state.reschedule(active, interval, max_interval, config.SLACK_POLL_BACKOFF)
+
+# Slack polling function
+async def poll_slack_messages(db_pool, slack_client, bot_name, openai_client, interval=5, channel_refresh_interval=3600,
+                              max_interval=None, concurrency=None, lease_manager=None):
+    """Poll all Slack channels the bot is in for new messages.
+
+    Channels are polled concurrently (at most `concurrency` at once) on their own adaptive
+    schedule between `interval` and `max_interval`, and conversations.history calls share
+    a token bucket that honors Slack's Retry-After. Cursors are persisted so a restart
+    resumes where it stopped; with a lease_manager only this instance's share of the
+    channels is polled. With push ingestion enabled this runs as a catch-up fallback on a
+    long interval.
+    """
+    max_interval = max(interval, max_interval or config.SLACK_POLL_MAX_INTERVAL)
+    semaphore = asyncio.Semaphore(concurrency or config.SLACK_POLL_CONCURRENCY)
+    in_flight = {}
+    last_channel_fetch_time = 0
+    last_cursor_flush = time.monotonic()
+    member_channels = []
+    owned = None
+    bot_user_id = None
+
+    await _restore_cursors(db_pool)
+    try:
+        while True:
+            current_time = time.time()
+            # Refresh channel list every hour (3600 seconds)
+            if current_time - last_channel_fetch_time >= channel_refresh_interval or not member_channels:
+                member_channels = await fetch_slack_channels(slack_client)
+                last_channel_fetch_time = current_time
+                logger.info(f"Refreshed Slack channel list: {len(member_channels)} channels")
+                member_ids = {channel["id"] for channel in member_channels}
+                for channel_id in list(_poll_states):
+                    if channel_id not in member_ids:
+                        del _poll_states[channel_id]
+                if lease_manager:
+                    lease_manager.set_channels("slack", member_ids)
+
+            if lease_manager:
+                now_owned = lease_manager.owned("slack")
+                if now_owned != owned:
+                    # Channels taken over from another instance resume from its last persisted cursor
+                    gained = now_owned - (owned or set())
+                    if gained:
+                        database.forget_channels("slack", gained)
+                        await _restore_cursors(db_pool, gained)
+                    owned = now_owned
 
-        await asyncio.sleep(interval)
+            if time.monotonic() - last_cursor_flush >= config.CURSOR_FLUSH_INTERVAL:
+                await _persist_cursors(db_pool)
+                last_cursor_flush = time.monotonic()
+
+            if bot_user_id is None:
+                try:
+                    bot_user_id = await get_bot_user_id(slack_client)
+                except SlackApiError as e:
+                    logger.error(f"Slack auth_test error: {e}")
+                    await asyncio.sleep(interval)
+                    continue
+
+            now = time.monotonic()
+            for channel in member_channels:
+                channel_id = channel["id"]
+                if owned is not None and channel_id not in owned:
+                    continue
+                state = _poll_states.setdefault(channel_id, _ChannelPollState(interval))
+                if state.next_due <= now and channel_id not in in_flight:
+                    task = asyncio.create_task(_poll_channel(db_pool, slack_client, channel_id, state, bot_user_id,
+                                                             bot_name, openai_client, semaphore, interval, max_interval))
+                    in_flight[channel_id] = task
+                    task.add_done_callback(lambda _, channel_id=channel_id: in_flight.pop(channel_id, None))
+
+            next_due = min((state.next_due for state in _poll_states.values()), default=now + interval)
+            await asyncio.sleep(min(max(next_due - time.monotonic(), 0.1), 1.0))
+    finally:
+        for task in in_flight.values():
+            task.cancel()
+        await asyncio.gather(*in_flight.values(), return_exceptions=True)
+        await _persist_cursors(db_pool)
+
+async def run_slack(db_pool, openai_client, lease_manager=None):
+    """Ingest Slack via Socket Mode when an app token is set, with polling kept as a catch-up fallback.
+
+    Every channel is ingested and answered by exactly one instance, so the per-process history,
+    order-state and answer caches see all of its messages. Polling alone is split by channel
+    leases. Socket Mode delivers each event to whichever connection Slack picks, so it cannot
+    be split by channel: with sharding, only the instance holding the Slack singleton lease
+    connects and handles every channel, and another takes over if it dies.
+    """
+    slack_client = WebClient(token=config.SLACK_BOT_TOKEN)
+    await user_directory.warm_slack(slack_client)
+    startup_profile.milestone("slack_directory_warm")
+    if not config.SLACK_APP_TOKEN:
+        await poll_slack_messages(db_pool, slack_client, config.SLACK_BOT_NAME, openai_client,
+                                  interval=config.SLACK_POLL_INTERVAL, lease_manager=lease_manager)
+        return
+    # Socket Mode pulls in aiohttp, so it is only imported when an app token is configured
+    from . import slack_events
+
+    async def ingest():
+        tasks = [
+            asyncio.create_task(slack_events.run_socket_mode(db_pool, slack_client, config.SLACK_APP_TOKEN,
+                                                             config.SLACK_BOT_NAME, openai_client)),
+            asyncio.create_task(poll_slack_messages(db_pool, slack_client, config.SLACK_BOT_NAME, openai_client,
+                                                    interval=config.SLACK_CATCHUP_INTERVAL))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    if lease_manager is None:
+        await ingest()
+        return
+    lease_manager.want_singleton("slack")
+    while True:
+        while not lease_manager.holds_singleton("slack"):
+            await lease_manager.wait_for_change()
+        database.forget_channels("slack")
+        task = asyncio.create_task(ingest())
+        try:
+            while lease_manager.holds_singleton("slack") and not task.done():
+                change = asyncio.ensure_future(lease_manager.wait_for_change())
+                await asyncio.wait({task, change}, return_when=asyncio.FIRST_COMPLETED)
+                change.cancel()
+            if task.done():
+                task.result()  # Let the supervisor restart a crashed receiver
+                return
+            logger.warning("Lost the Slack lease; handing Socket Mode over to another instance")
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
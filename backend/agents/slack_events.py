@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+from slack_sdk.socket_mode.aiohttp import SocketModeClient
+from slack_sdk.socket_mode.response import SocketModeResponse
+from slack_sdk.web.async_client import AsyncWebClient
+from ..core import startup_profile
+from . import slack_bot
+
+logger = logging.getLogger(__name__)
+
+# Message subtypes that carry a new user-authored message; edits, deletions and joins are ignored
+INGESTED_SUBTYPES = {None, "thread_broadcast", "file_share"}
+
+def _unwrap_event(payload):
+    """Return the inner event from a Socket Mode envelope, an Events API callback or a bare event."""
+    if "payload" in payload:
+        payload = payload["payload"]
+    if payload.get("type") == "event_callback":
+        return payload.get("event")
+    return payload
+
+async def handle_slack_event(payload, db_pool, slack_client, bot_user_id, bot_name, openai_client):
+    """Feed one Slack event into the same store/answer path as the poller."""
+    event = _unwrap_event(payload)
+    if not event or event.get("type") != "message" or event.get("subtype") not in INGESTED_SUBTYPES:
+        return
+    channel_id = event.get("channel")
+    if not channel_id:
+        return
+    await slack_bot.process_slack_message(db_pool, slack_client, channel_id, event, bot_user_id, bot_name, openai_client)
+
+async def run_socket_mode(db_pool, slack_client, app_token, bot_name, openai_client):
+    """Receive Slack messages over Socket Mode until cancelled."""
+    bot_user_id = await slack_bot.get_bot_user_id(slack_client)
+    socket_client = SocketModeClient(app_token=app_token, web_client=AsyncWebClient(token=slack_client.token))
+
+    async def listener(client, req):
+        if req.type != "events_api":
+            return
+        # Acknowledge first so Slack does not retry while we store and answer
+        await client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id))
+        try:
+            await handle_slack_event(req.payload, db_pool, slack_client, bot_user_id, bot_name, openai_client)
+        except Exception as e:
+            logger.error(f"Unexpected error handling Slack event: {e}")
+
+    socket_client.socket_mode_request_listeners.append(listener)
+    await socket_client.connect()
+    logger.info("Slack Socket Mode connected")
+    startup_profile.milestone("slack_socket_mode")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await socket_client.close()
+        logger.info("Slack Socket Mode disconnected")
+
+async def replay_slack_events(path, db_pool, slack_client, bot_user_id, bot_name, openai_client, delay=0):
+    """Replay recorded Slack event payloads (one JSON object per line) as a local event source.
+
+    Lines may be Socket Mode envelopes, Events API callbacks or bare message events.
+    """
+    count = 0
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            await handle_slack_event(json.loads(line), db_pool, slack_client, bot_user_id, bot_name, openai_client)
+            count += 1
+            if delay:
+                await asyncio.sleep(delay)
+    logger.info(f"Replayed {count} Slack events from {path}")
+    return count
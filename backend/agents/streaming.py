@@ -0,0 +1,84 @@
+import abc
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Responder(abc.ABC):
+    """Posts and edits bot replies on one platform.
+
+    Instances are still valid response_func callables: `await responder(chat_id, text)`
+    posts a message. Subclasses implement send() (returning a reference to the posted
+    message) and edit(), and set min_edit_interval to the platform's edit rate limit.
+    """
+
+    min_edit_interval = 1.0
+
+    async def __call__(self, chat_id, text):
+        await self.send(chat_id, text)
+
+    @abc.abstractmethod
+    async def send(self, chat_id, text):
+        """Post a new message and return a reference edit() accepts."""
+
+    @abc.abstractmethod
+    async def edit(self, chat_id, message_ref, text):
+        """Replace the text of a message posted by send()."""
+
+class StreamingReply:
+    """One reply that starts as a placeholder and is progressively edited as text streams in.
+
+    Edits are throttled to the responder's min_edit_interval; the final text is always written.
+    """
+
+    def __init__(self, responder, chat_id, placeholder="⏳ …"):
+        self.responder = responder
+        self.chat_id = chat_id
+        self.placeholder = placeholder
+        self.message_ref = None
+        self.edits = 0
+        self._shown = None
+        self._last_edit = 0.0
+
+    async def start(self):
+        """Post the placeholder right away so the user sees the bot is working."""
+        try:
+            self.message_ref = await self.responder.send(self.chat_id, self.placeholder)
+            self._shown = self.placeholder
+            self._last_edit = time.monotonic()
+        except Exception as e:
+            logger.error(f"Failed to post placeholder in {self.chat_id}: {e}")
+
+    async def update(self, text):
+        """Show partial text if the platform's edit interval has elapsed since the last edit."""
+        if self.message_ref is None or not text.strip():
+            return
+        if time.monotonic() - self._last_edit < self.responder.min_edit_interval:
+            return
+        await self._edit(text + " …")
+
+    async def finish(self, text):
+        """Write the final text, falling back to a fresh message if the placeholder never posted or cannot be edited."""
+        if self.message_ref is not None:
+            wait = self.responder.min_edit_interval - (time.monotonic() - self._last_edit)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if await self._edit(text):
+                return
+        await self.responder.send(self.chat_id, text)
+
+    async def _edit(self, text):
+        """Edit the reply; returns False if the platform rejected the edit."""
+        if text == self._shown:
+            return True  # Platforms reject no-op edits
+        try:
+            await self.responder.edit(self.chat_id, self.message_ref, text)
+            self._shown = text
+            self.edits += 1
+            return True
+        except Exception as e:
+            logger.error(f"Failed to edit reply in {self.chat_id}: {e}")
+            return False
+        finally:
+            self._last_edit = time.monotonic()
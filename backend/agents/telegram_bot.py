@@ -1,21 +1,82 @@
+import asyncio
 import logging
+from functools import partial
 from telegram import Update
-from telegram.ext import ContextTypes
-from ..core import database
-from . import llm_agent
+from telegram.ext import Application as TelegramApp, ContextTypes, MessageHandler, filters
+from ..core import config, database, metrics, startup_profile
+from .job_queue import mention_queue
+from .streaming import Responder
+from .user_directory import user_directory
 
 logger = logging.getLogger(__name__)
 
+class TelegramResponder(Responder):
+    """Sends and edits replies through the Telegram bot API."""
+
+    min_edit_interval = config.TELEGRAM_EDIT_INTERVAL
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def send(self, chat_id, text):
+        with metrics.platform_call("telegram", "send_message"):
+            message = await self.bot.send_message(chat_id=chat_id, text=text)
+        return message.message_id
+
+    async def edit(self, chat_id, message_ref, text):
+        with metrics.platform_call("telegram", "edit_message_text"):
+            await self.bot.edit_message_text(chat_id=chat_id, message_id=message_ref, text=text)
+
 # Telegram handler
 async def handle_telegram_message(update: Update, context: ContextTypes.DEFAULT_TYPE, db_pool, client, bot_name):
     message_text = update.message.text
     user_id = str(update.message.from_user.id)
     user_name = update.message.from_user.first_name
+    if user_name:
+        user_directory.put("telegram", user_id, user_name)
+    else:
+        user_name = user_directory.get("telegram", user_id) or "Unknown User"
     chat_id = str(update.message.chat_id)
 
-    await database.store_message(db_pool, "telegram", chat_id, user_id, user_name, message_text)
+    mentioned = bot_name in message_text
+    # Behind the write buffer a mention is flushed right away, so it and the messages before it
+    # are in the history the answer is built from
+    await database.store_message(db_pool, "telegram", chat_id, user_id, user_name, message_text, confirm=mentioned)
+
+    if mentioned:
+        mention_queue.submit("telegram", chat_id, message_text, db_pool, TelegramResponder(context.bot), client)
+
+async def run_telegram(db_pool, openai_client, lease_manager=None):
+    """Run the Telegram application on the shared loop until cancelled.
+
+    Telegram allows one getUpdates consumer per bot token, so with sharding only the
+    instance holding the Telegram singleton lease polls, and another takes over if it dies.
+    """
+    if lease_manager:
+        lease_manager.want_singleton("telegram")
+    while True:
+        while lease_manager and not lease_manager.holds_singleton("telegram"):
+            await lease_manager.wait_for_change()
+        if lease_manager:
+            # Another instance handled Telegram while we did not hold the lease
+            database.forget_channels("telegram")
 
-    if bot_name in message_text:
-        async def telegram_response(chat_id, text):
-            await context.bot.send_message(chat_id=chat_id, text=text)
-        await llm_agent.answer_question("telegram", chat_id, message_text, db_pool, telegram_response, client)
+        telegram_app = TelegramApp.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+        telegram_app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.GROUPS,
+                                                partial(handle_telegram_message, db_pool=db_pool, client=openai_client, bot_name=config.TELEGRAM_BOT_NAME)))
+        async with telegram_app:
+            await telegram_app.start()
+            await telegram_app.updater.start_polling(allowed_updates=None)
+            logger.info("Telegram polling started")
+            startup_profile.milestone("telegram_polling")
+            try:
+                if lease_manager is None:
+                    await asyncio.Event().wait()
+                while lease_manager.holds_singleton("telegram"):
+                    # Keep polling until another instance takes the lease over
+                    await lease_manager.wait_for_change()
+                logger.warning("Lost the Telegram lease; handing polling over to another instance")
+            finally:
+                await telegram_app.updater.stop()
+                await telegram_app.stop()
+                logger.info("Telegram polling stopped")
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+class UserDirectory:
+    """Display-name cache keyed by (platform, user_id), with TTL and LRU eviction.
+
+    Lookups are plain dict reads; stale entries are served immediately and refreshed
+    in the background. Every platform shares one instance on the bot's event loop.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = OrderedDict()  # (platform, user_id) -> (user_name, fetched_at)
+        self._refreshing = set()
+
+    def get(self, platform, user_id):
+        """Return the cached name, or None on a miss. Stale names are still returned."""
+        key = (platform, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if time.monotonic() - entry[1] > self.ttl:
+            self.stale_hits += 1
+        return entry[0]
+
+    def is_stale(self, platform, user_id):
+        entry = self._entries.get((platform, user_id))
+        return entry is None or time.monotonic() - entry[1] > self.ttl
+
+    def put(self, platform, user_id, user_name):
+        key = (platform, user_id)
+        self._entries[key] = (user_name, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    async def resolve_slack(self, slack_client, user_id):
+        """Resolve a Slack user's real name, hitting the API only on a cold miss."""
+        user_name = self.get("slack", user_id)
+        if user_name is None:
+            return await self._fetch_slack_user(slack_client, user_id)
+        if self.is_stale("slack", user_id) and ("slack", user_id) not in self._refreshing:
+            self._refreshing.add(("slack", user_id))
+            task = asyncio.create_task(self._fetch_slack_user(slack_client, user_id))
+            task.add_done_callback(lambda _: self._refreshing.discard(("slack", user_id)))
+        return user_name
+
+    async def _fetch_slack_user(self, slack_client, user_id):
+        from slack_sdk.errors import SlackApiError  # Imported here so Telegram-only instances never load slack_sdk
+        try:
+            response = await asyncio.to_thread(slack_client.users_info, user=user_id)
+        except SlackApiError as e:
+            logger.error(f"Failed to fetch Slack user info: {e}")
+            return self.get("slack", user_id) or "Unknown User"
+        user_name = slack_display_name(response["user"])
+        self.put("slack", user_id, user_name)
+        return user_name
+
+    async def warm_slack(self, slack_client):
+        """Bulk-load every workspace member through users_list pagination."""
+        from slack_sdk.errors import SlackApiError
+        cursor = None
+        loaded = 0
+        while True:
+            try:
+                response = await asyncio.to_thread(slack_client.users_list, limit=200, cursor=cursor)
+            except SlackApiError as e:
+                logger.error(f"Error warming Slack user directory: {e.response['error']}")
+                break
+            for member in response["members"]:
+                self.put("slack", member["id"], slack_display_name(member))
+                loaded += 1
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                break
+        logger.info(f"Warmed Slack user directory with {loaded} users")
+        return loaded
+
+def slack_display_name(user):
+    return user.get("real_name") or user.get("profile", {}).get("real_name") or user.get("name") or "Unknown User"
+
+# Shared by the Slack and Telegram ingestion paths
+user_directory = UserDirectory(max_size=config.USER_CACHE_MAX_SIZE, ttl=config.USER_CACHE_TTL)
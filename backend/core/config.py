@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,11 +14,128 @@ DB_CONFIG = {
     'password': os.environ.get("DB_PASSWORD", "")
 }
 
+# Write-behind message buffer
+DB_WRITE_BUFFER = os.environ.get("DB_WRITE_BUFFER", "false").lower() in ("1", "true", "yes")
+DB_WRITE_BATCH_SIZE = int(os.environ.get("DB_WRITE_BATCH_SIZE", 500))  # Flush once this many messages are pending
+DB_WRITE_FLUSH_INTERVAL = float(os.environ.get("DB_WRITE_FLUSH_INTERVAL", 0.5))  # Seconds between timed flushes
+DB_WRITE_MAX_PENDING = int(os.environ.get("DB_WRITE_MAX_PENDING", 50000))  # Rows kept for retry while Postgres is down
+
+# Monthly group_messages partitions and retention
+DB_PARTITION_PREMAKE_MONTHS = int(os.environ.get("DB_PARTITION_PREMAKE_MONTHS", 3))  # Future partitions kept ready
+DB_RETENTION_DAYS = int(os.environ.get("DB_RETENTION_DAYS", 0))  # Expire partitions older than this; 0 keeps everything
+DB_ARCHIVE_SCHEMA = os.environ.get("DB_ARCHIVE_SCHEMA", "")  # Move expired partitions here instead of dropping them
+DB_MAINTENANCE_INTERVAL = float(os.environ.get("DB_MAINTENANCE_INTERVAL", 3600))  # Seconds between maintenance runs
+
+# In-memory history cache
+HISTORY_CACHE_DEPTH = int(os.environ.get("HISTORY_CACHE_DEPTH", 50))  # Messages kept per channel and globally
+HISTORY_CACHE_MAX_BYTES = int(os.environ.get("HISTORY_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # Budget before cold channels are evicted
+HISTORY_GLOBAL_TTL = float(os.environ.get("HISTORY_GLOBAL_TTL", 30))  # With sharding, seconds before the cross-channel ring is re-read
+
 # API keys and tokens
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 SLACK_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
+SLACK_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN")  # xapp- token; enables Socket Mode push ingestion
 
 # Bot names
 TELEGRAM_BOT_NAME = "@TradeSessionAssistBot"
 SLACK_BOT_NAME = "@U08EEVBTENB"
+
+# LLM engine
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")  # Point at a local OpenAI-compatible server for testing
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4o")
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))  # Completions in flight per event loop
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", 30))  # Seconds per completion
+LLM_STREAMING = os.environ.get("LLM_STREAMING", "true").lower() in ("1", "true", "yes")  # Stream replies into an edited placeholder
+TELEGRAM_EDIT_INTERVAL = float(os.environ.get("TELEGRAM_EDIT_INTERVAL", 1.0))  # Min seconds between edits of one message
+SLACK_EDIT_INTERVAL = float(os.environ.get("SLACK_EDIT_INTERVAL", 1.2))  # chat.update is Tier 3 (~50/min)
+
+# LLM routing
+LLM_FAST_MODEL = os.environ.get("LLM_FAST_MODEL", "")  # Cheaper model for short, routine prompts; empty to always use LLM_MODEL
+LLM_FAST_MAX_PROMPT_TOKENS = int(os.environ.get("LLM_FAST_MAX_PROMPT_TOKENS", 1200))  # Largest prompt sent to the fast model
+LLM_HEDGE_AFTER = float(os.environ.get("LLM_HEDGE_AFTER", 8))  # Seconds without a reply before a duplicate request is sent; 0 disables
+LLM_HEDGE_SAME_ENDPOINT = os.environ.get("LLM_HEDGE_SAME_ENDPOINT", "false").lower() in ("1", "true", "yes")  # Also hedge to the primary when there is no fallback
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", 5))  # Consecutive failures that open an endpoint's breaker
+LLM_BREAKER_RESET = float(os.environ.get("LLM_BREAKER_RESET", 30))  # Seconds before an open breaker lets a probe through
+OPENAI_FALLBACK_BASE_URL = os.environ.get("OPENAI_FALLBACK_BASE_URL")  # Secondary OpenAI-compatible endpoint
+OPENAI_FALLBACK_API_KEY = os.environ.get("OPENAI_FALLBACK_API_KEY")  # Defaults to OPENAI_API_KEY
+LLM_FALLBACK_MODEL = os.environ.get("LLM_FALLBACK_MODEL", "")  # Model on the fallback endpoint; defaults to the routed model
+LLM_PRICES = os.environ.get("LLM_PRICES", "gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6")  # USD per million prompt/completion tokens
+
+# Slack ingestion
+SLACK_POLL_INTERVAL = float(os.environ.get("SLACK_POLL_INTERVAL", 5))  # Seconds between polls when polling is the only source
+SLACK_CATCHUP_INTERVAL = float(os.environ.get("SLACK_CATCHUP_INTERVAL", 300))  # Seconds between catch-up polls under Socket Mode
+SLACK_POLL_MAX_INTERVAL = float(os.environ.get("SLACK_POLL_MAX_INTERVAL", 60))  # Idle channels back off up to this many seconds
+SLACK_POLL_BACKOFF = float(os.environ.get("SLACK_POLL_BACKOFF", 1.5))  # Interval multiplier after each idle poll
+SLACK_POLL_CONCURRENCY = int(os.environ.get("SLACK_POLL_CONCURRENCY", 8))  # Channels polled at once
+SLACK_HISTORY_PAGE_SIZE = int(os.environ.get("SLACK_HISTORY_PAGE_SIZE", 200))  # Messages per conversations.history page
+SLACK_HISTORY_RATE_PER_MINUTE = float(os.environ.get("SLACK_HISTORY_RATE_PER_MINUTE", 50))  # conversations.history is Tier 3
+SLACK_HISTORY_BURST = int(os.environ.get("SLACK_HISTORY_BURST", 10))
+
+# Mention job queue
+MENTION_WORKERS = int(os.environ.get("MENTION_WORKERS", LLM_MAX_CONCURRENCY))  # Mentions answered at once
+MENTION_QUEUE_MAX_DEPTH = int(os.environ.get("MENTION_QUEUE_MAX_DEPTH", 100))  # Waiting chats before new mentions are shed
+
+# Durable cursors and multi-instance sharding
+CURSOR_FLUSH_INTERVAL = float(os.environ.get("CURSOR_FLUSH_INTERVAL", 5))  # Seconds between persisting channel cursors
+SHARDING_ENABLED = os.environ.get("SHARDING_ENABLED", "false").lower() in ("1", "true", "yes")  # Split channels across instances
+INSTANCE_ID = os.environ.get("INSTANCE_ID", f"{socket.gethostname()}-{os.getpid()}")
+LEASE_TTL = float(os.environ.get("LEASE_TTL", 30))  # Seconds before a dead instance's channels fail over
+
+# Database pool, shared by every platform. By default sized for the concurrent Slack polls,
+# plus the Telegram handler, the write-behind flusher and background jobs.
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", SLACK_POLL_CONCURRENCY + 4))
+
+# Runtime supervision
+SUPERVISOR_MIN_BACKOFF = float(os.environ.get("SUPERVISOR_MIN_BACKOFF", 1))  # Seconds before restarting a crashed platform
+SUPERVISOR_MAX_BACKOFF = float(os.environ.get("SUPERVISOR_MAX_BACKOFF", 60))
+SHUTDOWN_GRACE = float(os.environ.get("SHUTDOWN_GRACE", 10))  # Seconds in-flight answers get to finish on SIGTERM
+
+# User directory cache
+USER_CACHE_MAX_SIZE = int(os.environ.get("USER_CACHE_MAX_SIZE", 10000))  # Cached display names across platforms
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 3600))  # Seconds before a name is refreshed in the background
+
+# Prompt assembly
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 3000))  # Hard cap on user prompt tokens
+PROMPT_CHANNEL_SHARE = float(os.environ.get("PROMPT_CHANNEL_SHARE", 0.6))  # Share of the budget for verbatim channel messages
+PROMPT_SUMMARY_TOKENS = int(os.environ.get("PROMPT_SUMMARY_TOKENS", 400))  # Cap on each channel's rolling summary
+PROMPT_SUMMARY_LINE_WORDS = int(os.environ.get("PROMPT_SUMMARY_LINE_WORDS", 20))  # Words kept per summarized message
+PROMPT_SUMMARY_MAX_CHANNELS = int(os.environ.get("PROMPT_SUMMARY_MAX_CHANNELS", 1000))  # Rolling summaries kept in memory
+
+# Semantic retrieval over group_messages
+RETRIEVAL_EMBEDDER = os.environ.get("RETRIEVAL_EMBEDDER", "")  # "openai", "hashing" (local, deterministic) or empty to disable
+RETRIEVAL_EMBEDDING_MODEL = os.environ.get("RETRIEVAL_EMBEDDING_MODEL", "text-embedding-3-small")
+RETRIEVAL_DIM = int(os.environ.get("RETRIEVAL_DIM", 256))  # Embedding dimensions stored per message
+RETRIEVAL_CAPACITY = int(os.environ.get("RETRIEVAL_CAPACITY", 200000))  # Vectors kept before the oldest are overwritten
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 20))  # Cross-channel messages pulled into each prompt
+RETRIEVAL_BACKFILL = int(os.environ.get("RETRIEVAL_BACKFILL", 10000))  # Recent messages embedded at startup
+RETRIEVAL_INDEX_PATH = os.environ.get("RETRIEVAL_INDEX_PATH")  # Optional path prefix to persist vectors across restarts
+
+# Answer cache
+ANSWER_CACHE_MAX_SIZE = int(os.environ.get("ANSWER_CACHE_MAX_SIZE", 1000))  # Cached answers across all chats
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 300))  # Seconds an answer stays reusable
+
+# Rule-based order-state extraction
+ORDER_STATE_ENABLED = os.environ.get("ORDER_STATE_ENABLED", "true").lower() in ("1", "true", "yes")
+ORDER_FAST_PATH = os.environ.get("ORDER_FAST_PATH", "false").lower() in ("1", "true", "yes")  # Answer routine confirmation requests without the LLM
+ORDER_ASSETS = [asset for asset in os.environ.get(
+    "ORDER_ASSETS", "BTC,ETH,SOL,USDT,USDC,XRP,ADA,DOGE,AVAX,LINK,ARB,OP,MATIC,DOT,LTC,BNB,TRX,TON"
+).split(",") if asset]  # Symbols read as an order's asset; anything else is ignored
+ORDER_STATE_MAX_CHANNELS = int(os.environ.get("ORDER_STATE_MAX_CHANNELS", 10000))  # Per-channel order records kept in memory
+
+# Logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # "json" (one object per line) or "text"
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))  # Records buffered for the writer thread before new ones are dropped
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 0.01))  # Share of per-message hot-path records kept; 1 keeps all
+LOG_REDACT = os.environ.get("LOG_REDACT", "true").lower() in ("1", "true", "yes")  # Mask wallet addresses and sensitive fields
+LOG_REDACT_PATTERNS = os.environ.get("LOG_REDACT_PATTERNS", "").split()  # Extra regexes to mask, whitespace-separated
+LOG_REDACT_FIELDS = [field for field in os.environ.get("LOG_REDACT_FIELDS", "message_text,answer").split(",") if field]  # Extra fields blanked entirely
+
+# Metrics and tracing
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+METRICS_HOST = os.environ.get("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9108))  # Serves /metrics and /traces
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")  # Log a span breakdown per answer
+TRACE_HISTORY = int(os.environ.get("TRACE_HISTORY", 100))  # Recent traces kept for /traces
@@ -1,85 +1,455 @@
+import asyncio
 import asyncpg
 import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from . import config, logging_config, metrics, migrations, partitions, startup_profile
+from .history_cache import history_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-async def init_db_pool(db_config, loop=None):
-    """Initialize the asyncpg database pool with tuned connection limits, 
-    and create the table if it doesn’t exist."""
-    # pool = await asyncpg.create_pool(**db_config, loop=loop)
-    # Tune pool size: min 1, max 5 connections per pool
-    pool = await asyncpg.create_pool(
-        **db_config,
-        loop=loop,
-        min_size=1,  # Minimum connections kept alive
-        max_size=5,  # Maximum connections (adjust based on max_connections)
-        max_queries=50000,  # Limits query backlog
-        max_inactive_connection_lifetime=300  # Closes inactive connections after 5 minutes
-    )
-    async with pool.acquire() as conn:
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS group_messages (
-                id SERIAL PRIMARY KEY,
-                platform VARCHAR(50) NOT NULL,
-                chat_id TEXT NOT NULL,
-                user_id TEXT NOT NULL,
-                user_name VARCHAR(255) NOT NULL,
-                message_text TEXT NOT NULL,
-                timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                slack_ts TEXT UNIQUE  -- Unique Slack timestamp to avoid duplicates
-            );
-            CREATE INDEX IF NOT EXISTS idx_group_messages_platform_chat_id_timestamp 
-            ON group_messages (platform, chat_id, timestamp);
-        """)
-    logger.info(f"Database pool initialized with min_size=1, max_size=5")
+# Write-behind buffers keyed by the pool they flush into
+_write_buffers = {}
+# Callbacks run synchronously with each stored message dict; they must be cheap
+_message_listeners = []
+# Callbacks run with (platform, chat_ids) when cached per-channel state must be dropped
+_forget_listeners = []
+
+def add_message_listener(callback):
+    """Register a callback invoked with every message stored through store_message."""
+    _message_listeners.append(callback)
+
+def add_forget_listener(callback):
+    """Register a callback invoked by forget_channels, for caches built from stored messages."""
+    _forget_listeners.append(callback)
+
+def forget_channels(platform, chat_ids=None):
+    """Drop cached state for channels (all of `platform` when chat_ids is None) this instance just took over.
+
+    Another instance may have stored messages in them meanwhile, which never reached our listeners.
+    """
+    history_cache.invalidate(platform, chat_ids)
+    for callback in _forget_listeners:
+        callback(platform, chat_ids)
+
+def _on_message_stored(message):
+    history_cache.append(message)
+    for callback in _message_listeners:
+        try:
+            callback(message)
+        except Exception as e:
+            logger.error(f"Message listener error: {e}")
+
+# Failures that say nothing about the rows themselves, so the batch is retried as-is
+_TRANSIENT_ERRORS = (
+    OSError, asyncio.TimeoutError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError, asyncpg.TooManyConnectionsError
+)
+
+class _PendingRow:
+    __slots__ = ("row", "message", "future", "done")
+
+    def __init__(self, row, message, future=None):
+        self.row = row  # Column values in INSERT order
+        self.message = message  # Handed to the listeners once the insert is confirmed, or None
+        self.future = future  # Resolved with whether the row was inserted, for callers that wait
+        self.done = False
+
+    def resolve(self, inserted):
+        self.done = True
+        if self.future is not None and not self.future.done():
+            self.future.set_result(inserted)
+
+class MessageWriteBuffer:
+    """Collects messages in memory and flushes them as one multi-row INSERT
+    when the batch fills up or the flush interval elapses.
+
+    Batches that fail because Postgres is unreachable go back on the queue, which is capped at
+    max_pending rows (the oldest are dead-lettered beyond it). A batch Postgres rejects is split
+    until the offending rows are isolated; those are dead-lettered and the rest are written.
+    """
+
+    def __init__(self, db_pool, max_batch=500, flush_interval=0.5, max_pending=50000):
+        self.db_pool = db_pool
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flush_count = 0
+        self.flushed_messages = 0
+        self.failed_flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.dead_letters = deque(maxlen=1000)  # (row, error) for the most recent rows given up on
+        self.dead_lettered = 0
+        self._pending = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._confirm_tasks = set()
+        self._timer_task = None
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def start(self):
+        self._timer_task = asyncio.create_task(self._flush_periodically())
+
+    def add(self, platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts=None, message=None, confirm=False):
+        """Queue a row; `message` goes to the stored-message listeners only if the row is actually inserted.
+
+        With confirm=True a flush starts right away and a future resolving to whether the row
+        was inserted is returned; otherwise None.
+        """
+        future = asyncio.get_running_loop().create_future() if confirm else None
+        self._pending.append(_PendingRow((platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts), message, future))
+        if confirm:
+            task = asyncio.create_task(self.flush())
+            self._confirm_tasks.add(task)
+            task.add_done_callback(self._confirm_tasks.discard)
+        elif len(self._pending) >= self.max_batch and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+        return future
+
+    async def flush(self):
+        """Write every pending message; returns False if they were put back for a retry."""
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            batch, self._pending = self._pending, []
+            start = time.perf_counter()
+            try:
+                async with self.db_pool.acquire() as conn:
+                    await self._insert(conn, batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                retry = [entry for entry in batch if not entry.done]
+                self._pending[:0] = retry
+                overflow = len(self._pending) - self.max_pending
+                if overflow > 0:
+                    self._dead_letter(self._pending[:overflow], f"write buffer full: {e}")
+                    del self._pending[:overflow]
+                logger.error(f"Database batch insertion error for {len(retry)} messages, will retry: {e}")
+                return False
+            self.last_flush_latency = time.perf_counter() - start
+            self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+            self.flush_count += 1
+            self.flushed_messages += len(batch)
+            logger.debug(f"Flushed {len(batch)} messages in {self.last_flush_latency * 1000:.1f} ms, "
+                         f"queue depth {self.queue_depth}")
+            return True
+
+    async def _insert(self, conn, entries):
+        """Insert entries in one statement, bisecting to isolate rows Postgres rejects."""
+        try:
+            # unnest keeps ON CONFLICT (slack_ts, timestamp) dedup, which COPY cannot express
+            inserted = await conn.fetch(
+                """
+                INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts)
+                SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[], $6::timestamptz[], $7::text[])
+                ON CONFLICT (slack_ts, timestamp) DO NOTHING
+                RETURNING slack_ts, timestamp
+                """,
+                *zip(*(entry.row for entry in entries))
+            )
+        except _TRANSIENT_ERRORS:
+            raise
+        except asyncpg.PostgresError as e:
+            if len(entries) == 1:
+                self._dead_letter(entries, e)
+                return
+            middle = len(entries) // 2
+            await self._insert(conn, entries[:middle])
+            await self._insert(conn, entries[middle:])
+            return
+        new_keys = {(row["slack_ts"], row["timestamp"]) for row in inserted if row["slack_ts"] is not None}
+        for entry in entries:
+            slack_ts, timestamp = entry.row[6], entry.row[5]
+            if slack_ts is not None:
+                if (slack_ts, timestamp) not in new_keys:
+                    entry.resolve(False)  # Already stored, e.g. re-ingested after a restart or by another instance
+                    continue
+                new_keys.discard((slack_ts, timestamp))
+            entry.resolve(True)
+            if entry.message is not None:
+                _on_message_stored(entry.message)
+                metrics.MESSAGES_STORED.inc(platform=entry.row[0])
+
+    def _dead_letter(self, entries, error):
+        for entry in entries:
+            entry.resolve(False)
+            self.dead_letters.append((entry.row, str(error)))
+        self.dead_lettered += len(entries)
+        platform, chat_id = entries[0].row[:2]
+        logger.error(f"Dropped {len(entries)} messages (first in {platform} {chat_id}) the database rejected: {error}")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        if self._timer_task:
+            self._timer_task.cancel()
+            await asyncio.gather(self._timer_task, return_exceptions=True)
+        await self.flush()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "flush_count": self.flush_count,
+            "flushed_messages": self.flushed_messages,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency
+        }
+
+def enable_write_buffer(db_pool, max_batch=500, flush_interval=0.5, max_pending=50000):
+    """Route store_message for this pool through a write-behind buffer. Call from the pool's event loop."""
+    buffer = MessageWriteBuffer(db_pool, max_batch=max_batch, flush_interval=flush_interval, max_pending=max_pending)
+    buffer.start()
+    _write_buffers[db_pool] = buffer
+    logger.info(f"Write-behind buffer enabled: max_batch={max_batch}, flush_interval={flush_interval}s")
+    return buffer
+
+def get_write_buffer(db_pool):
+    return _write_buffers.get(db_pool)
+
+async def close_write_buffer(db_pool):
+    """Flush and detach the pool's write-behind buffer, if any."""
+    buffer = _write_buffers.pop(db_pool, None)
+    if buffer:
+        await buffer.close()
+        logger.info(f"Write-behind buffer closed after {buffer.flushed_messages} messages in {buffer.flush_count} flushes")
+
+async def flush_write_buffer(db_pool):
+    """Write out any messages still pending in the pool's write-behind buffer; returns False if that failed."""
+    buffer = _write_buffers.get(db_pool)
+    if buffer:
+        return await buffer.flush()
+    return True
+
+async def init_db_pool(db_config, loop=None, min_size=None, max_size=None):
+    """Initialize the asyncpg database pool with tuned connection limits,
+    and bring the schema up to date through the versioned migrations."""
+    # Pool size comes from config (DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE), sized for the workload
+    min_size = min_size or config.DB_POOL_MIN_SIZE
+    max_size = max_size or config.DB_POOL_MAX_SIZE
+    with startup_profile.phase("db_connect"):
+        pool = await asyncpg.create_pool(
+            **db_config,
+            loop=loop,
+            min_size=min_size,  # Minimum connections kept alive
+            max_size=max_size,  # Maximum connections (adjust based on max_connections)
+            max_queries=50000,  # Limits query backlog
+            max_inactive_connection_lifetime=300  # Closes inactive connections after 5 minutes
+        )
+    with startup_profile.phase("db_migrate"):
+        async with pool.acquire() as conn:
+            version = await migrations.migrate(conn)
+    metrics.register_pool(pool)
+    logger.info(f"Database pool initialized with min_size={min_size}, max_size={max_size}, schema version {version}")
     return pool
 
-async def store_message(db_pool, platform, chat_id, user_id, user_name, message_text, slack_ts=None):
-    """Store a message in the PostgreSQL database, with Slack timestamp to avoid duplicates."""
+def slack_ts_to_datetime(slack_ts):
+    """Convert a Slack ts ("seconds.micros") to an exact UTC datetime."""
+    seconds, _, micros = slack_ts.partition(".")
+    return datetime.fromtimestamp(int(seconds), timezone.utc) + timedelta(microseconds=int(micros or 0))
+
+async def store_message(db_pool, platform, chat_id, user_id, user_name, message_text, slack_ts=None, confirm=False):
+    """Store a message in the PostgreSQL database, with Slack timestamp to avoid duplicates,
+    then hand it to the history cache and any registered listeners.
+
+    Returns True if the message was new, False for a Slack duplicate or a failed insert.
+    Behind the write buffer a message's fate is only known once it is flushed, so it returns
+    None unless confirm=True, which flushes right away and waits for the answer.
+    """
+    # Stamp at arrival so history order reflects when messages came in, not when they were flushed.
+    # Slack messages use their own ts, so a re-ingested message hits the (slack_ts, timestamp) unique key.
+    start = time.perf_counter()
+    timestamp = slack_ts_to_datetime(slack_ts) if slack_ts else datetime.now(timezone.utc)
+    message = {
+        "platform": platform, "chat_id": chat_id, "user_id": user_id,
+        "user_name": user_name, "message_text": message_text, "timestamp": timestamp, "slack_ts": slack_ts
+    }
+    buffer = _write_buffers.get(db_pool)
+    if buffer:
+        # Listeners wait until the flush commits the row, so Slack duplicates and rows
+        # the database rejects never reach the history cache or prompts
+        inserted = buffer.add(platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts, message, confirm)
+        metrics.STORE_SECONDS.observe(time.perf_counter() - start, platform=platform, mode="buffered")
+        return await inserted if isinstance(inserted, asyncio.Future) else inserted
+    inserted = False
     async with db_pool.acquire() as conn:
         try:
             if slack_ts:
                 # Use UPSERT to avoid duplicates based on slack_ts
-                await conn.execute(
+                status = await conn.execute(
                     """
-                    INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text, slack_ts)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    ON CONFLICT (slack_ts) DO NOTHING
+                    INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7)
+                    ON CONFLICT (slack_ts, timestamp) DO NOTHING
                     """,
-                    platform, chat_id, user_id, user_name, message_text, slack_ts
+                    platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts
                 )
             else:
-                await conn.execute(
-                    "INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text) VALUES ($1, $2, $3, $4, $5)",
-                    platform, chat_id, user_id, user_name, message_text
+                status = await conn.execute(
+                    "INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text, timestamp) VALUES ($1, $2, $3, $4, $5, $6)",
+                    platform, chat_id, user_id, user_name, message_text, timestamp
                 )
-            logger.info(f"Stored {platform} message in {chat_id}: {message_text}")
+            inserted = status.endswith(" 1")
+            if inserted:
+                _on_message_stored(message)
+                metrics.MESSAGES_STORED.inc(platform=platform)
+            if logging_config.sampled("store_message", logger, logging.DEBUG):
+                logger.debug(f"Stored {platform} message in {chat_id}", extra={"message_text": message_text})
         except Exception as e:
             logger.error(f"Database message insertion error for {platform} in {chat_id}: {e}")
+    metrics.STORE_SECONDS.observe(time.perf_counter() - start, platform=platform, mode="direct")
+    return inserted
 
 async def fetch_channel_history(db_pool, platform, chat_id):
-    """Fetch the last 50 messages for a specific platform and channel."""
+    """Fetch the last 50 messages for a specific platform and channel, newest first.
+
+    Served from the history cache; Postgres is only queried the first time a channel is seen.
+    """
+    cached = history_cache.get(platform, chat_id)
+    if cached is not None:
+        return cached
+    with metrics.HISTORY_FETCH_SECONDS.time(scope="channel"), metrics.span("fetch_channel_history"):
+        await flush_write_buffer(db_pool)
+        history_cache.begin_hydrate(platform, chat_id)
+        async with db_pool.acquire() as conn:
+            try:
+                history_rows = await conn.fetch(
+                    """
+                    SELECT platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts FROM group_messages
+                    WHERE platform = $1 AND chat_id = $2 ORDER BY timestamp DESC LIMIT $3
+                    """,
+                    platform, chat_id, history_cache.depth
+                )
+                history_cache.finish_hydrate(history_rows, platform, chat_id)
+                return history_rows
+            except Exception as e:
+                history_cache.abort_hydrate(platform, chat_id)
+                logger.error(f"Database history retrieval error for {platform} in {chat_id}: {e}")
+                return []
+
+async def fetch_all_history(db_pool):
+    """Fetch the last 50 messages across all platforms for LLM learning, newest first."""
+    cached = history_cache.get()
+    if cached is not None:
+        return cached
+    with metrics.HISTORY_FETCH_SECONDS.time(scope="all"), metrics.span("fetch_all_history"):
+        await flush_write_buffer(db_pool)
+        history_cache.begin_hydrate()
+        async with db_pool.acquire() as conn:
+            try:
+                history_rows = await conn.fetch(
+                    """
+                    SELECT platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts FROM group_messages
+                    ORDER BY timestamp DESC LIMIT $1
+                    """,
+                    history_cache.depth
+                )
+                history_cache.finish_hydrate(history_rows)
+                return history_rows
+            except Exception as e:
+                history_cache.abort_hydrate()
+                logger.error(f"Database all history retrieval error: {e}")
+                return []
+
+async def load_channel_cursors(db_pool, platform, chat_ids=None):
+    """Load persisted per-channel cursors as {chat_id: cursor}, optionally for some channels only."""
     async with db_pool.acquire() as conn:
         try:
-            history_rows = await conn.fetch(
-                "SELECT user_name, message_text FROM group_messages WHERE platform = $1 AND chat_id = $2 ORDER BY timestamp DESC LIMIT 50",
-                platform, chat_id
-            )
-            return history_rows
+            if chat_ids is None:
+                rows = await conn.fetch("SELECT chat_id, cursor FROM channel_cursors WHERE platform = $1", platform)
+            else:
+                rows = await conn.fetch(
+                    "SELECT chat_id, cursor FROM channel_cursors WHERE platform = $1 AND chat_id = ANY($2::text[])",
+                    platform, list(chat_ids)
+                )
+            return {row["chat_id"]: row["cursor"] for row in rows}
         except Exception as e:
-            logger.error(f"Database history retrieval error for {platform} in {chat_id}: {e}")
-            return []
+            logger.error(f"Database cursor retrieval error for {platform}: {e}")
+            return {}
 
-async def fetch_all_history(db_pool):
-    """Fetch the last 50 messages across all platforms for LLM learning."""
+async def save_channel_cursors(db_pool, platform, cursors):
+    """Persist {chat_id: cursor} after making sure the messages they cover are written; returns False on failure."""
+    if not cursors:
+        return True
+    if not await flush_write_buffer(db_pool):
+        # A cursor saved ahead of unwritten messages would skip them after a restart
+        logger.warning(f"Not saving {platform} cursors while buffered messages are unwritten")
+        return False
     async with db_pool.acquire() as conn:
         try:
-            history_rows = await conn.fetch(
-                "SELECT platform, chat_id, user_name, message_text FROM group_messages ORDER BY timestamp DESC LIMIT 50"
+            await conn.execute(
+                """
+                INSERT INTO channel_cursors (platform, chat_id, cursor, updated_at)
+                SELECT $1, chat_id, cursor, now() FROM unnest($2::text[], $3::text[]) AS c(chat_id, cursor)
+                ON CONFLICT (platform, chat_id) DO UPDATE SET cursor = EXCLUDED.cursor, updated_at = EXCLUDED.updated_at
+                WHERE channel_cursors.cursor::numeric < EXCLUDED.cursor::numeric  -- Never move a cursor backwards
+                """,
+                platform, list(cursors.keys()), list(cursors.values())
             )
-            return history_rows
+            return True
         except Exception as e:
-            logger.error(f"Database all history retrieval error: {e}")
-            return []
-        
\ No newline at end of file
+            logger.error(f"Database cursor save error for {platform}: {e}")
+            return False
+
+_COPY_COLUMNS = ("platform", "chat_id", "user_id", "user_name", "message_text", "timestamp", "slack_ts")
+
+async def copy_messages(db_pool, records, source=None, position=None, completed=False):
+    """Bulk-load (platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts) records.
+
+    Rows are COPYed into a session temp table and moved into group_messages with
+    ON CONFLICT dedup, which COPY alone cannot do. When `source` is given, its backfill
+    progress is saved in the same transaction, so a resumed import never loses or repeats
+    a batch. Returns the number of new rows. Bypasses the history cache and listeners.
+    """
+    async with db_pool.acquire() as conn:
+        async with conn.transaction():
+            oldest = min((record[5] for record in records), default=None)
+            if oldest is not None:
+                await partitions.ensure_partitions(conn, oldest)
+            await conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS group_messages_staging (
+                    platform TEXT, chat_id TEXT, user_id TEXT, user_name TEXT,
+                    message_text TEXT, timestamp TIMESTAMPTZ, slack_ts TEXT
+                ) ON COMMIT DELETE ROWS
+            """)
+            await conn.copy_records_to_table("group_messages_staging", records=records, columns=_COPY_COLUMNS)
+            status = await conn.execute(
+                """
+                INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts)
+                SELECT platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts FROM group_messages_staging
+                ON CONFLICT (slack_ts, timestamp) DO NOTHING
+                """
+            )
+            inserted = int(status.split()[-1])
+            if source is not None:
+                await conn.execute(
+                    """
+                    INSERT INTO backfill_progress (source, position, imported, completed, updated_at)
+                    VALUES ($1, $2, $3, $4, now())
+                    ON CONFLICT (source) DO UPDATE SET position = EXCLUDED.position, completed = EXCLUDED.completed,
+                        imported = backfill_progress.imported + EXCLUDED.imported, updated_at = EXCLUDED.updated_at
+                    """,
+                    source, position, inserted, completed
+                )
+    return inserted
+
+async def load_backfill_progress(db_pool, source):
+    """Return the saved progress row for a backfill source, or None if it never ran."""
+    async with db_pool.acquire() as conn:
+        return await conn.fetchrow(
+            "SELECT position, imported, completed FROM backfill_progress WHERE source = $1", source
+        )
+
+async def reset_backfill_progress(db_pool, source):
+    async with db_pool.acquire() as conn:
+        await conn.execute("DELETE FROM backfill_progress WHERE source = $1", source)
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import time
+from datetime import datetime, timezone
+import asyncpg
+from . import config, logging_config
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ("id", "platform", "chat_id", "user_id", "user_name", "message_text", "timestamp", "slack_ts")
+VOLUME_BUCKETS = ("minute", "hour", "day", "week", "month")
+# Parquet column types for the non-text columns; everything else is a string
+_INTEGER_COLUMNS = {"id", "messages"}
+_TIMESTAMP_COLUMNS = {"timestamp", "bucket"}
+
+async def connect_export(db_config=None):
+    """Open a dedicated connection for exports, so long reads never hold one of the bot's pool slots."""
+    return await asyncpg.connect(
+        **(db_config or config.DB_CONFIG),
+        server_settings={"application_name": "ai-agents-export", "statement_timeout": "0"}
+    )
+
+def _filters(start, end, platform, chat_id, args):
+    """Build the WHERE conditions shared by the export and aggregate queries, appending to args."""
+    conditions = []
+    for column, operator, value in (("timestamp", ">=", start), ("timestamp", "<", end),
+                                    ("platform", "=", platform), ("chat_id", "=", chat_id)):
+        if value is not None:
+            args.append(value)
+            conditions.append(f"{column} {operator} ${len(args)}")
+    return conditions
+
+async def iter_messages(conn, start=None, end=None, platform=None, chat_id=None, page_size=5000, consistent=False):
+    """Yield group_messages rows oldest first, holding at most one page in memory.
+
+    By default rows are read in keyset pages on (timestamp, id): each page is a short,
+    independent query, so nothing pins a snapshot while the consumer writes. With
+    consistent=True one server-side cursor in a read-only repeatable-read transaction
+    is used instead, giving a single snapshot at the cost of a long-running transaction.
+    The start/end bounds prune the monthly partitions.
+    """
+    columns = ", ".join(EXPORT_COLUMNS)
+    if consistent:
+        args = []
+        conditions = _filters(start, end, platform, chat_id, args)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            async for row in conn.cursor(f"SELECT {columns} FROM group_messages {where} ORDER BY timestamp, id",
+                                         *args, prefetch=page_size):
+                yield row
+        return
+
+    last = None  # (timestamp, id) of the last row yielded
+    while True:
+        args = []
+        conditions = _filters(start, end, platform, chat_id, args)
+        if last is not None:
+            args.extend(last)
+            # The plain timestamp bound lets each page start from the timestamp index instead of rescanning
+            conditions.append(f"timestamp >= ${len(args) - 1} AND (timestamp, id) > (${len(args) - 1}, ${len(args)})")
+        args.append(page_size)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = await conn.fetch(
+            f"SELECT {columns} FROM group_messages {where} ORDER BY timestamp, id LIMIT ${len(args)}", *args
+        )
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        last = (rows[-1]["timestamp"], rows[-1]["id"])
+
+async def iter_message_volume(conn, start=None, end=None, bucket="hour", platform=None, chat_id=None, page_size=5000):
+    """Yield (platform, chat_id, bucket, messages) counts per channel per time bucket, in time order.
+
+    Aggregated in Postgres and streamed through a server-side cursor, so long ranges with many
+    channels stay in constant memory here.
+    """
+    if bucket not in VOLUME_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(VOLUME_BUCKETS)}")
+    args = [bucket]
+    conditions = _filters(start, end, platform, chat_id, args)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT platform, chat_id, date_trunc($1, timestamp) AS bucket, count(*) AS messages
+        FROM group_messages {where}
+        GROUP BY platform, chat_id, date_trunc($1, timestamp)
+        ORDER BY bucket, platform, chat_id
+    """
+    async with conn.transaction(readonly=True):
+        async for row in conn.cursor(query, *args, prefetch=page_size):
+            yield row
+
+def _open_output(path):
+    """Open a text output file, gzip-compressed when the name ends in .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+class JsonlWriter:
+    def __init__(self, path, columns):
+        self.columns = columns
+        self._file = _open_output(path)
+
+    def write(self, rows):
+        self._file.write("".join(
+            json.dumps({column: _json_value(row[column]) for column in self.columns}, ensure_ascii=False) + "\n"
+            for row in rows
+        ))
+
+    def close(self):
+        self._file.close()
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.columns = columns
+        self._file = _open_output(path)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows([_json_value(row[column]) for column in self.columns] for row in rows)
+
+    def close(self):
+        self._file.close()
+
+class ParquetWriter:
+    """Writes each batch as one Parquet row group. Needs the optional pyarrow package."""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+        self._pa = pyarrow
+        self.columns = columns
+        # Fixed up front, since a batch where a column is all NULL would otherwise infer the wrong type
+        self._schema = pyarrow.schema([
+            (column, pyarrow.int64() if column in _INTEGER_COLUMNS
+             else pyarrow.timestamp("us", tz="UTC") if column in _TIMESTAMP_COLUMNS else pyarrow.string())
+            for column in columns
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows):
+        data = {column: [row[column] for row in rows] for column in self.columns}
+        self._writer.write_table(self._pa.Table.from_pydict(data, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+async def write_rows(rows, path, fmt="jsonl", columns=EXPORT_COLUMNS, batch_size=5000, label="export"):
+    """Drain an async iterator of rows into a file in batches; returns the number of rows written.
+
+    File writes run in a worker thread, so the next page is fetched while the last one is written out.
+    """
+    writer = WRITERS[fmt](path, columns)
+    written = 0
+    started = time.monotonic()
+    last_report = started
+    pending_write = None
+    batch = []
+    try:
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                if pending_write is not None:
+                    await pending_write
+                pending_write = asyncio.ensure_future(asyncio.to_thread(writer.write, batch))
+                written += len(batch)
+                batch = []
+                if time.monotonic() - last_report >= 5:
+                    last_report = time.monotonic()
+                    logger.info(f"{label}: {written} rows, {written / (last_report - started):.0f} rows/sec")
+        if pending_write is not None:
+            await pending_write
+        if batch:
+            await asyncio.to_thread(writer.write, batch)
+            written += len(batch)
+    finally:
+        if pending_write is not None and not pending_write.done():
+            await asyncio.gather(pending_write, return_exceptions=True)
+        await asyncio.to_thread(writer.close)
+    elapsed = max(time.monotonic() - started, 1e-9)
+    logger.info(f"{label} finished: {written} rows to {path} in {elapsed:.1f}s ({written / elapsed:.0f} rows/sec)")
+    return written
+
+async def export_messages(path, fmt="jsonl", start=None, end=None, platform=None, chat_id=None,
+                          page_size=5000, consistent=False, db_config=None):
+    """Export messages in a date range (optionally one channel) to JSONL, CSV or Parquet over a dedicated connection."""
+    conn = await connect_export(db_config)
+    try:
+        rows = iter_messages(conn, start, end, platform, chat_id, page_size, consistent)
+        return await write_rows(rows, path, fmt, EXPORT_COLUMNS, page_size, label="Message export")
+    finally:
+        await conn.close()
+
+async def export_message_volume(path, fmt="csv", start=None, end=None, bucket="hour", platform=None, chat_id=None,
+                                db_config=None):
+    """Export per-channel message counts per time bucket over a dedicated connection."""
+    conn = await connect_export(db_config)
+    try:
+        rows = iter_message_volume(conn, start, end, bucket, platform, chat_id)
+        return await write_rows(rows, path, fmt, ("platform", "chat_id", "bucket", "messages"), label="Volume export")
+    finally:
+        await conn.close()
+
+def _parse_time(value):
+    """Parse an ISO date or datetime; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export group_messages and message volume aggregates.")
+    parser.add_argument("--start", type=_parse_time, help="Inclusive start, e.g. 2025-01-01 (UTC unless an offset is given)")
+    parser.add_argument("--end", type=_parse_time, help="Exclusive end")
+    parser.add_argument("--platform", help="Only this platform (telegram or slack)")
+    parser.add_argument("--chat-id", help="Only this channel or chat")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None, help="Output format (default from the file name)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    messages = commands.add_parser("messages", help="Export messages oldest first")
+    messages.add_argument("output", help="Output file; .gz compresses JSONL and CSV")
+    messages.add_argument("--page-size", type=int, default=5000, help="Rows fetched per page")
+    messages.add_argument("--consistent", action="store_true", help="Read one snapshot through a server-side cursor")
+    volume = commands.add_parser("volume", help="Export message counts per channel per time bucket")
+    volume.add_argument("output")
+    volume.add_argument("--bucket", choices=VOLUME_BUCKETS, default="hour")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or next((name for name in WRITERS if args.output.removesuffix(".gz").endswith(f".{name}")), "jsonl")
+    if args.command == "messages":
+        await export_messages(args.output, fmt, args.start, args.end, args.platform, args.chat_id,
+                              args.page_size, args.consistent)
+    else:
+        await export_message_volume(args.output, fmt, args.start, args.end, args.bucket, args.platform, args.chat_id)
+
+if __name__ == "__main__":
+    logging_config.setup_logging()
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+import logging
+import sys
+import time
+from collections import OrderedDict, deque
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message overhead of the dict and deque slot, on top of the text itself
+_MESSAGE_OVERHEAD_BYTES = 400
+_GLOBAL_KEY = None
+
+def _message_size(message):
+    return _MESSAGE_OVERHEAD_BYTES + sys.getsizeof(message["message_text"]) + sys.getsizeof(message["user_name"])
+
+def _row_identity(message):
+    # store_message stamps each row exactly, so repeated texts ("ok", "+1") stay distinct
+    return (message["platform"], message["chat_id"], message["timestamp"], message.get("slack_ts"))
+
+class _Ring:
+    """Bounded deque of messages (oldest first) with its approximate size in bytes."""
+
+    __slots__ = ("messages", "size", "pending", "hydrated_at")
+
+    def __init__(self, depth):
+        self.messages = deque(maxlen=depth)
+        self.size = 0
+        self.pending = None  # Messages stored while the ring is being hydrated
+        self.hydrated_at = 0.0
+
+    def append(self, message):
+        if len(self.messages) == self.messages.maxlen:
+            self.size -= _message_size(self.messages[0])
+        self.messages.append(message)
+        self.size += _message_size(message)
+
+class HistoryCache:
+    """In-memory ring buffers of recent messages per (platform, chat_id), plus one global ring.
+
+    Rings are hydrated from Postgres on first access and appended to by store_message
+    afterwards. Cold channels are evicted LRU-first once the memory budget is exceeded.
+    Every platform shares one instance on the bot's event loop.
+
+    A ring only sees messages this process stores. With several instances, each channel is
+    ingested by one of them, so channel rings stay exact as long as they are invalidated when
+    a channel changes hands; the global ring mixes every instance's channels, so it is
+    re-read from Postgres once it is older than global_ttl seconds.
+    """
+
+    def __init__(self, depth=50, max_bytes=64 * 1024 * 1024, global_ttl=None):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.global_ttl = global_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._rings = OrderedDict()  # (platform, chat_id) or _GLOBAL_KEY -> _Ring
+        self._total_bytes = 0
+
+    def append(self, message):
+        """Add a newly stored message to its channel ring and the global ring, if they are cached."""
+        for key in ((message["platform"], message["chat_id"]), _GLOBAL_KEY):
+            ring = self._rings.get(key)
+            if ring is None:
+                continue  # Not hydrated yet; Postgres will return it on first access
+            if ring.pending is not None:
+                ring.pending.append(message)
+                continue
+            before = ring.size
+            ring.append(message)
+            self._total_bytes += ring.size - before
+        self._evict()
+
+    def get(self, platform=None, chat_id=None):
+        """Return cached messages newest first, or None if the channel (or global ring) is not hydrated."""
+        key = _GLOBAL_KEY if platform is None else (platform, chat_id)
+        ring = self._rings.get(key)
+        if (ring is not None and key is _GLOBAL_KEY and self.global_ttl and ring.pending is None
+                and time.monotonic() - ring.hydrated_at > self.global_ttl):
+            self._drop(key)
+            ring = None
+        if ring is None or ring.pending is not None:
+            self.misses += 1
+            return None
+        self._rings.move_to_end(key)
+        self.hits += 1
+        return list(reversed(ring.messages))
+
+    def begin_hydrate(self, platform=None, chat_id=None):
+        """Reserve a ring before querying Postgres so messages stored meanwhile are not lost."""
+        key = _GLOBAL_KEY if platform is None else (platform, chat_id)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = _Ring(self.depth)
+            self._rings[key] = ring
+        if ring.pending is None:
+            ring.pending = []
+
+    def finish_hydrate(self, rows, platform=None, chat_id=None):
+        """Fill a reserved ring from newest-first database rows, then replay messages stored meanwhile."""
+        key = _GLOBAL_KEY if platform is None else (platform, chat_id)
+        ring = self._rings.get(key)
+        if ring is None or ring.pending is None:
+            return
+        pending, ring.pending = ring.pending, None
+        self._total_bytes -= ring.size
+        ring.messages.clear()
+        ring.size = 0
+        loaded = set()
+        for row in reversed(rows):
+            message = dict(row)
+            loaded.add(_row_identity(message))
+            ring.append(message)
+        for message in pending:
+            # The query may already have seen messages that were flushed while it ran
+            if _row_identity(message) not in loaded:
+                ring.append(message)
+        self._total_bytes += ring.size
+        ring.hydrated_at = time.monotonic()
+        self._rings.move_to_end(key)
+        self._evict()
+
+    def invalidate(self, platform, chat_ids=None):
+        """Forget the rings of `platform` (only `chat_ids`, if given) and the global ring.
+
+        Called when this instance takes channels over from another one, which may have
+        stored messages in them that never reached these rings.
+        """
+        for key in list(self._rings):
+            if key is _GLOBAL_KEY or (key[0] == platform and (chat_ids is None or key[1] in chat_ids)):
+                if self._rings[key].pending is None:
+                    self._drop(key)
+
+    def _drop(self, key):
+        self._total_bytes -= self._rings.pop(key).size
+
+    def abort_hydrate(self, platform=None, chat_id=None):
+        key = _GLOBAL_KEY if platform is None else (platform, chat_id)
+        ring = self._rings.get(key)
+        if ring is not None and ring.pending is not None:
+            self._total_bytes -= ring.size
+            del self._rings[key]
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._rings) > 1:
+            key, ring = self._rings.popitem(last=False)
+            self._total_bytes -= ring.size
+            self.evictions += 1
+            logger.debug(f"Evicted history ring for {key}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "channels": len(self._rings),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+history_cache = HistoryCache(depth=config.HISTORY_CACHE_DEPTH, max_bytes=config.HISTORY_CACHE_MAX_BYTES,
+                             global_ttl=config.HISTORY_GLOBAL_TTL if config.SHARDING_ENABLED else None)
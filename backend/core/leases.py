@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+def _preference(instance_id, chat_id):
+    """Rendezvous-hash rank, so each instance prefers a different slice of the channels."""
+    return hashlib.blake2b(f"{instance_id}:{chat_id}".encode(), digest_size=8).digest()
+
+class ChannelLeaseManager:
+    """Splits channels between bot instances using expiring leases in Postgres.
+
+    Every instance heartbeats into bot_instances and aims to own ceil(channels / live
+    instances) channels. Leases are renewed on each rebalance. If an instance dies, its
+    leases expire after lease_ttl and the survivors claim them. Singleton leases (chat_id
+    '*') pick the one instance that runs a platform which cannot be split, such as
+    Telegram long polling.
+    """
+
+    def __init__(self, db_pool, instance_id, lease_ttl=30):
+        self.db_pool = db_pool
+        self.instance_id = instance_id
+        self.lease_ttl = lease_ttl
+        self._owned = {}  # platform -> set of chat_ids
+        self._channels = {}  # platform -> list of chat_ids to split
+        self._singletons = set()  # platforms that want a singleton lease
+        self._changed = asyncio.Event()
+
+    def owns(self, platform, chat_id):
+        return chat_id in self._owned.get(platform, ())
+
+    def owned(self, platform):
+        return set(self._owned.get(platform, ()))
+
+    def holds_singleton(self, platform):
+        return "*" in self._owned.get(f"{platform}:singleton", ())
+
+    def set_channels(self, platform, chat_ids):
+        """Declare the channels of `platform` to split; takes effect on the next rebalance."""
+        self._channels[platform] = sorted(chat_ids)
+
+    def want_singleton(self, platform):
+        self._singletons.add(platform)
+
+    async def wait_for_change(self):
+        await self._changed.wait()
+        self._changed.clear()
+
+    async def _live_instances(self, conn):
+        await conn.execute(
+            """
+            INSERT INTO bot_instances (instance_id, heartbeat_at) VALUES ($1, now())
+            ON CONFLICT (instance_id) DO UPDATE SET heartbeat_at = now()
+            """,
+            self.instance_id
+        )
+        return await conn.fetchval(
+            "SELECT count(*) FROM bot_instances WHERE heartbeat_at > now() - make_interval(secs => $1)",
+            self.lease_ttl
+        )
+
+    async def _rebalance_platform(self, conn, platform, chat_ids, target):
+        ttl = self.lease_ttl
+        # Renew what we hold, and learn what everyone else holds
+        await conn.execute(
+            """
+            UPDATE channel_leases SET expires_at = now() + make_interval(secs => $3)
+            WHERE platform = $1 AND owner = $2 AND chat_id = ANY($4::text[])
+            """,
+            platform, self.instance_id, ttl, chat_ids
+        )
+        rows = await conn.fetch(
+            "SELECT chat_id, owner FROM channel_leases WHERE platform = $1 AND expires_at > now()",
+            platform
+        )
+        owned = {row["chat_id"] for row in rows if row["owner"] == self.instance_id and row["chat_id"] in chat_ids}
+        taken = {row["chat_id"] for row in rows if row["owner"] != self.instance_id}
+
+        if len(owned) > target:
+            # Hand back our least-preferred channels so a newly started instance can take them
+            surplus = sorted(owned, key=lambda chat_id: _preference(self.instance_id, chat_id))[target:]
+            await conn.execute(
+                "DELETE FROM channel_leases WHERE platform = $1 AND owner = $2 AND chat_id = ANY($3::text[])",
+                platform, self.instance_id, surplus
+            )
+            owned -= set(surplus)
+        elif len(owned) < target:
+            free = [chat_id for chat_id in chat_ids if chat_id not in owned and chat_id not in taken]
+            free.sort(key=lambda chat_id: _preference(self.instance_id, chat_id))
+            claimed = await conn.fetch(
+                """
+                INSERT INTO channel_leases (platform, chat_id, owner, expires_at)
+                SELECT $1, chat_id, $2, now() + make_interval(secs => $3) FROM unnest($4::text[]) AS chat_id
+                ON CONFLICT (platform, chat_id) DO UPDATE
+                SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+                WHERE channel_leases.expires_at <= now() OR channel_leases.owner = EXCLUDED.owner
+                RETURNING chat_id
+                """,
+                platform, self.instance_id, ttl, free[:target - len(owned)]
+            )
+            owned |= {row["chat_id"] for row in claimed}
+        return owned
+
+    async def rebalance(self):
+        """Heartbeat, renew our leases and converge on a fair share of every platform's channels."""
+        async with self.db_pool.acquire() as conn:
+            live = max(await self._live_instances(conn), 1)
+            changed = False
+            for platform, chat_ids in self._channels.items():
+                target = math.ceil(len(chat_ids) / live)
+                owned = await self._rebalance_platform(conn, platform, chat_ids, target)
+                if owned != self._owned.get(platform):
+                    logger.info(f"Instance {self.instance_id} now owns {len(owned)}/{len(chat_ids)} {platform} channels")
+                    changed = True
+                self._owned[platform] = owned
+            for platform in self._singletons:
+                key = f"{platform}:singleton"
+                owned = await self._rebalance_platform(conn, key, ["*"], 1)
+                if owned != self._owned.get(key):
+                    logger.info(f"Instance {self.instance_id} {'acquired' if owned else 'does not hold'} the {platform} lease")
+                    changed = True
+                self._owned[key] = owned
+        if changed:
+            self._changed.set()
+
+    async def run(self, interval=None):
+        """Rebalance every third of the lease TTL until cancelled, then release our leases."""
+        interval = interval or self.lease_ttl / 3
+        try:
+            while True:
+                try:
+                    await self.rebalance()
+                except Exception as e:
+                    logger.error(f"Lease rebalance error: {e}")
+                await asyncio.sleep(interval)
+        finally:
+            await self.release()
+
+    async def release(self):
+        """Drop all our leases so other instances take over immediately."""
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.execute("DELETE FROM channel_leases WHERE owner = $1", self.instance_id)
+                await conn.execute("DELETE FROM bot_instances WHERE instance_id = $1", self.instance_id)
+        except Exception as e:
+            logger.error(f"Lease release error: {e}")
+        self._owned.clear()
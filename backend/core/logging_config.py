@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from . import config
+
+# Wallet addresses: EVM, Bitcoin bech32 and base58, Tron. Extend with LOG_REDACT_PATTERNS.
+DEFAULT_REDACT_PATTERNS = (
+    r"\b0x[a-fA-F0-9]{40}\b",
+    r"\bbc1[ac-hj-np-z02-9]{25,59}\b",
+    r"\b[13][a-km-zA-HJ-NP-Z1-9]{25,34}\b",
+    r"\bT[1-9A-HJ-NP-Za-km-z]{33}\b",
+)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_sample_counters = {}
+_counters = {"sampled_out": 0, "dropped": 0, "redactions": 0}
+_queue = None
+
+def sampled(key, logger=None, level=logging.INFO):
+    """Return True for one in every 1 / LOG_SAMPLE_RATE calls with this key.
+
+    Hot paths check it before building a log message, so skipped records cost a dict update:
+        if logging_config.sampled("reply", logger):
+            logger.info(f"Reply on {platform} in {chat_id}", extra={"answer": answer})
+    With a logger, records the logger would not emit at `level` are skipped first.
+    """
+    if logger is not None and not logger.isEnabledFor(level):
+        return False
+    if config.LOG_SAMPLE_RATE >= 1:
+        return True
+    count = _sample_counters.get(key, 0)
+    _sample_counters[key] = count + 1
+    if config.LOG_SAMPLE_RATE > 0 and count % round(1 / config.LOG_SAMPLE_RATE) == 0:
+        return True
+    _counters["sampled_out"] += 1
+    return False
+
+class Redactor:
+    """Masks sensitive substrings in messages and blanks configured extra fields."""
+
+    def __init__(self, patterns=DEFAULT_REDACT_PATTERNS, fields=()):
+        self.pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+        self.fields = set(fields)
+
+    def _mask(self, match):
+        _counters["redactions"] += 1
+        value = match.group(0)
+        # Keep the ends so one address can still be told apart from another while debugging
+        return f"{value[:4]}…{value[-4:]}" if len(value) > 12 else "[redacted]"
+
+    def text(self, value):
+        return self.pattern.sub(self._mask, value) if self.pattern else value
+
+    def field(self, name, value):
+        if name in self.fields:
+            _counters["redactions"] += 1
+            return f"[redacted {len(value)} chars]" if isinstance(value, str) else "[redacted]"
+        return self.text(value) if isinstance(value, str) else value
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, any `extra=` fields and the traceback."""
+
+    def __init__(self, redactor=None):
+        super().__init__()
+        self.redactor = redactor
+
+    def format(self, record):
+        message = record.getMessage()
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self.redactor.text(message) if self.redactor else message
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = self.redactor.field(name, value) if self.redactor else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """The classic one-line format, with redaction applied to the message and extra fields."""
+
+    def __init__(self, redactor=None):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        self.redactor = redactor
+
+    def format(self, record):
+        line = super().format(record)
+        extras = {name: value for name, value in vars(record).items() if name not in _RECORD_ATTRIBUTES and not name.startswith("_")}
+        if extras:
+            line += " " + " ".join(f"{name}={self.redactor.field(name, value) if self.redactor else value}" for name, value in extras.items())
+        return self.redactor.text(line) if self.redactor else line
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues the record untouched, so message formatting happens on the listener thread too.
+
+    The queue is in-process, so records do not have to be made picklable first. When the
+    queue is full the record is dropped and counted rather than blocking the event loop.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _counters["dropped"] += 1
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """Route all logging through a bounded queue drained by a background thread.
+
+    Returns the QueueListener; it is stopped (and the queue flushed) at interpreter exit.
+    """
+    global _queue
+    redactor = None
+    if config.LOG_REDACT:
+        redactor = Redactor(DEFAULT_REDACT_PATTERNS + tuple(config.LOG_REDACT_PATTERNS), config.LOG_REDACT_FIELDS)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter(redactor) if (fmt or config.LOG_FORMAT) == "json" else TextFormatter(redactor))
+
+    _queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    listener = QueueListener(_queue, output, respect_handler_level=True)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(_queue))
+    root.setLevel(level or config.LOG_LEVEL)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+def stats():
+    return {"queued": _queue.qsize() if _queue else 0, **_counters}
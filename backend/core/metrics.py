@@ -0,0 +1,241 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import math
+import time
+from collections import deque
+from . import config, logging_config
+
+logger = logging.getLogger(__name__)
+
+# Checked first by every recording call, so disabled metrics cost one attribute lookup
+enabled = config.METRICS_ENABLED
+tracing = config.TRACING_ENABLED
+
+_registry = []
+_collectors = []
+
+# Latency buckets in seconds, from cached lookups up to slow LLM completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}  # label values tuple -> value
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not enabled:
+            return
+        self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the block, including any awaits inside it."""
+        if not enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+def register_stats(prefix, stats, help=None):
+    """Export every numeric value of a stats() callable as a gauge named <prefix>_<key>."""
+    _collectors.append((prefix, stats, help or f"From {prefix} stats()"))
+
+def register_pool(db_pool):
+    """Export connection-pool utilization for an asyncpg pool."""
+    def pool_stats():
+        size = db_pool.get_size()
+        idle = db_pool.get_idle_size()
+        return {"max": db_pool.get_max_size(), "open": size, "busy": size - idle, "idle": idle,
+                "utilization": (size - idle) / db_pool.get_max_size()}
+    register_stats("bot_db_pool", pool_stats, "asyncpg pool connections")
+
+def render():
+    """Render every metric and collector in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for prefix, stats, help in _collectors:
+        try:
+            values = stats()
+        except Exception as e:
+            logger.error(f"Metrics collector {prefix} failed: {e}")
+            continue
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            lines += [f"# HELP {prefix}_{key} {help}", f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {_format_value(value)}"]
+    return "\n".join(lines) + "\n"
+
+# Per-request trace spans, kept in a context variable so they follow the request's task
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+recent_traces = deque(maxlen=config.TRACE_HISTORY)
+
+@contextlib.contextmanager
+def trace(name, **attributes):
+    """Start a request trace; spans opened inside it are recorded and the trace is logged on exit."""
+    if not tracing:
+        yield
+        return
+    start = time.perf_counter()
+    record = {"name": name, "attributes": attributes, "start": time.time(), "spans": [], "_perf_start": start}
+    token = _current_trace.set(record)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+        del record["_perf_start"]
+        record["duration"] = time.perf_counter() - start
+        recent_traces.append(record)
+        if logging_config.sampled("trace", logger):
+            spans = ", ".join(f"{span['name']}={span['duration'] * 1000:.1f}ms" for span in record["spans"])
+            logger.info(f"Trace {name} {record['duration'] * 1000:.1f}ms: {spans}", extra=attributes)
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Time a step of the current trace; a no-op outside a trace or with tracing disabled."""
+    record = _current_trace.get() if tracing else None
+    if record is None or "_perf_start" not in record:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        record["spans"].append({"name": name, "offset": start - record["_perf_start"], "duration": duration, **attributes})
+
+@contextlib.contextmanager
+def platform_call(platform, method):
+    """Time a platform API call and count it as failed if it raises."""
+    try:
+        with PLATFORM_CALL_SECONDS.time(platform=platform, method=method), span(f"{platform}.{method}"):
+            yield
+    except Exception:
+        PLATFORM_ERRORS.inc(platform=platform, method=method)
+        raise
+
+async def _handle_request(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain the headers; the endpoint takes no request body
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) > 1 else "/"
+        if path == "/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", render()
+        elif path == "/traces":
+            status, content_type, body = "200 OK", "application/json", json.dumps(list(recent_traces), default=str)
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", "Not found\n"
+        payload = body.encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def run_metrics_server(host="0.0.0.0", port=9108):
+    """Serve /metrics (Prometheus text) and /traces (recent traces as JSON) until cancelled."""
+    server = await asyncio.start_server(_handle_request, host, port)
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
+
+# Hot-path metrics shared across modules
+STORE_SECONDS = Histogram("bot_store_message_seconds", "Time to store one message", ("platform", "mode"))
+MESSAGES_STORED = Counter("bot_messages_stored_total", "Messages stored", ("platform",))
+HISTORY_FETCH_SECONDS = Histogram("bot_history_fetch_seconds", "Time to load history from Postgres on a cache miss", ("scope",))
+PROMPT_TOKENS = Histogram("bot_prompt_tokens", "Estimated tokens in each assembled prompt", ("platform",), TOKEN_BUCKETS)
+PROMPT_TOKENS_SAVED = Counter("bot_prompt_tokens_saved_total", "Tokens kept out of prompts by summaries and trimming", ("platform",))
+LLM_SECONDS = Histogram("bot_llm_request_seconds", "LLM completion latency", ("model", "mode"))
+LLM_FIRST_TOKEN_SECONDS = Histogram("bot_llm_first_token_seconds", "Time to the first streamed token", ("model",))
+LLM_TOKENS = Counter("bot_llm_tokens_total", "LLM tokens used", ("model", "kind"))
+LLM_CALLS_AVOIDED = Counter("bot_llm_calls_avoided_total", "Questions answered from extracted order state", ("platform",))
+LLM_ERRORS = Counter("bot_llm_errors_total", "Failed LLM completions", ("model", "error"))
+LLM_HEDGES = Counter("bot_llm_hedges_total", "Duplicate requests sent after the hedge delay", ("model",))
+LLM_FALLBACKS = Counter("bot_llm_fallbacks_total", "Requests retried on the next endpoint after a failure", ("model",))
+PLATFORM_CALL_SECONDS = Histogram("bot_platform_call_seconds", "Platform API call latency", ("platform", "method"))
+PLATFORM_ERRORS = Counter("bot_platform_errors_total", "Failed platform API calls", ("platform", "method"))
@@ -0,0 +1,158 @@
+import logging
+from datetime import datetime, timezone
+from .partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+# Serializes migrations across bot instances starting against one database
+_MIGRATION_LOCK_KEY = 7305192213
+
+async def _baseline(conn):
+    # Matches the schema init_db_pool used to create inline, so existing databases adopt it as-is
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS group_messages (
+            id SERIAL PRIMARY KEY,
+            platform VARCHAR(50) NOT NULL,
+            chat_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            user_name VARCHAR(255) NOT NULL,
+            message_text TEXT NOT NULL,
+            timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            slack_ts TEXT UNIQUE  -- Unique Slack timestamp to avoid duplicates
+        );
+        CREATE INDEX IF NOT EXISTS idx_group_messages_platform_chat_id_timestamp
+        ON group_messages (platform, chat_id, timestamp);
+    """)
+
+async def _cursors_and_leases(conn):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_cursors (
+            platform VARCHAR(50) NOT NULL,
+            chat_id TEXT NOT NULL,
+            cursor TEXT NOT NULL,  -- Newest ingested message id (Slack ts) in the channel
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (platform, chat_id)
+        );
+        CREATE TABLE IF NOT EXISTS channel_leases (
+            platform VARCHAR(50) NOT NULL,
+            chat_id TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (platform, chat_id)
+        );
+        CREATE TABLE IF NOT EXISTS bot_instances (
+            instance_id TEXT PRIMARY KEY,
+            heartbeat_at TIMESTAMPTZ NOT NULL
+        );
+    """)
+
+async def _partition_group_messages(conn):
+    """Rebuild group_messages as a table range-partitioned by month on timestamp.
+
+    Unique constraints on a partitioned table must include the partition key, so Slack
+    dedup moves to (slack_ts, timestamp). Slack rows take their timestamp from slack_ts,
+    which keeps that pair stable when a message is ingested twice.
+    """
+    await conn.execute("""
+        ALTER TABLE group_messages RENAME TO group_messages_legacy;
+        ALTER INDEX group_messages_pkey RENAME TO group_messages_legacy_pkey;
+        CREATE TABLE group_messages (
+            id BIGSERIAL,
+            platform VARCHAR(50) NOT NULL,
+            chat_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            user_name VARCHAR(255) NOT NULL,
+            message_text TEXT NOT NULL,
+            timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            slack_ts TEXT,
+            PRIMARY KEY (id, timestamp),
+            UNIQUE (slack_ts, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+        -- Channel history: WHERE platform, chat_id ORDER BY timestamp DESC LIMIT n
+        CREATE INDEX idx_group_messages_chat_recent ON group_messages (platform, chat_id, timestamp DESC);
+        -- Cross-channel history: ORDER BY timestamp DESC LIMIT n, answered from the newest partition
+        CREATE INDEX idx_group_messages_recent ON group_messages (timestamp DESC);
+    """)
+    # Same exact conversion as database.slack_ts_to_datetime
+    timestamp = """CASE WHEN slack_ts IS NOT NULL
+        THEN to_timestamp(split_part(slack_ts, '.', 1)::bigint) + coalesce(nullif(split_part(slack_ts, '.', 2), ''), '0')::bigint * interval '1 microsecond'
+        ELSE timestamp END"""
+    oldest = await conn.fetchval(f"SELECT min({timestamp}) FROM group_messages_legacy")
+    await ensure_partitions(conn, oldest or datetime.now(timezone.utc))
+    status = await conn.execute(f"""
+        INSERT INTO group_messages (id, platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts)
+        SELECT id, platform, chat_id, user_id, user_name, message_text, {timestamp}, slack_ts
+        FROM group_messages_legacy
+        ON CONFLICT DO NOTHING
+    """)
+    await conn.execute("""
+        SELECT setval(pg_get_serial_sequence('group_messages', 'id'), coalesce((SELECT max(id) FROM group_messages), 0) + 1, false);
+        DROP TABLE group_messages_legacy;
+    """)
+    logger.info(f"Moved {status.split()[-1]} messages into monthly group_messages partitions")
+
+async def _backfill_progress(conn):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            source TEXT PRIMARY KEY,  -- e.g. slack-api:C123 or telegram-export:/path/result.json
+            position TEXT NOT NULL,  -- Where a resumed import continues from
+            imported BIGINT NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT false,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+async def _default_partition(conn):
+    # Live inserts never create partitions, so rows dated before the oldest month (Slack catch-up,
+    # imports) land here instead of failing; partition maintenance moves them into monthly tables
+    await conn.execute("CREATE TABLE IF NOT EXISTS group_messages_default PARTITION OF group_messages DEFAULT")
+
+# Applied in order; never edit or reorder a released migration, append a new one instead
+MIGRATIONS = [
+    (1, "baseline group_messages", _baseline),
+    (2, "channel cursors and leases", _cursors_and_leases),
+    (3, "monthly partitions for group_messages", _partition_group_messages),
+    (4, "backfill progress", _backfill_progress),
+    (5, "default partition for group_messages", _default_partition),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+async def schema_version(conn):
+    """Return the highest applied migration, or 0 on a fresh database."""
+    exists = await conn.fetchval("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if not exists:
+        return 0
+    return await conn.fetchval("SELECT coalesce(max(version), 0) FROM schema_migrations")
+
+async def migrate(conn):
+    """Apply every pending migration, each in its own transaction, and return the resulting version.
+
+    When the recorded version is already current this is two cheap reads: no lock and no DDL.
+    """
+    version = await schema_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+    await conn.execute("SELECT pg_advisory_lock($1)", _MIGRATION_LOCK_KEY)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        version = await schema_version(conn)
+        for target, description, apply in MIGRATIONS:
+            if target <= version:
+                continue
+            async with conn.transaction():
+                await apply(conn)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES ($1, $2)", target, description
+                )
+            logger.info(f"Applied schema migration {target}: {description}")
+            version = target
+        return version
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", _MIGRATION_LOCK_KEY)
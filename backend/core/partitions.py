@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Serializes partition DDL across bot instances sharing one database
+_MAINTENANCE_LOCK_KEY = 7305192214
+
+def _month_start(moment):
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+def partition_name(month):
+    return f"group_messages_{month:%Y_%m}"
+
+# Catch-all for rows outside every monthly range, e.g. Slack history older than the migration
+DEFAULT_PARTITION = "group_messages_default"
+
+async def _create_partition(conn, month, upper):
+    """Create one monthly partition, moving any rows for that month out of the default partition.
+
+    Postgres refuses to add a range that rows in the default partition already fall into, so
+    the new table is filled first and attached afterwards.
+    """
+    name = partition_name(month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+    if not await conn.fetchval("SELECT to_regclass($1::text) IS NOT NULL", DEFAULT_PARTITION):
+        await conn.execute(f"CREATE TABLE {name} PARTITION OF group_messages FOR VALUES {bounds}")
+        return
+    await conn.execute(f"CREATE TABLE {name} (LIKE group_messages INCLUDING DEFAULTS)")
+    status = await conn.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= $1 AND timestamp < $2 RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        month, upper
+    )
+    await conn.execute(f"ALTER TABLE group_messages ATTACH PARTITION {name} FOR VALUES {bounds}")
+    moved = int(status.split()[-1])
+    if moved:
+        logger.info(f"Moved {moved} messages from {DEFAULT_PARTITION} into {name}")
+
+async def ensure_partitions(conn, start, months_ahead=3):
+    """Create the monthly group_messages partitions from `start` through `months_ahead` months past now."""
+    month = _month_start(start)
+    last = _month_start(datetime.now(timezone.utc))
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    created = 0
+    while month <= last:
+        upper = _next_month(month)
+        exists = await conn.fetchval("SELECT to_regclass($1::text) IS NOT NULL", partition_name(month))
+        if not exists:
+            await _create_partition(conn, month, upper)
+            created += 1
+        month = upper
+    return created
+
+async def apply_retention(conn, retention_days, archive_schema=None):
+    """Drop (or move to `archive_schema`) every partition that ends before the retention window."""
+    if not retention_days:
+        return []
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    rows = await conn.fetch(
+        """
+        SELECT child.relname AS name FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'group_messages'::regclass ORDER BY child.relname
+        """
+    )
+    expired = []
+    for row in rows:
+        # Partition names encode their month, so whole months past the cutoff can go
+        try:
+            month = datetime.strptime(row["name"], "group_messages_%Y_%m").replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+        if _next_month(month) > cutoff:
+            continue
+        if archive_schema:
+            await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}")
+            await conn.execute(f"ALTER TABLE group_messages DETACH PARTITION {row['name']}")
+            await conn.execute(f"ALTER TABLE {row['name']} SET SCHEMA {archive_schema}")
+        else:
+            await conn.execute(f"DROP TABLE {row['name']}")
+        expired.append(row["name"])
+    return expired
+
+async def maintain_partitions(db_pool, months_ahead=3, retention_days=0, archive_schema=None):
+    """Pre-create upcoming partitions and expire old ones, holding an advisory lock so instances don't race.
+
+    Rows that landed in the default partition (older than any monthly one) get their months created here.
+    """
+    async with db_pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _MAINTENANCE_LOCK_KEY)
+            start = datetime.now(timezone.utc)
+            if await conn.fetchval("SELECT to_regclass($1::text) IS NOT NULL", DEFAULT_PARTITION):
+                oldest = await conn.fetchval(f"SELECT min(timestamp) FROM {DEFAULT_PARTITION}")
+                start = min(start, oldest or start)
+            created = await ensure_partitions(conn, start, months_ahead)
+            expired = await apply_retention(conn, retention_days, archive_schema)
+    if created or expired:
+        action = f"archived to {archive_schema}" if archive_schema else "dropped"
+        logger.info(f"Partition maintenance: created {created} partitions, {action} {len(expired)}: {expired}")
+    return created, expired
+
+async def run_partition_maintenance(db_pool, months_ahead=3, retention_days=0, archive_schema=None, interval=3600):
+    """Run partition maintenance every `interval` seconds until cancelled."""
+    while True:
+        try:
+            await maintain_partitions(db_pool, months_ahead, retention_days, archive_schema)
+        except Exception as e:
+            logger.error(f"Partition maintenance error: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,42 @@
+import contextlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Imported first by main.py, so this is as close to process start as we can measure from Python
+_started = time.perf_counter()
+
+phases = {}  # Startup step -> seconds spent in it, in the order the steps ran
+milestones = {}  # Event -> seconds since start, e.g. "ready" or "first_message"
+
+@contextlib.contextmanager
+def phase(name):
+    """Time a startup step; repeated phases of the same name accumulate."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+def milestone(name):
+    """Record when an event first happened, relative to process start."""
+    if name not in milestones:
+        milestones[name] = time.perf_counter() - _started
+        logger.info(f"Startup milestone {name} at {milestones[name] * 1000:.0f}ms")
+
+def on_message_stored(message):
+    """Message listener that records time-to-first-message and then logs the full profile once."""
+    if "first_message" not in milestones:
+        milestone("first_message")
+        report()
+
+def report():
+    steps = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in phases.items())
+    marks = ", ".join(f"{name}@{seconds * 1000:.0f}ms" for name, seconds in milestones.items())
+    logger.info(f"Startup profile: {steps}; milestones: {marks}")
+
+def stats():
+    values = {f"{name}_seconds": seconds for name, seconds in phases.items()}
+    values.update({f"{name}_at_seconds": seconds for name, seconds in milestones.items()})
+    return values
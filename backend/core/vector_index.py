@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VectorIndex:
+    """Fixed-capacity ring of unit-normalised float32 embeddings with message metadata.
+
+    Search is a single matrix-vector product followed by an argpartition top-k.
+    Once full, the oldest vectors are overwritten.
+    """
+
+    def __init__(self, dim, capacity=200000):
+        self.dim = dim
+        self.capacity = capacity
+        self._vectors = np.zeros((min(capacity, 1024), dim), dtype=np.float32)
+        self._metadata = [None] * len(self._vectors)
+        self._count = 0  # Total vectors ever added; the write slot is _count % capacity
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def _grow(self, needed):
+        size = len(self._vectors)
+        if needed <= size or size >= self.capacity:
+            return
+        new_size = min(max(size * 2, needed), self.capacity)
+        vectors = np.zeros((new_size, self.dim), dtype=np.float32)
+        vectors[:size] = self._vectors
+        self._vectors = vectors
+        self._metadata.extend([None] * (new_size - size))
+
+    def add(self, vectors, metadata):
+        """Add a batch of embeddings (n x dim) with one metadata dict each."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            self._grow(self._count + len(vectors))
+            for vector, meta in zip(vectors, metadata):
+                slot = self._count % self.capacity
+                self._vectors[slot] = vector
+                self._metadata[slot] = meta
+                self._count += 1
+
+    def metadata(self):
+        """Return the metadata of every stored vector, in slot order."""
+        with self._lock:
+            return self._metadata[:len(self)]
+
+    def search(self, query, k=10, exclude=None):
+        """Return up to k (score, metadata) pairs by cosine similarity, best first.
+
+        `exclude` is an optional predicate on metadata for entries to skip.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        with self._lock:
+            size = len(self)
+            if size == 0:
+                return []
+            scores = self._vectors[:size] @ (query / norm)
+            metadata = self._metadata[:size]
+        # Over-fetch so excluded entries do not leave the result short
+        fetch = min(size, k * 4 if exclude else k)
+        candidates = np.argpartition(-scores, fetch - 1)[:fetch]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        results = []
+        for i in candidates:
+            if exclude and exclude(metadata[i]):
+                continue
+            results.append((float(scores[i]), metadata[i]))
+            if len(results) == k:
+                break
+        return results
+
+    def save(self, path):
+        """Write vectors to `path`.npy and metadata to `path`.jsonl, oldest first."""
+        with self._lock:
+            size = len(self)
+            start = self._count % self.capacity if self._count > self.capacity else 0
+            order = [(start + i) % self.capacity for i in range(size)]
+            np.save(f"{path}.npy", self._vectors[order])
+            with open(f"{path}.jsonl", "w") as f:
+                for i in order:
+                    f.write(json.dumps(self._metadata[i], default=str) + "\n")
+        logger.info(f"Saved {size} vectors to {path}.npy")
+
+    @classmethod
+    def load(cls, path, capacity=200000):
+        """Load an index written by save(), memory-mapping the vector file while copying it in."""
+        vectors = np.load(f"{path}.npy", mmap_mode="r")
+        index = cls(vectors.shape[1], capacity=capacity)
+        with open(f"{path}.jsonl") as f:
+            metadata = [json.loads(line) for line in f]
+        if len(vectors):
+            index.add(vectors[-capacity:], metadata[-capacity:])
+        logger.info(f"Loaded {len(index)} vectors from {path}.npy")
+        return index
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.jsonl")
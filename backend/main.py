@@ -1,12 +1,15 @@
 import logging
-from .agents import multi_platform_bot
+from .core import logging_config, startup_profile  # First, so the startup profile clock starts before the heavy imports
+
+with startup_profile.phase("imports"):
+    from .agents import multi_platform_bot
 
 # Assuming FastAPI or Flask setup exists
 # Add this as an optional bot runner
 
 def main():
-    # Configure logging if not already done in logging_config.py
-    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    # Formatting and writing happen on the logging_config listener thread, off the event loop
+    logging_config.setup_logging()
     logger = logging.getLogger(__name__)
 
     logger.info("Starting multi-platform bot...")
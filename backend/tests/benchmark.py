@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# End-to-end benchmark: drives synthetic trading-chat traffic through the real ingestion and
+# answering code against local stand-ins for Slack, Telegram, OpenAI and (optionally) Postgres.
+#   python -m backend.tests.benchmark --messages 20000 --mention-rate 20 --llm-latency 0.8
+# Results are written as JSON so runs can be compared across versions.
+
+SYMBOLS = ["BTC", "ETH", "SOL", "USDT", "ARB", "AVAX", "LINK", "DOGE"]
+VENUES = ["Binance", "Coinbase", "Kraken", "OKX", "Bybit", "Deribit"]
+TEMPLATES = [
+    "Filled {qty} {symbol} at {price} on {venue}, order #{order}",
+    "Bid {qty} {symbol} @ {price}, offer {price2}",
+    "Moving {qty} {symbol} to the cold wallet 0x{wallet}",
+    "Anyone else seeing slippage on {symbol}? quoted {price}, got {price2}",
+    "Cancelled order #{order} for {qty} {symbol}",
+    "{venue} withdrawals for {symbol} are delayed again",
+    "Funding on {symbol} perps just flipped, closing {qty} on {venue}",
+]
+QUESTIONS = [
+    "what's the status of order #{order}?",
+    "what's our net {symbol} position on {venue}?",
+    "summarize today's {symbol} fills",
+    "did anyone move {symbol} to cold storage today?",
+]
+_MENTION_TAG = re.compile(r"\[m(\d+)\]")
+
+def _fields(rng):
+    price = round(rng.uniform(0.05, 70000), 2)
+    return {
+        "qty": round(rng.uniform(0.1, 500), 2), "symbol": rng.choice(SYMBOLS), "venue": rng.choice(VENUES),
+        "price": price, "price2": round(price * rng.uniform(0.98, 1.02), 2),
+        "order": rng.randint(10000, 99999), "wallet": "%040x" % rng.getrandbits(160)
+    }
+
+def chat_message(rng):
+    return rng.choice(TEMPLATES).format(**_fields(rng))
+
+def mention_message(rng, bot_name, number):
+    # The tag lets the harness match each mention to the answer_question call that covered it
+    return f"{bot_name} {rng.choice(QUESTIONS).format(**_fields(rng))} [m{number}]"
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def latency_summary(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+        "mean": sum(values) / len(values) if values else None
+    }
+
+def git_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+async def bench_store_message(database, db_pool, count, chats, rng):
+    """Call store_message directly: the floor cost of ingesting one message."""
+    messages = [(f"BENCH-STORE-{rng.randrange(chats)}", f"U{rng.randrange(200)}", chat_message(rng)) for _ in range(count)]
+    start = time.perf_counter()
+    for chat_id, user_id, text in messages:
+        await database.store_message(db_pool, "benchmark", chat_id, user_id, user_id, text)
+    await database.flush_write_buffer(db_pool)
+    elapsed = time.perf_counter() - start
+    return {"messages": count, "seconds": elapsed, "msgs_per_sec": count / elapsed}
+
+async def bench_telegram_ingest(telegram_bot, fake_telegram, db_pool, openai_client, bot_name, count, chats, rng):
+    """Feed fake Telegram updates through handle_telegram_message, without mentions."""
+    context = fake_telegram.make_context(fake_telegram.FakeTelegramBot())
+    updates = [
+        fake_telegram.make_update(-1000000 - rng.randrange(chats), 100 + rng.randrange(200), f"Trader{rng.randrange(200)}", chat_message(rng))
+        for _ in range(count)
+    ]
+    start = time.perf_counter()
+    for update in updates:
+        await telegram_bot.handle_telegram_message(update, context, db_pool=db_pool, client=openai_client, bot_name=bot_name)
+    elapsed = time.perf_counter() - start
+    return {"messages": count, "seconds": elapsed, "msgs_per_sec": count / elapsed}
+
+async def bench_slack_poll(slack_bot, fake_slack, db_pool, openai_client, bot_name, count, chats, rng, slack_latency):
+    """Post a backlog into fake Slack channels and time poll_slack_messages draining it."""
+    channels = [f"CBENCH{i:04d}" for i in range(chats)]
+    slack_client = fake_slack.FakeSlackClient(channels, latency=slack_latency)
+    for channel in channels:
+        # As if the bot had been running: the backlog is everything after the stored cursor
+        slack_bot.channel_last_ts[channel] = f"{time.time() - 1:.6f}"
+    last_ts = {}
+    for _ in range(count):
+        channel = rng.choice(channels)
+        last_ts[channel] = slack_client.post(channel, f"U{rng.randrange(200)}", chat_message(rng))["ts"]
+
+    start = time.perf_counter()
+    poller = asyncio.create_task(slack_bot.poll_slack_messages(db_pool, slack_client, bot_name, openai_client,
+                                                               interval=0.05, max_interval=0.5))
+    try:
+        while any(slack_bot.channel_last_ts.get(channel) != ts for channel, ts in last_ts.items()):
+            if poller.done():
+                poller.result()
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+    finally:
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+    return {
+        "messages": count, "channels": chats, "seconds": elapsed, "msgs_per_sec": count / elapsed,
+        "history_calls": slack_client.calls["conversations_history"]
+    }
+
+async def bench_mentions(modules, db_pool, openai_client, bot_name, args, rng):
+    """Mixed Telegram and Slack traffic at a fixed rate; measures mention-to-reply latency."""
+    llm_agent, telegram_bot, slack_events, fake_slack, fake_telegram, mention_queue = modules
+    telegram = fake_telegram.FakeTelegramBot()
+    context = fake_telegram.make_context(telegram)
+    slack_channels = [f"CMENTION{i:03d}" for i in range(args.chats)]
+    slack_client = fake_slack.FakeSlackClient(slack_channels)
+    submitted_at = {}
+    latencies = []
+
+    # Time each answer_question call and credit it to every mention merged into it
+    answer_question = llm_agent.answer_question
+
+    async def timed_answer_question(platform, chat_id, message_text, *rest):
+        await answer_question(platform, chat_id, message_text, *rest)
+        done = time.perf_counter()
+        for tag in _MENTION_TAG.findall(message_text):
+            latencies.append(done - submitted_at.pop(int(tag)))
+
+    llm_agent.answer_question = timed_answer_question
+    try:
+        total = int(args.mention_rate / args.mention_ratio * args.duration)
+        mentions = 0
+        start = time.perf_counter()
+        for i in range(total):
+            # Pace against the absolute schedule so slow handlers do not lower the offered rate
+            delay = start + i * args.mention_ratio / args.mention_rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text = chat_message(rng)
+            if rng.random() < args.mention_ratio:
+                mentions += 1
+                text = mention_message(rng, bot_name, mentions)
+                submitted_at[mentions] = time.perf_counter()
+            user = rng.randrange(200)
+            if i % 2:
+                update = fake_telegram.make_update(-2000000 - rng.randrange(args.chats), 100 + user, f"Trader{user}", text)
+                await telegram_bot.handle_telegram_message(update, context, db_pool=db_pool, client=openai_client, bot_name=bot_name)
+            else:
+                channel = rng.choice(slack_channels)
+                event = slack_client.post(channel, f"U{user}", text)
+                event["channel"] = channel
+                await slack_events.handle_slack_event(event, db_pool, slack_client, slack_client.bot_user_id, bot_name, openai_client)
+        offered = time.perf_counter() - start
+
+        deadline = time.perf_counter() + args.drain_timeout
+        while submitted_at and time.perf_counter() < deadline:
+            stats = mention_queue.stats()
+            if not stats["depth"] and not stats["running"]:
+                break  # Whatever is left was shed with a busy reply
+            await asyncio.sleep(0.05)
+    finally:
+        llm_agent.answer_question = answer_question
+    return {
+        "messages": total, "offered_seconds": offered, "mentions": mentions,
+        "answered": len(latencies), "unanswered": len(submitted_at),
+        "latency": latency_summary(latencies)
+    }
+
+async def run(args):
+    # Configure the bot for local stand-ins before its modules read the environment
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["LLM_STREAMING"] = "true" if args.streaming else "false"
+    os.environ["TELEGRAM_EDIT_INTERVAL"] = os.environ["SLACK_EDIT_INTERVAL"] = str(args.edit_interval)
+    os.environ["SLACK_HISTORY_RATE_PER_MINUTE"] = str(args.slack_rate)
+    os.environ["SLACK_HISTORY_BURST"] = str(max(int(args.slack_rate / 60), 10))
+    os.environ["RETRIEVAL_EMBEDDER"] = ""
+    from ..core import config, database
+    from ..core.history_cache import history_cache
+    from ..agents import llm_agent, telegram_bot, slack_bot, slack_events
+    from ..agents.answer_cache import answer_cache
+    from ..agents.job_queue import mention_queue
+    from ..agents.order_state import order_tracker
+    from ..agents.llm_router import router
+    from ..agents.user_directory import user_directory
+    from . import fake_db, fake_openai, fake_slack, fake_telegram
+
+    fake = fake_openai.start_fake_openai(latency=args.llm_latency, token_latency=args.token_latency)
+    openai_client = llm_agent.get_openai_client("fake", base_url=fake.base_url)
+    if args.postgres:
+        db_pool = await database.init_db_pool(config.DB_CONFIG)
+    else:
+        db_pool = fake_db.InMemoryPool(latency=args.db_latency, max_size=config.DB_POOL_MAX_SIZE)
+    if args.write_buffer:
+        database.enable_write_buffer(db_pool, config.DB_WRITE_BATCH_SIZE, config.DB_WRITE_FLUSH_INTERVAL)
+
+    rng = random.Random(args.seed)
+    bot_name = "@opsbot"
+    results = {}
+    try:
+        logger.info("Benchmarking store_message")
+        results["store_message"] = await bench_store_message(database, db_pool, args.messages, args.chats, rng)
+        logger.info("Benchmarking Telegram ingestion")
+        results["telegram_ingest"] = await bench_telegram_ingest(telegram_bot, fake_telegram, db_pool, openai_client,
+                                                                 bot_name, args.messages, args.chats, rng)
+        logger.info("Benchmarking Slack polling")
+        results["slack_poll"] = await bench_slack_poll(slack_bot, fake_slack, db_pool, openai_client, bot_name,
+                                                       args.messages, args.chats, rng, args.slack_latency)
+        logger.info("Benchmarking mention-to-reply latency")
+        modules = (llm_agent, telegram_bot, slack_events, fake_slack, fake_telegram, mention_queue)
+        results["mentions"] = await bench_mentions(modules, db_pool, openai_client, bot_name, args, rng)
+        stats = {
+            "history_cache": history_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "order_state": order_tracker.stats() if order_tracker else None,
+            "llm_router": router.stats(),
+            "mention_queue": mention_queue.stats(),
+            "user_directory": user_directory.stats()
+        }
+    finally:
+        await mention_queue.close(timeout=1)
+        await database.close_write_buffer(db_pool)
+        await openai_client.close()
+        await db_pool.close()
+        fake.shutdown()
+    return results, stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion throughput and mention-to-reply latency.")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages per ingestion scenario")
+    parser.add_argument("--chats", type=int, default=20, help="Channels/chats the traffic is spread over")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of mixed traffic in the mention scenario")
+    parser.add_argument("--mention-rate", type=float, default=5, help="Mentions per second in the mention scenario")
+    parser.add_argument("--mention-ratio", type=float, default=0.1, help="Fraction of messages that mention the bot")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="Seconds to wait for queued answers")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake OpenAI seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Fake OpenAI seconds between streamed words")
+    parser.add_argument("--db-latency", type=float, default=0.0005, help="In-memory pool seconds per query")
+    parser.add_argument("--slack-latency", type=float, default=0.02, help="Fake Slack seconds per API call")
+    parser.add_argument("--slack-rate", type=float, default=6000, help="conversations.history calls per minute")
+    parser.add_argument("--edit-interval", type=float, default=0.2, help="Seconds between streamed edits")
+    parser.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--write-buffer", action="store_true", help="Front the pool with the write-behind buffer")
+    parser.add_argument("--postgres", action="store_true", help="Use the Postgres from DB_* settings instead of the in-memory pool")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Result file (default: benchmark-<commit>-<time>.json)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    # The bot logs every stored message and reply; keep the benchmark output readable
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    started_at = datetime.now(timezone.utc)
+    results, stats = asyncio.run(run(args))
+    version = git_version()
+    report = {
+        "version": version,
+        "started_at": started_at.isoformat(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results,
+        "stats": stats
+    }
+    output = args.output or f"benchmark-{version['commit'] or 'local'}-{started_at:%Y%m%dT%H%M%S}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    for name in ("store_message", "telegram_ingest", "slack_poll"):
+        print(f"{name:>16}: {results[name]['msgs_per_sec']:,.0f} msgs/sec over {results[name]['messages']} messages")
+    latency = results["mentions"]["latency"]
+    if latency["count"]:
+        print(f"{'mention->reply':>16}: p50 {latency['p50'] * 1000:.0f} ms, p99 {latency['p99'] * 1000:.0f} ms "
+              f"({latency['count']} answered, {results['mentions']['unanswered']} unanswered)")
+    print(f"Saved {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+import contextlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# In-process stand-in for the asyncpg pool, covering only the statements core/database.py issues
+# on the hot path (store, batch store, history reads, cursors). Use a real Postgres for schema work.
+class InMemoryConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def execute(self, query, *args):
+        await self.pool._simulate_latency()
+        if "INSERT INTO group_messages" in query:
+            if "unnest" in query:
+                rows = list(zip(*args))
+            else:
+                rows = [args if len(args) == 7 else (*args, None)]
+            inserted = sum(self.pool._insert(*row) for row in rows)
+            return f"INSERT 0 {inserted}"
+        if "INSERT INTO channel_cursors" in query:
+            platform, chat_ids, cursors = args
+            for chat_id, cursor in zip(chat_ids, cursors):
+                current = self.pool.cursors.get((platform, chat_id))
+                if current is None or float(current) < float(cursor):
+                    self.pool.cursors[(platform, chat_id)] = cursor
+            return f"INSERT 0 {len(chat_ids)}"
+        return "OK"
+
+    async def fetch(self, query, *args):
+        await self.pool._simulate_latency()
+        if "INSERT INTO group_messages" in query:
+            # Batch insert with RETURNING slack_ts, timestamp
+            return [{"slack_ts": row[6], "timestamp": row[5]} for row in zip(*args) if self.pool._insert(*row)]
+        if "FROM group_messages" in query:
+            if "chat_id = $2" in query:
+                platform, chat_id, limit = args
+                rows = self.pool.messages.get((platform, chat_id), [])
+            else:
+                limit, = args
+                rows = self.pool.all_messages
+            newest = sorted(rows[-limit * 4:], key=lambda row: row["timestamp"], reverse=True)
+            return newest[:limit]
+        if "FROM channel_cursors" in query:
+            platform = args[0]
+            wanted = set(args[1]) if len(args) > 1 else None
+            return [
+                {"chat_id": chat_id, "cursor": cursor}
+                for (cursor_platform, chat_id), cursor in self.pool.cursors.items()
+                if cursor_platform == platform and (wanted is None or chat_id in wanted)
+            ]
+        return []
+
+    async def fetchval(self, query, *args):
+        await self.pool._simulate_latency()
+        return None
+
+    async def fetchrow(self, query, *args):
+        await self.pool._simulate_latency()
+        return None
+
+class InMemoryPool:
+    """Holds group_messages rows and channel cursors in dicts; `latency` seconds are added per query."""
+
+    def __init__(self, latency=0.0, max_size=10):
+        self.latency = latency
+        self.messages = {}  # (platform, chat_id) -> rows in insertion order
+        self.all_messages = []
+        self.cursors = {}
+        self.queries = 0
+        self._slack_keys = set()
+        self._connections = asyncio.Semaphore(max_size)
+
+    def _insert(self, platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts):
+        if slack_ts is not None:
+            if (slack_ts, timestamp) in self._slack_keys:
+                return 0
+            self._slack_keys.add((slack_ts, timestamp))
+        row = {
+            "platform": platform, "chat_id": chat_id, "user_id": user_id,
+            "user_name": user_name, "message_text": message_text, "timestamp": timestamp, "slack_ts": slack_ts
+        }
+        self.messages.setdefault((platform, chat_id), []).append(row)
+        self.all_messages.append(row)
+        return 1
+
+    async def _simulate_latency(self):
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @property
+    def row_count(self):
+        return len(self.all_messages)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        async with self._connections:
+            yield InMemoryConnection(self)
+
+    async def close(self):
+        logger.info(f"In-memory pool closed with {self.row_count} messages after {self.queries} queries")
@@ -0,0 +1,129 @@
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Local OpenAI-compatible stand-in: point OPENAI_BASE_URL at http://127.0.0.1:<port>/v1
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the OpenAI client expects
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        time.sleep(self.server.latency)
+        count = next(self.server.request_counter)
+        if self.server.fail_status:
+            self._send_json(self.server.fail_status, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+        content = self.server.reply or f"Fake reply #{count}"
+        if request.get("stream"):
+            self._send_stream(request, content)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    def _send_stream(self, request, content):
+        """Send the reply as server-sent chat.completion.chunk events, one word at a time."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.server.token_latency)
+            self._send_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake-model"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]
+            })
+        self._send_event({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)}
+        })
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _send_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on the request, e.g. a cancelled hedge
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def start_fake_openai(host="127.0.0.1", port=0, latency=0.5, reply=None, token_latency=0.05, fail_status=None):
+    """Start the fake server in a daemon thread and return it; its base URL is server.base_url.
+
+    `latency` is the delay before the first byte; streamed replies add `token_latency` per word.
+    With `fail_status` every completion fails with that HTTP status. All three can be changed
+    on the returned server while it runs.
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_latency = token_latency
+    server.reply = reply
+    server.fail_status = fail_status
+    server.request_counter = itertools.count(1)
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Fake OpenAI server listening on {server.base_url} with {latency}s latency")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in server.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before each reply")
+    parser.add_argument("--token-latency", type=float, default=0.05, help="Seconds between streamed words")
+    parser.add_argument("--reply", default=None, help="Fixed reply text")
+    parser.add_argument("--fail-status", type=int, default=None, help="Fail every completion with this HTTP status")
+    args = parser.parse_args()
+    fake = start_fake_openai(port=args.port, latency=args.latency, reply=args.reply, token_latency=args.token_latency,
+                             fail_status=args.fail_status)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.shutdown()
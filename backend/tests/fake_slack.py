@@ -0,0 +1,85 @@
+import itertools
+import threading
+import time
+from collections import Counter
+
+# Stand-in for slack_sdk.WebClient: channels, users and history live in memory. Methods are
+# synchronous and thread-safe like the real client, which the bot calls through asyncio.to_thread.
+class FakeSlackClient:
+    def __init__(self, channels, users=None, latency=0.0, bot_user_id="UBOT"):
+        self.token = "xoxb-fake"
+        self.latency = latency
+        self.bot_user_id = bot_user_id
+        self.channels = list(channels)
+        self.users = users or {}  # user_id -> real name
+        self.calls = Counter()
+        self.replies = []  # (channel, ts, text, "post" or "update", time.monotonic())
+        self._history = {channel: [] for channel in self.channels}  # Oldest first
+        self._lock = threading.Lock()
+        self._last_ts = 0.0
+        self._reply_ids = itertools.count(1)
+
+    def _call(self, method):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _next_ts(self):
+        # Slack ts values are unique per channel and strictly increasing
+        self._last_ts = max(time.time(), self._last_ts + 0.000001)
+        return f"{self._last_ts:.6f}"
+
+    def post(self, channel, user, text):
+        """Add a user message to a channel's history, as if someone had sent it; returns the message."""
+        with self._lock:
+            message = {"type": "message", "ts": self._next_ts(), "user": user, "text": text}
+            self._history[channel].append(message)
+            return message
+
+    def auth_test(self, **kwargs):
+        self._call("auth_test")
+        return {"ok": True, "user_id": self.bot_user_id}
+
+    def conversations_list(self, types=None, limit=1000, cursor=None, **kwargs):
+        self._call("conversations_list")
+        channels = [{"id": channel, "name": channel.lower(), "is_member": True} for channel in self.channels]
+        return {"ok": True, "channels": channels, "response_metadata": {"next_cursor": ""}}
+
+    def conversations_history(self, channel, limit=100, oldest=None, latest=None, cursor=None, **kwargs):
+        self._call("conversations_history")
+        with self._lock:
+            messages = [
+                message for message in reversed(self._history[channel])
+                if (oldest is None or float(message["ts"]) > float(oldest))
+                and (latest is None or float(message["ts"]) < float(latest))
+            ]
+        start = int(cursor or 0)
+        has_more = start + limit < len(messages)
+        return {
+            "ok": True,
+            "messages": messages[start:start + limit],
+            "has_more": has_more,
+            "response_metadata": {"next_cursor": str(start + limit) if has_more else ""}
+        }
+
+    def users_info(self, user, **kwargs):
+        self._call("users_info")
+        return {"ok": True, "user": {"id": user, "real_name": self.users.get(user, f"User {user}")}}
+
+    def users_list(self, limit=200, cursor=None, **kwargs):
+        self._call("users_list")
+        members = [{"id": user_id, "real_name": name} for user_id, name in self.users.items()]
+        return {"ok": True, "members": members, "response_metadata": {"next_cursor": ""}}
+
+    def chat_postMessage(self, channel, text, **kwargs):
+        self._call("chat_postMessage")
+        ts = f"{next(self._reply_ids)}.000000"
+        with self._lock:
+            self.replies.append((channel, ts, text, "post", time.monotonic()))
+        return {"ok": True, "channel": channel, "ts": ts}
+
+    def chat_update(self, channel, ts, text, **kwargs):
+        self._call("chat_update")
+        with self._lock:
+            self.replies.append((channel, ts, text, "update", time.monotonic()))
+        return {"ok": True, "channel": channel, "ts": ts}
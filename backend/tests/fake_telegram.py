@@ -0,0 +1,36 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+# Stand-ins for the python-telegram-bot objects handle_telegram_message touches:
+# update.message.{text, chat_id, from_user.{id, first_name}} and context.bot.
+class FakeTelegramBot:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.replies = []  # (chat_id, message_id, text, "send" or "edit", time.monotonic())
+        self._message_ids = itertools.count(1)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message_id = next(self._message_ids)
+        self.replies.append((chat_id, message_id, text, "send", time.monotonic()))
+        return SimpleNamespace(message_id=message_id, chat_id=chat_id, text=text)
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.replies.append((chat_id, message_id, text, "edit", time.monotonic()))
+        return SimpleNamespace(message_id=message_id, chat_id=chat_id, text=text)
+
+_update_ids = itertools.count(1)
+
+def make_update(chat_id, user_id, first_name, text):
+    """Build a group text-message update shaped like telegram.Update."""
+    from_user = SimpleNamespace(id=user_id, first_name=first_name, is_bot=False)
+    message = SimpleNamespace(message_id=next(_update_ids), text=text, chat_id=chat_id, from_user=from_user)
+    return SimpleNamespace(update_id=message.message_id, message=message, effective_chat=SimpleNamespace(id=chat_id))
+
+def make_context(bot):
+    return SimpleNamespace(bot=bot)
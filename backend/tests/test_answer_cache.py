@@ -0,0 +1,86 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from backend.agents import answer_cache as answer_cache_module
+from backend.agents.answer_cache import AnswerCache
+
+class CountingCompute:
+    """Stub LLM call: counts invocations and answers after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"answer {self.calls}", 100
+
+@pytest.fixture(autouse=True)
+def bot_name(monkeypatch):
+    monkeypatch.setattr(answer_cache_module.config, "TELEGRAM_BOT_NAME", "@bot")
+    monkeypatch.setattr(answer_cache_module.config, "SLACK_BOT_NAME", "")
+
+_START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def _history(*texts):
+    """Newest-first channel rows, one minute apart."""
+    rows = [{"platform": "telegram", "chat_id": "42", "user_id": "7", "user_name": "bob",
+             "message_text": text, "timestamp": _START + timedelta(minutes=i)} for i, text in enumerate(texts)]
+    return list(reversed(rows))
+
+def test_concurrent_identical_questions_share_one_call(run):
+    cache = AnswerCache()
+    compute = CountingCompute(delay=0.05)
+    history = _history("bought 1 BTC", "@bot confirm the order?")
+
+    async def scenario():
+        keys = [cache.make_key("telegram", "42", text, history)
+                for text in ("@bot confirm the order?", "@bot Confirm the order", "@bot  confirm the order?!")]
+        assert len(set(keys)) == 1
+        return await asyncio.gather(*(cache.get_or_compute(key, compute) for key in keys))
+
+    assert run(scenario()) == ["answer 1"] * 3
+    assert compute.calls == 1
+    assert (cache.misses, cache.coalesced, cache.saved_tokens) == (1, 2, 200)
+
+def test_new_message_past_the_watermark_invalidates(run):
+    cache = AnswerCache()
+    compute = CountingCompute()
+    question = "@bot confirm the order?"
+
+    async def scenario():
+        history = _history("bought 1 BTC", question)
+        first = await cache.get_or_compute(cache.make_key("telegram", "42", question, history), compute)
+        # Asking again only adds another mention, which does not move the watermark
+        history = _history("bought 1 BTC", question, question)
+        again = await cache.get_or_compute(cache.make_key("telegram", "42", question, history), compute)
+        history = _history("bought 1 BTC", question, "make it 2 BTC", question)
+        changed = await cache.get_or_compute(cache.make_key("telegram", "42", question, history), compute)
+        return first, again, changed
+
+    assert run(scenario()) == ("answer 1", "answer 1", "answer 2")
+    assert compute.calls == 2 and cache.hits == 1
+
+def test_entries_expire_after_the_ttl(run, monkeypatch):
+    cache = AnswerCache(ttl=300)
+    compute = CountingCompute()
+    key = cache.make_key("telegram", "42", "@bot confirm?", _history("bought 1 BTC"))
+    assert run(cache.get_or_compute(key, compute)) == "answer 1"
+    assert run(cache.get_or_compute(key, compute)) == "answer 1"
+    later = time.monotonic() + 301
+    monkeypatch.setattr("backend.agents.answer_cache.time.monotonic", lambda: later)
+    assert run(cache.get_or_compute(key, compute)) == "answer 2"
+    assert compute.calls == 2
+
+def test_failures_are_not_cached(run):
+    cache = AnswerCache()
+
+    async def failing():
+        raise RuntimeError("LLM down")
+    key = ("telegram", "42", "confirm", None)
+    with pytest.raises(RuntimeError):
+        run(cache.get_or_compute(key, failing))
+    compute = CountingCompute()
+    assert run(cache.get_or_compute(key, compute)) == "answer 1"
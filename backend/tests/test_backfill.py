@@ -0,0 +1,47 @@
+import json
+import asyncpg
+import pytest
+from backend.agents import backfill
+from backend.core import database, migrations
+
+def _telegram_export(path, count):
+    messages = [{"id": i, "type": "message", "date_unixtime": str(1767225600 + i * 60), "from": "bob",
+                 "from_id": "user7", "text": f"message {i}"} for i in range(count)]
+    # A service message still counts towards the saved position
+    messages.insert(3, {"id": 1000, "type": "service", "date_unixtime": "1767225700", "action": "pin_message"})
+    path.write_text(json.dumps({"id": 42, "type": "private_supergroup", "messages": messages}))
+    return path
+
+def test_interrupted_backfill_resumes_without_duplicates(run, database_url, tmp_path, monkeypatch):
+    export = _telegram_export(tmp_path / "result.json", 12)
+    copy_messages = database.copy_messages
+    batches = []
+
+    async def copy_then_fail(*args, **kwargs):
+        if batches:
+            raise ConnectionResetError("import interrupted")
+        batches.append(await copy_messages(*args, **kwargs))
+        return batches[-1]
+
+    async def scenario():
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=2)
+        try:
+            async with pool.acquire() as conn:
+                await migrations.migrate(conn)
+            monkeypatch.setattr(database, "copy_messages", copy_then_fail)
+            with pytest.raises(ConnectionResetError):
+                await backfill.backfill_telegram_export(pool, export, batch_size=5)
+            assert batches == [5]
+            monkeypatch.setattr(database, "copy_messages", copy_messages)
+            stats = await backfill.backfill_telegram_export(pool, export, batch_size=5)
+            assert stats["inserted"] == 7
+            # Telegram rows have no dedup key, so only the saved position keeps this from re-importing
+            assert await backfill.backfill_telegram_export(pool, export, batch_size=5) is None
+            async with pool.acquire() as conn:
+                texts = [row["message_text"] for row in await conn.fetch("SELECT message_text FROM group_messages")]
+                progress = await database.load_backfill_progress(pool, f"telegram-export:{export.resolve()}")
+            assert sorted(texts) == sorted(f"message {i}" for i in range(12))
+            assert progress["completed"] and progress["imported"] == 12
+        finally:
+            await pool.close()
+    run(scenario())
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+import asyncpg
+import pytest
+from backend.core import export, migrations
+
+@pytest.mark.parametrize("consistent", [False, True])
+def test_paged_export_yields_every_tied_row_once(run, database_url, consistent):
+    async def scenario():
+        conn = await asyncpg.connect(database_url)
+        try:
+            await migrations.migrate(conn)
+            start = datetime.now(timezone.utc).replace(microsecond=0)
+            # Runs of identical timestamps that straddle the page boundaries
+            rows = [("telegram", "42", str(i), f"user{i}", f"message {i}", start + timedelta(seconds=i // 7), None)
+                    for i in range(30)]
+            await conn.executemany(
+                "INSERT INTO group_messages (platform, chat_id, user_id, user_name, message_text, timestamp, slack_ts) "
+                "VALUES ($1, $2, $3, $4, $5, $6, $7)", rows
+            )
+            exported = [row async for row in export.iter_messages(conn, page_size=4, consistent=consistent)]
+            texts = [row["message_text"] for row in exported]
+            assert sorted(texts) == sorted(f"message {i}" for i in range(30))
+            assert len(set(row["id"] for row in exported)) == 30
+            assert [row["timestamp"] for row in exported] == sorted(row["timestamp"] for row in exported)
+            # Bounds cut through a run of ties without dropping or repeating its rows
+            bounded = [row async for row in export.iter_messages(conn, start + timedelta(seconds=1),
+                                                                  start + timedelta(seconds=3), page_size=3)]
+            assert sorted(row["message_text"] for row in bounded) == sorted(f"message {i}" for i in range(7, 21))
+        finally:
+            await conn.close()
+    run(scenario())
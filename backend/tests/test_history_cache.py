@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timedelta, timezone
+from backend.core.history_cache import HistoryCache
+
+def _message(platform, chat_id, text):
+    return {"platform": platform, "chat_id": chat_id, "user_id": "U1", "user_name": "alice",
+            "message_text": text, "timestamp": datetime.now(timezone.utc)}
+
+def _hydrate(cache, rows, platform=None, chat_id=None):
+    cache.begin_hydrate(platform, chat_id)
+    cache.finish_hydrate(rows, platform, chat_id)
+
+def test_invalidate_drops_taken_over_channels_and_the_global_ring():
+    cache = HistoryCache(depth=10)
+    for chat_id in ("C1", "C2"):
+        _hydrate(cache, [_message("slack", chat_id, "hello")], "slack", chat_id)
+    _hydrate(cache, [_message("telegram", "42", "hi")], "telegram", "42")
+    _hydrate(cache, [])
+    cache.invalidate("slack", {"C1"})
+    assert cache.get("slack", "C1") is None
+    assert cache.get() is None
+    assert cache.get("slack", "C2") is not None
+    assert cache.get("telegram", "42") is not None
+    cache.invalidate("slack")
+    assert cache.get("slack", "C2") is None
+    assert cache.stats()["bytes"] == cache._rings[("telegram", "42")].size
+
+def test_global_ring_expires_when_shared_across_instances(monkeypatch):
+    cache = HistoryCache(depth=10, global_ttl=30)
+    _hydrate(cache, [_message("slack", "C1", "hello")])
+    _hydrate(cache, [_message("slack", "C1", "hello")], "slack", "C1")
+    assert cache.get() is not None
+    later = time.monotonic() + 31
+    monkeypatch.setattr("backend.core.history_cache.time.monotonic", lambda: later)
+    assert cache.get() is None
+    # Channel rings are exact while this instance owns the channel, so they do not expire
+    assert cache.get("slack", "C1") is not None
+
+def test_repeated_text_stored_during_hydration_is_kept():
+    cache = HistoryCache(depth=10)
+    before = _message("telegram", "42", "ok")
+    before["timestamp"] -= timedelta(seconds=5)
+    cache.begin_hydrate("telegram", "42")
+    # The same user says "ok" again while the history query is in flight
+    during = _message("telegram", "42", "ok")
+    cache.append(during)
+    cache.finish_hydrate([before], "telegram", "42")
+    assert cache.get("telegram", "42") == [during, before]
+
+def test_message_flushed_while_hydrating_is_not_replayed_twice():
+    cache = HistoryCache(depth=10)
+    cache.begin_hydrate("telegram", "42")
+    message = _message("telegram", "42", "ok")
+    cache.append(message)
+    # The query ran after the row committed, so it already returns it
+    cache.finish_hydrate([dict(message)], "telegram", "42")
+    assert cache.get("telegram", "42") == [message]
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from backend.agents import job_queue
+from backend.agents.job_queue import MentionQueue
+
+class StubHandler:
+    """Replaces llm_agent.answer_question; each answer waits until the test releases it."""
+
+    def __init__(self):
+        self.answered = []  # (chat_id, text) in start order
+        self.running = set()
+        self.overlapped = False
+        self.release = asyncio.Event()
+
+    async def __call__(self, platform, chat_id, message_text, db_pool, response_func, client):
+        self.overlapped |= chat_id in self.running
+        self.running.add(chat_id)
+        self.answered.append((chat_id, message_text))
+        try:
+            await self.release.wait()
+        finally:
+            self.running.discard(chat_id)
+
+@pytest.fixture
+def handler(monkeypatch):
+    def install():
+        stub = StubHandler()
+        monkeypatch.setattr(job_queue.llm_agent, "answer_question", stub)
+        return stub
+    return install
+
+def _replies():
+    sent = []
+
+    async def response_func(chat_id, text):
+        sent.append((chat_id, text))
+    return sent, response_func
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_mentions_in_a_chat_are_answered_in_order_and_merged(run, handler):
+    async def scenario():
+        stub = handler()
+        queue = MentionQueue(workers=4, max_depth=10)
+        _, reply = _replies()
+        queue.submit("telegram", "42", "q1", None, reply, None)
+        await _settle()
+        # q1 is running, so these wait behind it as one merged job
+        for text in ("q2", "q3"):
+            queue.submit("telegram", "42", text, None, reply, None)
+        await _settle()
+        assert stub.answered == [("42", "q1")]
+        stub.release.set()
+        await queue.close(timeout=1)
+        assert stub.answered == [("42", "q1"), ("42", "q2\nq3")]
+        assert not stub.overlapped
+        assert (queue.submitted, queue.coalesced, queue.completed) == (2, 1, 2)
+    run(scenario())
+
+def test_new_chats_are_shed_at_capacity(run, handler):
+    async def scenario():
+        stub = handler()
+        queue = MentionQueue(workers=1, max_depth=2)
+        sent, reply = _replies()
+        queue.submit("telegram", "A", "a", None, reply, None)
+        await _settle()
+        assert queue.submit("telegram", "B", "b", None, reply, None)
+        assert queue.submit("telegram", "C", "c", None, reply, None)
+        assert queue.depth == 2
+        assert not queue.submit("telegram", "D", "d", None, reply, None)
+        # A chat that already has a waiting job still merges into it
+        assert queue.submit("telegram", "B", "b2", None, reply, None)
+        await _settle()
+        assert queue.shed == 1 and queue.coalesced == 1
+        assert [chat_id for chat_id, _ in sent] == ["D"]
+        stub.release.set()
+        await queue.close(timeout=1)
+        assert stub.answered == [("A", "a"), ("B", "b\nb2"), ("C", "c")]
+    run(scenario())
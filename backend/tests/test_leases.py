@@ -0,0 +1,42 @@
+import asyncio
+import asyncpg
+from backend.core import migrations
+from backend.core.leases import ChannelLeaseManager
+
+CHANNELS = [f"C{i}" for i in range(6)]
+
+def test_channels_fail_over_when_an_instance_dies(run, database_url):
+    async def scenario():
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=4)
+        try:
+            async with pool.acquire() as conn:
+                await migrations.migrate(conn)
+            first = ChannelLeaseManager(pool, "first", lease_ttl=1)
+            second = ChannelLeaseManager(pool, "second", lease_ttl=1)
+            for manager in (first, second):
+                manager.set_channels("slack", CHANNELS)
+                manager.want_singleton("telegram")
+            # The first instance starts alone and takes everything
+            await first.rebalance()
+            assert first.owned("slack") == set(CHANNELS) and first.holds_singleton("telegram")
+            # A second instance joins: the first hands back half, which the second then claims
+            await second.rebalance()
+            await first.rebalance()
+            await second.rebalance()
+            assert len(first.owned("slack")) == len(second.owned("slack")) == 3
+            assert not first.owned("slack") & second.owned("slack")
+            assert not second.holds_singleton("telegram")
+
+            # The first instance dies without releasing; its leases expire after the TTL
+            await asyncio.sleep(1.2)
+            await second.rebalance()
+            assert second.owned("slack") == set(CHANNELS)
+            assert second.holds_singleton("telegram")
+
+            # A clean shutdown hands over without waiting for the TTL
+            await second.release()
+            await first.rebalance()
+            assert first.owned("slack") == set(CHANNELS) and first.holds_singleton("telegram")
+        finally:
+            await pool.close()
+    run(scenario())
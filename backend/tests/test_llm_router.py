@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from backend.agents import llm_router
+from backend.agents.llm_router import LLMRouter, LLMUnavailableError
+
+PRIMARY = "primary-client"
+FALLBACK = "fallback-client"
+
+class FakeStreams:
+    """Replaces create_completion_stream: each call waits `delay`, then streams `words` one by one.
+
+    Behaviours are taken in call order; a behaviour of an exception class makes that call fail.
+    """
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.clients = []
+
+    async def __call__(self, client, messages, on_text, model=None, **kwargs):
+        self.clients.append(client)
+        behaviour = self.behaviours.pop(0)
+        if isinstance(behaviour, type):
+            raise behaviour("injected failure")
+        delay, words = behaviour
+        await asyncio.sleep(delay)
+        text = ""
+        for word in words:
+            text = f"{text} {word}".strip()
+            await on_text(text)
+            await asyncio.sleep(0.01)
+        return text, len(words)
+
+@pytest.fixture
+def streams(monkeypatch):
+    def install(*behaviours, fallback=False):
+        fake = FakeStreams(*behaviours)
+        monkeypatch.setattr(llm_router, "create_completion_stream", fake)
+        monkeypatch.setattr(llm_router, "_get_fallback_client", lambda: FALLBACK if fallback else None)
+        return fake
+    return install
+
+async def _complete(router, **kwargs):
+    edits = []
+
+    async def on_text(text):
+        edits.append(text)
+    result = await router.complete(PRIMARY, [{"role": "user", "content": "hi"}], model="m", on_text=on_text, **kwargs)
+    return result, edits
+
+def test_same_endpoint_hedge_streams_from_one_attempt_only(run, streams):
+    # The original answers first, shortly after the hedge went out to the same endpoint
+    fake = streams((0.1, ["a1", "a2", "a3"]), (0.1, ["b1", "b2", "b3"]))
+    router = LLMRouter("m", hedge_after=0.05, hedge_same_endpoint=True)
+    (text, _), edits = run(_complete(router))
+    assert fake.clients == [PRIMARY, PRIMARY]
+    assert text == "a1 a2 a3"
+    assert edits == ["a1", "a1 a2", "a1 a2 a3"]
+    assert (router.hedges, router.hedge_wins) == (1, 0)
+
+def test_no_hedge_without_a_fallback_by_default(run, streams):
+    fake = streams((0.1, ["slow", "reply"]))
+    router = LLMRouter("m", hedge_after=0.02)
+    (text, _), _ = run(_complete(router))
+    assert text == "slow reply" and fake.clients == [PRIMARY]
+    assert router.hedges == 0
+
+def test_hedge_to_fallback_wins_and_cancels_the_primary(run, streams):
+    fake = streams((0.3, ["late"]), (0, ["fast", "reply"]), fallback=True)
+    router = LLMRouter("m", hedge_after=0.05)
+    (text, _), edits = run(_complete(router))
+    assert fake.clients == [PRIMARY, FALLBACK]
+    assert text == "fast reply" and edits == ["fast", "fast reply"]
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+
+def test_failover_and_open_breaker(run, streams):
+    fake = streams(RuntimeError, (0, ["from", "fallback"]), RuntimeError, (0, ["again"]), (0, ["direct"]), fallback=True)
+    router = LLMRouter("m", breaker_failures=2, breaker_reset=60)
+    assert run(_complete(router))[0][0] == "from fallback"
+    assert run(_complete(router))[0][0] == "again"
+    # Two consecutive primary failures opened its breaker, so the next request skips it
+    assert run(_complete(router))[0][0] == "direct"
+    assert fake.clients == [PRIMARY, FALLBACK, PRIMARY, FALLBACK, FALLBACK]
+    assert router.fallbacks == 2
+
+def test_unavailable_when_every_breaker_is_open(run, streams):
+    streams(RuntimeError)
+    router = LLMRouter("m", breaker_failures=1, breaker_reset=60)
+    with pytest.raises(RuntimeError):
+        run(_complete(router))
+    with pytest.raises(LLMUnavailableError):
+        run(_complete(router))
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+import pytest
+from backend.agents.order_state import OrderStateTracker
+
+def _track(*messages):
+    tracker = OrderStateTracker()
+    for author, text in messages:
+        tracker.on_message_stored({"platform": "slack", "chat_id": "C1", "user_name": author,
+                                   "message_text": text, "timestamp": datetime.now(timezone.utc)})
+    return tracker.get("slack", "C1")
+
+@pytest.mark.parametrize("reply, status", [
+    ("ok let me check with my boss", "pending"),
+    ("yes but not before Monday", "pending"),
+    ("confirmed?", "pending"),
+    ("ok", "confirmed"),
+    ("yes please 👍", "confirmed"),
+    ("Confirmed, send to wallet bc1qexampleexampleexample", "confirmed"),
+    ("no, hold off", "rejected"),
+])
+def test_only_a_real_confirmation_confirms(reply, status):
+    assert _track(("trader", "Buy 2 BTC at 64,250"), ("customer", reply)).status() == status
+
+def test_side_is_case_insensitive():
+    record = _track(("trader", "SELL 10k usdt @ 1.001, stop 0.99"))
+    assert (record.side, record.asset, record.quantity, record.price, record.stop_loss) == ("sell", "USDT", 10000, 1.001, 0.99)
+
+def test_times_and_unknown_symbols_do_not_touch_a_confirmed_order():
+    record = _track(("trader", "Buy 2 BTC at 64,250"), ("customer", "yes"), ("trader", "call you back at 3 PM"))
+    assert (record.asset, record.quantity, record.price, record.status()) == ("BTC", 2, 64250, "confirmed")
+
+def test_price_before_the_order():
+    record = _track(("trader", "Price is 64,250 USD for 2 BTC"))
+    assert (record.asset, record.quantity, record.price) == ("BTC", 2, 64250)
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+import asyncpg
+from backend.core import database, migrations, partitions
+
+async def _partitions(conn):
+    rows = await conn.fetch(
+        """
+        SELECT child.relname AS name FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'group_messages'::regclass
+        """
+    )
+    return {row["name"] for row in rows}
+
+def test_migrations_on_empty_database(run, database_url):
+    async def scenario():
+        conn = await asyncpg.connect(database_url)
+        try:
+            assert await migrations.migrate(conn) == migrations.LATEST_VERSION
+            assert await migrations.migrate(conn) == migrations.LATEST_VERSION
+            names = await _partitions(conn)
+            assert partitions.DEFAULT_PARTITION in names
+            assert partitions.partition_name(datetime.now(timezone.utc)) in names
+        finally:
+            await conn.close()
+    run(scenario())
+
+def test_old_slack_message_is_stored_and_rehomed(run, database_url):
+    async def scenario():
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=2)
+        try:
+            async with pool.acquire() as conn:
+                await migrations.migrate(conn)
+            # Two years before the migration month: no monthly partition covers it yet
+            old = datetime.now(timezone.utc) - timedelta(days=730)
+            slack_ts = f"{int(old.timestamp())}.000100"
+            assert await database.store_message(pool, "slack", "C1", "U1", "alice", "old news", slack_ts=slack_ts)
+            assert not await database.store_message(pool, "slack", "C1", "U1", "alice", "old news", slack_ts=slack_ts)
+
+            created, _ = await partitions.maintain_partitions(pool)
+            assert created >= 1
+            async with pool.acquire() as conn:
+                assert await conn.fetchval(f"SELECT count(*) FROM {partitions.DEFAULT_PARTITION}") == 0
+                assert await conn.fetchval(f"SELECT count(*) FROM {partitions.partition_name(old)}") == 1
+                assert await conn.fetchval("SELECT message_text FROM group_messages") == "old news"
+            # The moved row keeps its dedup key
+            assert not await database.store_message(pool, "slack", "C1", "U1", "alice", "old news", slack_ts=slack_ts)
+        finally:
+            await pool.close()
+    run(scenario())
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+from backend.agents import prompt_builder
+from backend.core import database
+
+def _history(platform, chat_id, texts):
+    """Newest-first rows, one minute apart."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = [{"platform": platform, "chat_id": chat_id, "user_id": "U1", "user_name": "alice",
+             "message_text": text, "timestamp": start + timedelta(minutes=i)} for i, text in enumerate(texts)]
+    return list(reversed(rows))
+
+def test_summaries_are_dropped_for_taken_over_channels():
+    prompt_builder._summaries.clear()
+    try:
+        for chat_id in ("C1", "C2"):
+            history = _history("slack", chat_id, [f"buy {i} BTC at {60000 + i} in {chat_id}" for i in range(40)])
+            prompt, stats = prompt_builder.build_prompt("slack", chat_id, history, [], "status?", budget=200)
+            assert "(summary)" in prompt and stats["verbatim_messages"] < 40
+        database.forget_channels("slack", {"C1"})
+        assert ("slack", "C1") not in prompt_builder._summaries
+        assert ("slack", "C2") in prompt_builder._summaries
+        # Another instance answered in C1 meanwhile; the old summary must not resurface
+        history = _history("slack", "C1", ["sell everything"])
+        prompt, _ = prompt_builder.build_prompt("slack", "C1", history, [], "status?", budget=200)
+        assert "BTC" not in prompt
+        database.forget_channels("slack")
+        assert not prompt_builder._summaries
+    finally:
+        prompt_builder._summaries.clear()
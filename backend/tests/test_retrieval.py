@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import asyncpg
+from backend.agents.retrieval import HashingEmbedder, RetrievalIndex
+from backend.core import database, migrations
+
+def test_loaded_index_catches_up_on_messages_stored_while_down(run, database_url, tmp_path):
+    path = str(tmp_path / "index")
+
+    async def store(pool, *texts):
+        for text in texts:
+            await database.store_message(pool, "telegram", "42", "7", "bob", text)
+
+    async def scenario():
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=2)
+        try:
+            async with pool.acquire() as conn:
+                await migrations.migrate(conn)
+            await store(pool, "buy 2 BTC", "sell 5 ETH", "price is 64,250")
+            index = RetrievalIndex(HashingEmbedder(dim=64), path=path)
+            await index.backfill(pool)
+            assert len(index.index) == 3
+            index.index.save(path)
+
+            # Stored while the bot was down, plus one the listener queued after the restart
+            await store(pool, "moving 10k USDT to cold storage", "withdrawals delayed")
+            restarted = RetrievalIndex(HashingEmbedder(dim=64), path=path)
+            assert len(restarted.index) == 3
+            await store(pool, "funding flipped")
+            restarted.on_message_stored(dict(await pool.fetchrow(
+                "SELECT * FROM group_messages WHERE message_text = 'funding flipped'")))
+            await restarted.backfill(pool)
+            texts = [meta["message_text"] for meta in restarted.index.metadata()]
+            assert sorted(texts) == sorted(["buy 2 BTC", "sell 5 ETH", "price is 64,250",
+                                            "moving 10k USDT to cold storage", "withdrawals delayed", "funding flipped"])
+        finally:
+            await pool.close()
+    run(scenario())
+
+def test_numpy_is_only_loaded_when_retrieval_is_enabled():
+    check = "import sys, backend.agents.llm_agent as agent; print(agent.retrieval_index is None, 'numpy' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for embedder, expected in (("", "True False"), ("hashing", "False True")):
+        result = subprocess.run([sys.executable, "-c", check], cwd=root, capture_output=True, text=True, check=True,
+                                env={**os.environ, "RETRIEVAL_EMBEDDER": embedder})
+        assert result.stdout.strip() == expected
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import pytest
+from backend.agents import slack_bot, slack_events
+from backend.core import database
+from backend.tests.fake_db import InMemoryPool
+from backend.tests.fake_slack import FakeSlackClient
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Fresh ingestion state, with queued mentions recorded instead of answered."""
+    for state in (slack_bot.channel_last_ts, slack_bot._seen_messages, slack_bot._dirty_cursors):
+        state.clear()
+    mentions = []
+    monkeypatch.setattr(slack_bot.mention_queue, "submit", lambda platform, chat_id, text, *args: mentions.append(text))
+    yield mentions
+    for state in (slack_bot.channel_last_ts, slack_bot._seen_messages, slack_bot._dirty_cursors):
+        state.clear()
+
+def _restart():
+    """Forget in-process ingestion state, as a restarted or newly assigned instance would."""
+    slack_bot._seen_messages.clear()
+    slack_bot.channel_last_ts.clear()
+
+@pytest.mark.parametrize("buffered", [False, True])
+def test_mention_is_answered_once_across_a_hand_off(run, submitted, buffered):
+    async def scenario():
+        pool = InMemoryPool()
+        slack = FakeSlackClient(["C1"], users={"U1": "alice"})
+        if buffered:
+            database.enable_write_buffer(pool, max_batch=100, flush_interval=60)
+        try:
+            message = slack.post("C1", "U1", "@bot what's our BTC position?")
+            await slack_bot.process_slack_message(pool, slack, "C1", message, "UBOT", "@bot", None)
+            _restart()
+            await slack_bot.process_slack_message(pool, slack, "C1", message, "UBOT", "@bot", None)
+            assert submitted == ["@bot what's our BTC position?"]
+            assert pool.row_count == 1
+        finally:
+            await database.close_write_buffer(pool)
+    run(scenario())
+
+async def _catch_up(pool, slack, channel_id):
+    state = slack_bot._ChannelPollState(1)
+    await slack_bot._poll_channel(pool, slack, channel_id, state, "UBOT", "@bot", None, asyncio.Semaphore(1), 1, 1)
+
+def _texts(pool, channel_id):
+    return [row["message_text"] for row in pool.messages.get(("slack", channel_id), [])]
+
+def test_catch_up_poll_covers_a_socket_mode_disconnect(run, submitted):
+    async def scenario():
+        pool = InMemoryPool()
+        slack = FakeSlackClient(["C1"], users={"U1": "alice"})
+        slack.post("C1", "U1", "before")
+        await _catch_up(pool, slack, "C1")
+        # Socket Mode is disconnected while this is posted, so no event arrives for it
+        slack.post("C1", "U1", "missed during disconnect")
+        after = slack.post("C1", "U1", "after reconnect")
+        await slack_events.handle_slack_event({"type": "message", "channel": "C1", **after}, pool, slack, "UBOT", "@bot", None)
+        await _catch_up(pool, slack, "C1")
+        assert _texts(pool, "C1") == ["before", "after reconnect", "missed during disconnect"]
+        assert slack_bot.channel_last_ts["C1"] == after["ts"]
+    run(scenario())
+
+def test_event_replay_stores_and_answers_once(run, submitted):
+    async def scenario():
+        pool = InMemoryPool()
+        slack = FakeSlackClient(["C0000000001"])
+        path = os.path.join(os.path.dirname(__file__), "slack_events_sample.jsonl")
+        bot_name = "<@U08EEVBTENB>"
+        assert await slack_events.replay_slack_events(path, pool, slack, "UBOT", bot_name, None) == 4
+        # Slack retries deliveries, and a replayed file may be fed twice
+        await slack_events.replay_slack_events(path, pool, slack, "UBOT", bot_name, None)
+        # The message_changed edit is not a new message
+        assert len(_texts(pool, "C0000000001")) == 3
+        assert submitted == ["<@U08EEVBTENB> @U08EEVBTENB confirm the order?"]
+        # Push events leave the poll cursor alone
+        assert "C0000000001" not in slack_bot.channel_last_ts
+    run(scenario())
+
+class _SingletonLease:
+    """Stand-in for ChannelLeaseManager's singleton API, flipped by the test."""
+
+    def __init__(self):
+        self.held = False
+        self._changed = asyncio.Event()
+
+    def want_singleton(self, platform):
+        pass
+
+    def holds_singleton(self, platform):
+        return self.held
+
+    async def wait_for_change(self):
+        await self._changed.wait()
+        self._changed.clear()
+
+    def set(self, held):
+        self.held = held
+        self._changed.set()
+
+def test_socket_mode_runs_only_on_the_slack_lease_holder(run, submitted, monkeypatch):
+    running = set()
+
+    def ingester(name):
+        async def run_forever(*args, **kwargs):
+            running.add(name)
+            try:
+                await asyncio.Event().wait()
+            finally:
+                running.discard(name)
+        return run_forever
+
+    async def no_warm(slack_client):
+        pass
+
+    monkeypatch.setattr(slack_bot.config, "SLACK_APP_TOKEN", "xapp-test")
+    monkeypatch.setattr(slack_bot, "WebClient", lambda token: FakeSlackClient(["C1"]))
+    monkeypatch.setattr(slack_bot.user_directory, "warm_slack", no_warm)
+    monkeypatch.setattr(slack_events, "run_socket_mode", ingester("socket"))
+    monkeypatch.setattr(slack_bot, "poll_slack_messages", ingester("poll"))
+    forgotten = []
+    monkeypatch.setattr(slack_bot.database, "forget_channels", lambda platform, chat_ids=None: forgotten.append(platform))
+
+    async def scenario():
+        lease = _SingletonLease()
+        runner = asyncio.create_task(slack_bot.run_slack(None, None, lease))
+        try:
+            await asyncio.sleep(0.05)
+            assert running == set()
+            lease.set(True)
+            await asyncio.sleep(0.05)
+            assert running == {"socket", "poll"}
+            assert forgotten == ["slack"]
+            lease.set(False)
+            await asyncio.sleep(0.05)
+            assert running == set()
+            lease.set(True)
+            await asyncio.sleep(0.05)
+            # Caches are dropped again, since another instance answered in between
+            assert running == {"socket", "poll"} and forgotten == ["slack", "slack"]
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+        assert running == set()
+    run(scenario())
@@ -0,0 +1,72 @@
+import pytest
+from backend.agents import streaming
+from backend.agents.streaming import Responder, StreamingReply
+
+class RecordingResponder(Responder):
+    """Records every send and edit; `ref` is what send() returns and `fail_edits` makes edit() raise."""
+
+    min_edit_interval = 1.0
+
+    def __init__(self, ref="msg-1", fail_edits=False):
+        self.ref = ref
+        self.fail_edits = fail_edits
+        self.calls = []
+
+    async def send(self, chat_id, text):
+        self.calls.append(("send", text))
+        return self.ref
+
+    async def edit(self, chat_id, message_ref, text):
+        if self.fail_edits:
+            raise RuntimeError("message can't be edited")
+        self.calls.append(("edit", text))
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(streaming.time, "monotonic", lambda: now[0])
+    return now
+
+def test_edits_are_throttled_to_the_platform_interval(run, clock):
+    async def scenario():
+        responder = RecordingResponder()
+        reply = StreamingReply(responder, "42")
+        await reply.start()
+        for i, text in enumerate(["a", "a b", "a b c", "a b c d", "a b c d e"]):
+            clock[0] = 1000.0 + 0.4 * (i + 1)
+            await reply.update(text)
+        clock[0] += 1.0
+        await reply.finish("a b c d e f")
+        return responder.calls, reply.edits
+
+    calls, edits = run(scenario())
+    # Updates land at 0.4s intervals, so only those a full second after the last edit are shown
+    assert calls == [("send", "⏳ …"), ("edit", "a b c …"), ("edit", "a b c d e f")]
+    assert edits == 2
+
+def test_final_text_is_written_after_the_interval(run):
+    async def scenario():
+        responder = RecordingResponder()
+        responder.min_edit_interval = 0.05
+        reply = StreamingReply(responder, "42")
+        await reply.start()
+        # Straight after the placeholder: finish waits out the interval instead of dropping the text
+        await reply.finish("done")
+        await reply.finish("done")
+        return responder.calls
+
+    assert run(scenario()) == [("send", "⏳ …"), ("edit", "done")]
+
+@pytest.mark.parametrize("ref, fail_edits", [(None, False), ("msg-1", True)])
+def test_final_text_falls_back_to_a_fresh_message(run, clock, ref, fail_edits):
+    async def scenario():
+        responder = RecordingResponder(ref=ref, fail_edits=fail_edits)
+        reply = StreamingReply(responder, "42")
+        await reply.start()
+        clock[0] += 2.0
+        await reply.update("partial")
+        clock[0] += 2.0
+        await reply.finish("final answer")
+        return responder.calls
+
+    assert run(scenario()) == [("send", "⏳ …"), ("send", "final answer")]
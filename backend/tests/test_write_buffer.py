@@ -0,0 +1,103 @@
+import asyncpg
+from backend.core import database, migrations
+from backend.tests.fake_db import InMemoryPool
+
+def _listen():
+    seen = []
+    database.add_message_listener(seen.append)
+    return seen
+
+def test_buffered_slack_duplicates_do_not_reach_listeners(run):
+    async def scenario():
+        pool = InMemoryPool()
+        seen = _listen()
+        buffer = database.enable_write_buffer(pool, max_batch=100, flush_interval=60)
+        try:
+            for _ in range(3):
+                await database.store_message(pool, "slack", "C1", "U1", "alice", "hello", slack_ts="1700000000.000100")
+            await database.store_message(pool, "telegram", "42", "7", "bob", "hi")
+            # Nothing reaches listeners before the flush commits it
+            assert seen == []
+            await buffer.flush()
+            assert [message["message_text"] for message in seen] == ["hello", "hi"]
+            assert pool.row_count == 2
+        finally:
+            await database.close_write_buffer(pool)
+            database._message_listeners.remove(seen.append)
+    run(scenario())
+
+def test_rejected_rows_are_dead_lettered_not_retried(run, database_url):
+    async def scenario():
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=2)
+        buffer = database.enable_write_buffer(pool, max_batch=100, flush_interval=60)
+        seen = _listen()
+        try:
+            async with pool.acquire() as conn:
+                await migrations.migrate(conn)
+            # Hydrate the chat's ring, so stored messages are appended to it
+            assert await database.fetch_channel_history(pool, "telegram", "42") == []
+            for i in range(10):
+                # user_name is VARCHAR(255), so the third row fails the whole multi-row INSERT
+                name = "x" * 300 if i == 3 else f"user{i}"
+                await database.store_message(pool, "telegram", "42", str(i), name, f"message {i}")
+            await buffer.flush()
+            assert buffer.queue_depth == 0
+            assert buffer.dead_lettered == 1
+            assert buffer.dead_letters[0][0][4] == "message 3"
+            async with pool.acquire() as conn:
+                assert await conn.fetchval("SELECT count(*) FROM group_messages") == 9
+            # The rejected row never reached listeners or the cached history prompts are built from
+            stored = [f"message {i}" for i in range(10) if i != 3]
+            assert [message["message_text"] for message in seen] == stored
+            history = await database.fetch_channel_history(pool, "telegram", "42")
+            assert [message["message_text"] for message in reversed(history)] == stored
+        finally:
+            await database.close_write_buffer(pool)
+            await pool.close()
+            database._message_listeners.remove(seen.append)
+            database.history_cache.invalidate("telegram")
+    run(scenario())
+
+def test_unreachable_database_keeps_a_bounded_queue(run):
+    class DownPool(InMemoryPool):
+        def acquire(self):
+            raise ConnectionRefusedError("database is down")
+
+    async def scenario():
+        pool = DownPool()
+        buffer = database.enable_write_buffer(pool, max_batch=1000, flush_interval=60, max_pending=5)
+        try:
+            for i in range(8):
+                await database.store_message(pool, "telegram", "42", "7", "bob", f"message {i}")
+            await buffer.flush()
+            assert buffer.queue_depth == 5
+            assert buffer.dead_lettered == 3
+            # The newest messages are the ones kept for retry
+            assert [entry.row[4] for entry in buffer._pending] == [f"message {i}" for i in range(3, 8)]
+        finally:
+            database._write_buffers.pop(pool, None)._timer_task.cancel()
+    run(scenario())
+
+def test_cursors_wait_for_buffered_messages(run):
+    class FlakyPool(InMemoryPool):
+        down = True
+
+        def acquire(self):
+            if self.down:
+                raise ConnectionRefusedError("database is down")
+            return super().acquire()
+
+    async def scenario():
+        pool = FlakyPool()
+        database.enable_write_buffer(pool, max_batch=100, flush_interval=60)
+        try:
+            await database.store_message(pool, "slack", "C1", "U1", "alice", "hello", slack_ts="1700000000.000100")
+            assert not await database.save_channel_cursors(pool, "slack", {"C1": "1700000000.000100"})
+            assert pool.cursors == {}
+            pool.down = False
+            assert await database.save_channel_cursors(pool, "slack", {"C1": "1700000000.000100"})
+            assert pool.row_count == 1
+            assert pool.cursors == {("slack", "C1"): "1700000000.000100"}
+        finally:
+            await database.close_write_buffer(pool)
+    run(scenario())